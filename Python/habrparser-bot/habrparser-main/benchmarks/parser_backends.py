@@ -0,0 +1,143 @@
+"""Сравнение движков разбора HTML на сохраненных страницах Хабра.
+
+В fixtures/ лежит небольшой набор страниц в разметке Хабра (лента и два поста), на нем же
+tests/test_parser_backends.py проверяет совпадение полей. Заменить их текущими страницами:
+    python -m benchmarks.parser_backends download --posts 10
+Сравнить движки:
+    python -m benchmarks.parser_backends run
+
+Для каждого движка выводится медианное время разбора страницы и прирост пикового RSS процесса
+при разборе (каждый движок измеряется в отдельном процессе), а также проверяется, что все движки
+извлекают одинаковые поля HabrPost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from bot.services.html_backends import BACKENDS
+from bot.services.parser import ParserService
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+def load_fixtures(directory: Path) -> dict[str, str]:
+    return {path.name: path.read_text(encoding="utf-8") for path in sorted(directory.glob("*.html"))}
+
+
+def extract(parser: ParserService, name: str, html: str):
+    """Поля, которые бот берет со страницы: карточки ленты или полный текст, хабы и изображения поста"""
+    if name.startswith("listing"):
+        return [asdict(post) for post in parser.parse_listing(html)]
+    return parser.parse_full_post(html)
+
+
+def measure_time(backend: str, fixtures: dict[str, str], repeat: int) -> dict[str, float]:
+    parser = ParserService(backend=backend)
+    timings = {}
+    for name, html in fixtures.items():
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            extract(parser, name, html)
+            runs.append(time.perf_counter() - started)
+        timings[name] = statistics.median(runs)
+    return timings
+
+
+def measure_memory(backend: str, directory: Path) -> float | None:
+    """Прирост пикового RSS (МБ) при разборе самой тяжелой страницы, в отдельном процессе"""
+    try:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.parser_backends", "memory", backend, "--fixtures", str(directory)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output)["peak_mb"]
+    except (subprocess.CalledProcessError, ValueError, KeyError) as e:
+        print(f"Не удалось измерить память для {backend}: {e}")
+        return None
+
+
+def memory_worker(backend: str, directory: Path):
+    import resource
+
+    fixtures = load_fixtures(directory)
+    parser = ParserService(backend=backend)
+    # Первый разбор загружает модули движка, его память в замер не входит
+    parser.parse_html("<html></html>")
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for html in fixtures.values():
+        document = parser.parse_html(html)
+        del document
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_mb": (peak - baseline) / 1024}))
+
+
+def run(directory: Path, backends: list[str], repeat: int):
+    fixtures = load_fixtures(directory)
+    if not fixtures:
+        print(f"Нет страниц в {directory}, сохраните их командой download")
+        return
+
+    reference = {name: extract(ParserService(backend="bs4"), name, html) for name, html in fixtures.items()}
+    print(f"Страниц: {len(fixtures)}, повторов: {repeat}\n")
+    print(f"{'движок':12s} {'мс/страница':>12s} {'ускорение':>10s} {'RSS, МБ':>9s} {'поля':>6s}")
+    baseline_time = None
+    for backend in backends:
+        try:
+            timings = measure_time(backend, fixtures, repeat)
+        except ImportError as e:
+            print(f"{backend:12s} не установлен: {e}")
+            continue
+        per_page = statistics.mean(timings.values()) * 1000
+        baseline_time = baseline_time or per_page
+        mismatches = [name for name, html in fixtures.items()
+                      if extract(ParserService(backend=backend), name, html) != reference[name]]
+        memory = measure_memory(backend, directory) if os.name == "posix" else None
+        print(f"{backend:12s} {per_page:12.2f} {baseline_time / per_page:9.1f}x "
+              f"{memory if memory is not None else float('nan'):9.1f} {'ok' if not mismatches else 'ОШИБКА':>6s}")
+        for name in mismatches:
+            print(f"    поля отличаются от bs4: {name}")
+
+
+async def download(directory: Path, posts: int):
+    parser = ParserService()
+    session = await parser.get_session()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        async with session.get(parser.BASE_URL) as response:
+            response.raise_for_status()
+            listing = await response.text()
+        (directory / "listing.html").write_text(listing, encoding="utf-8")
+        for post in parser.parse_listing(listing)[:posts]:
+            async with session.get(post.url) as response:
+                response.raise_for_status()
+                post_id = post.url.rstrip("/").rsplit("/", 1)[-1]
+                (directory / f"post_{post_id}.html").write_text(await response.text(), encoding="utf-8")
+        print(f"Страницы сохранены в {directory}")
+    finally:
+        await parser.close()
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Бенчмарк движков разбора HTML")
+    arguments.add_argument("command", choices=["run", "download", "memory"])
+    arguments.add_argument("backend", nargs="?", help="Движок для команды memory")
+    arguments.add_argument("--fixtures", type=Path, default=FIXTURES_DIR)
+    arguments.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    arguments.add_argument("--repeat", type=int, default=20)
+    arguments.add_argument("--posts", type=int, default=10)
+    args = arguments.parse_args()
+
+    if args.command == "download":
+        asyncio.run(download(args.fixtures, args.posts))
+    elif args.command == "memory":
+        memory_worker(args.backend, args.fixtures)
+    else:
+        run(args.fixtures, args.backends, args.repeat)
@@ -28,7 +28,12 @@ async def main():
     storage = Storage(config.db.url)
     await storage.init_db()
     
-    parser_service = ParserService()
+    parser_service = ParserService(
+        max_pages=config.parser.max_pages,
+        concurrency=config.parser.concurrency,
+        backend=config.parser.backend,
+        max_posts=config.parser.max_posts
+    )
     summarizer_service = SummarizerService(config.bot.mistral_api_key)
     
     bot = setup_bot(config.bot.token)
@@ -41,7 +46,8 @@ async def main():
         parser=parser_service,
         summarizer=summarizer_service,
         channel_id=config.bot.channel_id,
-        bot=bot
+        bot=bot,
+        send_interval=config.parser.send_interval
     )
     
     logger.info(f"Админы: {config.bot.admin_ids}")
@@ -78,6 +84,7 @@ async def main():
             for task in tasks:
                 task.cancel()
             await asyncio.gather(*tasks, return_exceptions=True)
+            await parser_service.close()
             await bot.session.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+from typing import Callable
+
+# Текст внутри этих тегов не входит в текст узла (как в BeautifulSoup.get_text)
+SKIPPED_TAGS = ('script', 'style')
+
+
+class SoupNode:
+    """Узел BeautifulSoup (встроенный html.parser — медленный, но без внешних зависимостей)"""
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    def select(self, css: str) -> list['SoupNode']:
+        return [SoupNode(tag) for tag in self._tag.select(css)]
+
+    def select_one(self, css: str) -> 'SoupNode | None':
+        tag = self._tag.select_one(css)
+        return SoupNode(tag) if tag is not None else None
+
+    def text(self, strip: bool = False) -> str:
+        return self._tag.get_text(strip=strip)
+
+    def attr(self, name: str) -> str | None:
+        return self._tag.get(name)
+
+
+class LxmlNode:
+    """Узел lxml.html, CSS-селекторы через cssselect"""
+
+    def __init__(self, element):
+        self._element = element
+
+    def select(self, css: str) -> list['LxmlNode']:
+        return [LxmlNode(element) for element in self._element.cssselect(css)]
+
+    def select_one(self, css: str) -> 'LxmlNode | None':
+        elements = self._element.cssselect(css)
+        return LxmlNode(elements[0]) if elements else None
+
+    def text(self, strip: bool = False) -> str:
+        # text() в XPath не включает комментарии, в отличие от itertext()
+        strings = self._element.xpath('.//text()')
+        if strip:
+            return ''.join(string.strip() for string in strings)
+        return ''.join(strings)
+
+    def attr(self, name: str) -> str | None:
+        return self._element.get(name)
+
+
+class SelectolaxNode:
+    """Узел selectolax (движок lexbor)"""
+
+    def __init__(self, node):
+        self._node = node
+
+    def select(self, css: str) -> list['SelectolaxNode']:
+        return [SelectolaxNode(node) for node in self._node.css(css)]
+
+    def select_one(self, css: str) -> 'SelectolaxNode | None':
+        node = self._node.css_first(css)
+        return SelectolaxNode(node) if node is not None else None
+
+    def text(self, strip: bool = False) -> str:
+        return self._node.text(deep=True, separator='', strip=strip)
+
+    def attr(self, name: str) -> str | None:
+        return self._node.attributes.get(name)
+
+
+def parse_bs4(html: str) -> SoupNode:
+    from bs4 import BeautifulSoup
+    return SoupNode(BeautifulSoup(html, 'html.parser'))
+
+
+def parse_lxml(html: str) -> LxmlNode:
+    import lxml.html
+    root = lxml.html.document_fromstring(html)
+    for element in root.xpath('//script|//style'):
+        element.drop_tree()
+    return LxmlNode(root)
+
+
+def parse_selectolax(html: str) -> SelectolaxNode:
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(SKIPPED_TAGS))
+    return SelectolaxNode(tree)
+
+
+BACKENDS: dict[str, Callable[[str], SoupNode | LxmlNode | SelectolaxNode]] = {
+    'bs4': parse_bs4,
+    'lxml': parse_lxml,
+    'selectolax': parse_selectolax,
+}
+
+
+def get_html_parser(name: str) -> Callable[[str], SoupNode | LxmlNode | SelectolaxNode]:
+    """Функция разбора HTML выбранного движка. Все движки поддерживают одни и те же CSS-селекторы
+       и возвращают одинаковый текст узлов; lxml (с cssselect) и selectolax устанавливаются отдельно.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный движок разбора HTML '{name}', доступны: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
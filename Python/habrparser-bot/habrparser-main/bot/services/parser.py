@@ -1,11 +1,19 @@
+import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 from dataclasses import dataclass
 from datetime import datetime
+import hashlib
+import re
+from typing import Awaitable, Callable
 import logging
 
+from bot.services.html_backends import get_html_parser
+
 logger = logging.getLogger(__name__)
 
+# Ссылки заголовков карточек ленты: по ним строится отпечаток списка постов без разбора HTML
+TITLE_LINK_RE = re.compile(r'<h2[^>]*class="tm-title[^"]*"[^>]*>\s*<a\b[^>]*?\bhref="([^"]+)"')
+
 @dataclass
 class HabrPost:
     title: str
@@ -24,25 +32,56 @@ class HabrPost:
             self.hubs = []
 
 class ParserService:
-    BASE_URL = "https://habr.com/ru/news/"
+    SITE_URL = "https://habr.com"
+    BASE_URL = f"{SITE_URL}/ru/news/"
+
+    def __init__(self, max_pages: int = 1, concurrency: int = 5, backend: str = "bs4", max_posts: int = 5):
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        # Сколько новых постов публикуется за одну проверку; остальные остаются на следующие проверки
+        self.max_posts = max_posts
+        self.backend = backend
+        self.parse_html = get_html_parser(backend)
+        self._session: aiohttp.ClientSession | None = None
+        # ETag/Last-Modified и отпечаток последней обработанной версии каждой страницы ленты
+        self._validators: dict[str, tuple[str | None, str | None]] = {}
+        self._fingerprints: dict[str, str] = {}
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        # Одна сессия на все время работы: соединения с habr.com переиспользуются между проверками
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def page_url(self, page: int) -> str:
+        return self.BASE_URL if page == 1 else f"{self.BASE_URL}page{page}/"
 
     async def get_full_post_content(self, session: aiohttp.ClientSession, url: str) -> tuple[str, list[str], list[str]]:
         async with session.get(url) as response:
-            soup = BeautifulSoup(await response.text(), 'html.parser')
-            
-            article_body = soup.select_one('div.article-formatted-body')
-            full_text = article_body.get_text(strip=True) if article_body else ""
-            
-            hubs_list = soup.select('.tm-separated-list__list .tm-hubs-list__link span')
-            hubs = [hub.text.strip() for hub in hubs_list]  
-            
-            images = []
-            if article_body:
-                for img in article_body.select('img[data-src]'):
-                    if 'data-src' in img.attrs:
-                        images.append(img['data-src'])
-            
-            return full_text, hubs, images
+            response.raise_for_status()
+            return self.parse_full_post(await response.text())
+
+    def parse_full_post(self, html: str) -> tuple[str, list[str], list[str]]:
+        document = self.parse_html(html)
+
+        article_body = document.select_one('div.article-formatted-body')
+        full_text = article_body.text(strip=True) if article_body else ""
+
+        hubs_list = document.select('.tm-separated-list__list .tm-hubs-list__link span')
+        hubs = [hub.text().strip() for hub in hubs_list]
+
+        images = []
+        if article_body:
+            for img in article_body.select('img[data-src]'):
+                src = img.attr('data-src')
+                if src is not None:
+                    images.append(src)
+
+        return full_text, hubs, images
 
     def parse_datetime(self, datetime_str: str) -> datetime:
         try:
@@ -56,35 +95,127 @@ class ParserService:
                 logger.error(f"Не удалось распарсить дату '{datetime_str}': {e}")
                 return datetime.now()
 
-    async def get_latest_post(self) -> HabrPost | None:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(self.BASE_URL) as response:
-                soup = BeautifulSoup(await response.text(), 'html.parser')
-                article = soup.select_one('div.tm-articles-list article.tm-articles-list__item')
-                
-                if article:
-                    preview_text = article.select_one('.article-formatted-body').get_text(strip=True)
-                    url = f"https://habr.com{article.select_one('h2.tm-title a')['href']}"
-                    
-                    full_text, hubs, images = await self.get_full_post_content(session, url)
-                    
-                    time_element = article.select_one('time')
-                    datetime_str = time_element['datetime'] if time_element else None
-                    
-                    if not datetime_str:
-                        logger.error("Не найдена дата публикации")
-                        published_at = datetime.now()
-                    else:
-                        published_at = self.parse_datetime(datetime_str)
-                    
-                    return HabrPost(
-                        title=article.select_one('h2.tm-title span').text.strip(),
-                        url=url,
-                        author=article.select_one('a.tm-user-info__username').text.strip(),
-                        published_at=published_at,
-                        preview_text=preview_text,
-                        images=images,
-                        full_text=full_text,
-                        hubs=hubs
-                    )
-                return None
\ No newline at end of file
+    def parse_article_card(self, article) -> HabrPost | None:
+        """Пост из карточки ленты, без полного текста, хабов и изображений"""
+        link = article.select_one('h2.tm-title a')
+        title = article.select_one('h2.tm-title span')
+        if not link or not title:
+            return None
+
+        preview = article.select_one('.article-formatted-body')
+        author = article.select_one('a.tm-user-info__username')
+        time_element = article.select_one('time')
+        datetime_str = time_element.attr('datetime') if time_element else None
+
+        if not datetime_str:
+            logger.error("Не найдена дата публикации")
+            published_at = datetime.now()
+        else:
+            published_at = self.parse_datetime(datetime_str)
+
+        return HabrPost(
+            title=title.text().strip(),
+            url=f"{self.SITE_URL}{link.attr('href')}",
+            author=author.text().strip() if author else "",
+            published_at=published_at,
+            preview_text=preview.text(strip=True) if preview else ""
+        )
+
+    def parse_listing(self, html: str) -> list[HabrPost]:
+        articles = self.parse_html(html).select('div.tm-articles-list article.tm-articles-list__item')
+        return [post for post in map(self.parse_article_card, articles) if post]
+
+    def listing_fingerprint(self, html: str) -> str | None:
+        """Хэш упорядоченного списка ссылок постов: счетчики просмотров и прочие мелочи на него не влияют"""
+        links = TITLE_LINK_RE.findall(html)
+        if not links:
+            return None
+        return hashlib.sha1('\n'.join(links).encode()).hexdigest()
+
+    def forget_listing(self):
+        """Сброс сохраненных версий ленты: следующая проверка загрузит и разберет ее целиком"""
+        self._validators.clear()
+        self._fingerprints.clear()
+
+    async def get_listing(self, session: aiohttp.ClientSession, page: int = 1, conditional: bool = False) -> list[HabrPost] | None:
+        """Посты страницы ленты. При conditional=True возвращает None, если страница не изменилась
+           с прошлой проверки: сервер ответил 304 на запрос с ETag/Last-Modified или совпал отпечаток списка постов.
+        """
+        url = self.page_url(page)
+        headers = {}
+        if conditional:
+            etag, last_modified = self._validators.get(url, (None, None))
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        async with session.get(url, headers=headers) as response:
+            if conditional and response.status == 304:
+                return None
+            response.raise_for_status()
+            html = await response.text()
+            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+        if not conditional:
+            return self.parse_listing(html)
+        self._validators[url] = validators
+        fingerprint = self.listing_fingerprint(html)
+        if fingerprint and self._fingerprints.get(url) == fingerprint:
+            return None
+        if fingerprint:
+            self._fingerprints[url] = fingerprint
+        return self.parse_listing(html)
+
+    async def fill_full_content(self, session: aiohttp.ClientSession, posts: list[HabrPost]) -> list[HabrPost]:
+        """Параллельная загрузка полных страниц постов, не больше concurrency запросов одновременно.
+           Посты, страницу которых загрузить не удалось, пропускаются и будут найдены при следующей проверке.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fill(post: HabrPost) -> HabrPost | None:
+            async with semaphore:
+                try:
+                    post.full_text, post.hubs, post.images = await self.get_full_post_content(session, post.url)
+                    return post
+                except Exception as e:
+                    logger.error(f"Ошибка при загрузке поста {post.url}: {e}")
+                    return None
+
+        filled = await asyncio.gather(*(fill(post) for post in posts))
+        return [post for post in filled if post]
+
+    async def get_new_posts(self, known_urls: Callable[[list[str]], Awaitable[set[str]]]) -> list[HabrPost]:
+        """Все посты ленты (до max_pages страниц), которых еще нет в базе, от старых к новым.
+           known_urls — корутина, возвращающая уже сохраненные адреса из переданного списка.
+           Следующая страница загружается, только если все посты текущей оказались новыми.
+           Если лента не изменилась с прошлой проверки, разбор HTML и запросы к базе пропускаются.
+           За проверку возвращается не больше max_posts самых старых новых постов (например, на пустой базе
+           в ленте окажутся десятки постов), чтобы не упереться в ограничения Telegram на частоту сообщений.
+           Когда часть постов отложена или загрузить ее не удалось, сохраненные версии ленты сбрасываются,
+           чтобы следующая проверка нашла эти посты снова.
+        """
+        session = await self.get_session()
+        new_posts = []
+        for page in range(1, self.max_pages + 1):
+            listing = await self.get_listing(session, page, conditional=True)
+            if not listing:
+                if listing is None and page == 1:
+                    logger.info("Лента не изменилась с прошлой проверки")
+                break
+            known = await known_urls([post.url for post in listing])
+            fresh = [post for post in listing if post.url not in known]
+            new_posts.extend(fresh)
+            if len(fresh) < len(listing):
+                break
+
+        # Лента идет от новых постов к старым, в канал публикуем в порядке выхода
+        new_posts.reverse()
+        if self.max_posts and len(new_posts) > self.max_posts:
+            logger.info(f"Новых постов: {len(new_posts)}, за эту проверку публикуется {self.max_posts}")
+            new_posts = new_posts[:self.max_posts]
+            self.forget_listing()
+        filled = await self.fill_full_content(session, new_posts)
+        if len(filled) < len(new_posts):
+            self.forget_listing()
+        return filled
@@ -22,13 +22,16 @@ class StatsService:
         parser: ParserService,
         summarizer: SummarizerService,
         channel_id: int,
-        bot: Bot = None
+        bot: Bot = None,
+        send_interval: float = 3
     ):
         self.storage = storage
         self.parser = parser
         self.summarizer = summarizer
         self.channel_id = channel_id
         self.bot = bot
+        # Пауза между публикациями в канал (секунды), чтобы не упираться в ограничения Telegram
+        self.send_interval = send_interval
 
     def set_bot(self, bot: Bot):
         self.bot = bot
@@ -45,34 +48,38 @@ class StatsService:
     async def get_hubs_stats(self) -> Dict[str, int]:
         return await self.storage.get_hubs_stats()
 
+    async def get_stored_urls(self, urls: list[str]) -> set[str]:
+        return await self.storage.get_existing_urls(urls)
+
     async def check_new_posts(self):
         try:
             if not self.bot:
                 from bot.utils.misc import bot
                 self.bot = bot
 
-            latest_post = await self.parser.get_latest_post()
+            new_posts = await self.parser.get_new_posts(self.get_stored_urls)
             
-            if latest_post and not await self.storage.is_post_exists(latest_post.url):
-                logger.info(f"Найден новый пост: {latest_post.title}")
-                await self.process_post(latest_post)
-                stats = await self.get_bot_stats()
-                await self.storage.update_stats(
-                    posts_processed=stats.posts_processed + 1,
-                    last_check_time=datetime.now()
-                )
+            if new_posts:
+                logger.info(f"Найдено новых постов: {len(new_posts)}")
+                processed = 0
+                for index, post in enumerate(new_posts):
+                    if index:
+                        await asyncio.sleep(self.send_interval)
+                    logger.info(f"Найден новый пост: {post.title}")
+                    processed += await self.process_post(post)
+                if processed < len(new_posts):
+                    # Неотправленные посты должны найтись при следующей проверке, даже если лента не изменится
+                    self.parser.forget_listing()
+                await self.storage.update_stats(last_check_time=datetime.now())
             else:
                 logger.info("Новых постов не найдено")
                 await self.storage.update_stats(last_check_time=datetime.now())
         except Exception as e:
             logger.error(f"Ошибка при проверке постов: {e}")
-            stats = await self.get_bot_stats()
-            await self.storage.update_stats(
-                errors_count=stats.errors_count + 1,
-                last_check_time=datetime.now()
-            )
+            self.parser.forget_listing()
+            await self.storage.increment_stats(errors_count=1, last_check_time=datetime.now())
 
-    async def process_post(self, post: HabrPost):
+    async def process_post(self, post: HabrPost) -> bool:
         summary = await self.summarizer.summarize(post.full_text)
         
         max_length = 1000
@@ -105,11 +112,15 @@ class StatsService:
                     text=message_text,
                 )
 
-            await self.storage.save_post(post.url, post.published_at, post.hubs)
+            # Пост и счетчик обработанных постов фиксируются одной транзакцией
+            async with self.storage.unit_of_work() as uow:
+                uow.save_post(post.url, post.published_at, post.hubs)
+                await uow.increment_stats(posts_processed=1)
+            return True
         except Exception as e:
             logger.error(f"Ошибка при отправке поста: {e}")
-            stats = await self.get_bot_stats()
-            await self.storage.update_stats(errors_count=stats.errors_count + 1)
+            await self.storage.increment_stats(errors_count=1)
+            return False
 
     async def generate_hubs_chart(self, hubs_stats: dict[str, int]) -> FSInputFile:
         plt.figure(figsize=(10, 6))
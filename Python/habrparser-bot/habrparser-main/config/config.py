@@ -13,10 +13,19 @@ class BotConfig:
 class DatabaseConfig:
     url: str
 
+@dataclass
+class ParserConfig:
+    max_pages: int
+    concurrency: int
+    backend: str
+    max_posts: int
+    send_interval: float
+
 @dataclass
 class Config:
     bot: BotConfig
     db: DatabaseConfig
+    parser: ParserConfig
 
 def load_config(path: str = None) -> Config:
     env = Env()
@@ -31,5 +40,12 @@ def load_config(path: str = None) -> Config:
         ),
         db=DatabaseConfig(
             url=env.str("DATABASE_URL", "sqlite+aiosqlite:///posts.db")
+        ),
+        parser=ParserConfig(
+            max_pages=env.int("PARSER_MAX_PAGES", 1),
+            concurrency=env.int("PARSER_CONCURRENCY", 5),
+            backend=env.str("PARSER_BACKEND", "bs4"),
+            max_posts=env.int("PARSER_MAX_POSTS", 5),
+            send_interval=env.float("PARSER_SEND_INTERVAL", 3)
         )
     )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from .storage import Storage
+from .storage import Storage, UnitOfWork
 from .models import Base, PostRecord, BotStats
 
-__all__ = ['Storage', 'Base', 'PostRecord', 'BotStats'] 
\ No newline at end of file
+__all__ = ['Storage', 'UnitOfWork', 'Base', 'PostRecord', 'BotStats'] 
\ No newline at end of file
@@ -1,15 +1,49 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
+from contextlib import asynccontextmanager
 from datetime import datetime
 from collections import Counter
+from typing import AsyncIterator
 
 from .models import Base, PostRecord, BotStats
 
+# Сколько адресов передавать в одном запросе WHERE url IN (...): ограничение SQLite на число параметров
+URL_QUERY_CHUNK = 500
+
+class UnitOfWork:
+    """Изменения в одной транзакции: фиксируются вместе при выходе из Storage.unit_of_work()"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.saved_urls: list[str] = []
+
+    def save_post(self, url: str, published_at: datetime, hubs: list[str] = None):
+        self.saved_urls.append(url)
+        self.session.add(PostRecord(
+            url=url,
+            published_at=published_at,
+            hubs=','.join(hubs) if hubs else None
+        ))
+
+    async def increment_stats(self, *, posts_processed: int = 0, errors_count: int = 0, last_check_time: datetime = None):
+        # Счетчики увеличиваются в самом UPDATE, без чтения: одновременные проверки не теряют приращения
+        values = {}
+        if posts_processed:
+            values['posts_processed'] = BotStats.posts_processed + posts_processed
+        if errors_count:
+            values['errors_count'] = BotStats.errors_count + errors_count
+        if last_check_time is not None:
+            values['last_check_time'] = last_check_time
+        if values:
+            await self.session.execute(update(BotStats).values(**values))
+
 class Storage:
     def __init__(self, database_url: str):
         self.engine = create_async_engine(database_url)
         self.Session = sessionmaker(self.engine, class_=AsyncSession)
+        # Адреса сохраненных постов: загружаются в init_db и пополняются при каждом сохранении
+        self._seen_urls: set[str] = set()
 
     async def init_db(self):
         async with self.engine.begin() as conn:
@@ -21,22 +55,44 @@ class Storage:
                 session.add(BotStats(start_time=datetime.now()))
                 await session.commit()
 
+            result = await session.execute(select(PostRecord.url))
+            self._seen_urls = set(result.scalars().all())
+
     async def is_post_exists(self, url: str) -> bool:
+        return url in await self.get_existing_urls([url])
+
+    async def get_existing_urls(self, urls: list[str]) -> set[str]:
+        """Адреса из urls, которые уже есть в базе.
+           Известные адреса берутся из памяти, остальные проверяются одним запросом WHERE url IN (...)
+           (на случай, если базу пополняет другой процесс); если все адреса известны, запроса нет.
+        """
+        existing = {url for url in urls if url in self._seen_urls}
+        misses = list(dict.fromkeys(url for url in urls if url not in existing))
+        if not misses:
+            return existing
+
         async with self.Session() as session:
-            stmt = select(PostRecord).where(PostRecord.url == url)
-            result = await session.execute(stmt)
-            post = result.scalar_one_or_none()
-            return post is not None
+            for start in range(0, len(misses), URL_QUERY_CHUNK):
+                result = await session.execute(
+                    select(PostRecord.url).where(PostRecord.url.in_(misses[start:start + URL_QUERY_CHUNK]))
+                )
+                found = set(result.scalars().all())
+                self._seen_urls.update(found)
+                existing.update(found)
+        return existing
 
-    async def save_post(self, url: str, published_at: datetime, hubs: list[str] = None):
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[UnitOfWork]:
         async with self.Session() as session:
-            new_post = PostRecord(
-                url=url,
-                published_at=published_at,
-                hubs=','.join(hubs) if hubs else None
-            )
-            session.add(new_post)
-            await session.commit()
+            async with session.begin():
+                uow = UnitOfWork(session)
+                yield uow
+        # Адреса попадают в индекс только после успешной фиксации транзакции
+        self._seen_urls.update(uow.saved_urls)
+
+    async def save_post(self, url: str, published_at: datetime, hubs: list[str] = None):
+        async with self.unit_of_work() as uow:
+            uow.save_post(url, published_at, hubs)
 
     async def get_posts_count(self) -> int:
         async with self.Session() as session:
@@ -58,17 +114,25 @@ class Storage:
             return result.scalar_one()
 
     async def update_stats(self, *, posts_processed: int = None, errors_count: int = None, last_check_time: datetime = None):
-        async with self.Session() as session:
-            stats = (await session.execute(select(BotStats))).scalar_one()
-            
-            if posts_processed is not None:
-                stats.posts_processed = posts_processed
-            if errors_count is not None:
-                stats.errors_count = errors_count
-            if last_check_time is not None:
-                stats.last_check_time = last_check_time
-            
-            await session.commit()
+        values = {}
+        if posts_processed is not None:
+            values['posts_processed'] = posts_processed
+        if errors_count is not None:
+            values['errors_count'] = errors_count
+        if last_check_time is not None:
+            values['last_check_time'] = last_check_time
+        if not values:
+            return
+        async with self.unit_of_work() as uow:
+            await uow.session.execute(update(BotStats).values(**values))
+
+    async def increment_stats(self, *, posts_processed: int = 0, errors_count: int = 0, last_check_time: datetime = None):
+        async with self.unit_of_work() as uow:
+            await uow.increment_stats(
+                posts_processed=posts_processed,
+                errors_count=errors_count,
+                last_check_time=last_check_time
+            )
 
     async def get_hubs_stats(self) -> dict[str, int]:
         async with self.Session() as session:
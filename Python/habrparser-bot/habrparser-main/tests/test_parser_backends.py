@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.parser_backends import FIXTURES_DIR, extract, load_fixtures
+from bot.services.html_backends import BACKENDS
+from bot.services.parser import ParserService
+
+FIXTURES = load_fixtures(FIXTURES_DIR)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    parser = ParserService(backend="bs4")
+    return {name: extract(parser, name, html) for name, html in FIXTURES.items()}
+
+
+def test_fixtures_cover_listing_and_posts(reference):
+    assert any(name.startswith("listing") for name in FIXTURES)
+    assert any(name.startswith("post") for name in FIXTURES)
+    posts = reference["listing.html"]
+    # Рекламная карточка без заголовка пропускается
+    assert [post["url"] for post in posts] == [f"https://habr.com/ru/news/88000{i}/" for i in (1, 2, 3)]
+    assert all(post["title"] and post["author"] for post in posts)
+    full_text, hubs, images = reference["post_880001.html"]
+    assert "Python 3.15" in full_text and "window.ads" not in full_text
+    assert hubs[0] == "Python"
+    assert len(images) == 2
+
+
+@pytest.mark.parametrize("backend", [name for name in BACKENDS if name != "bs4"])
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_backend_matches_bs4(reference, backend, name):
+    assert extract(ParserService(backend=backend), name, FIXTURES[name]) == reference[name]
@@ -0,0 +1,94 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import trading_strategy as strategy
+from rate_limiter import priority, BACKFILL
+
+BACKFILL_PAGE_SIZE = strategy.settings.get("backfill_page_size", 1000)
+BACKFILL_WORKERS = strategy.settings.get("backfill_workers", 4)
+
+
+def page_starts(start, end, timeframe_ms, page_size):
+    """Начала страниц по page_size свечей, покрывающих интервал [start, end)"""
+    step = timeframe_ms * page_size
+    return list(range(start, end, step))
+
+
+def fetch_page(symbol, timeframe, start, end, timeframe_ms, page_size):
+    """Свечи интервала [start, end) постранично через since; биржа может отдать меньше запрошенного"""
+    rows = []
+    since = start
+    while since < end:
+        ohlcv = strategy.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=page_size)
+        ohlcv = [row for row in ohlcv if since <= row[0] < end]
+        if not ohlcv:
+            break
+        rows.extend(ohlcv)
+        since = int(ohlcv[-1][0]) + timeframe_ms
+    return rows
+
+
+def backfill(symbol, timeframe, start, end=None, workers=BACKFILL_WORKERS, page_size=BACKFILL_PAGE_SIZE):
+    """Загрузка истории свечей [start, end) в history_store.
+       Интервал делится на страницы, которые загружаются параллельно в пуле потоков с приоритетом backfill
+       в общем лимите запросов. Каждая загруженная страница сразу сохраняется, поэтому после прерывания
+       повторный запуск загружает только недостающие страницы. Если история уже есть, загрузка продолжается
+       с ее последней свечи. Возвращает meta объединенной истории (количество, пропуски, дубликаты).
+    """
+    timeframe_ms = strategy.exchange.parse_timeframe(timeframe) * 1000
+    store = strategy.history_store
+    exchange_id = strategy.exchange.id
+    # Текущая незакрытая свеча в историю не попадает
+    end = int(strategy.candle_open_time(timeframe, end if end is not None else strategy.exchange.milliseconds()))
+    start = int(strategy.candle_open_time(timeframe, start))
+    meta = store.meta(exchange_id, symbol, timeframe)
+    if meta and meta["last"] is not None and meta["first"] <= start:
+        start = max(start, meta["last"] + timeframe_ms)
+
+    done = store.completed_parts(exchange_id, symbol, timeframe)
+    pending = [page for page in page_starts(start, end, timeframe_ms, page_size) if page not in done]
+    print(f"{symbol} {timeframe}: страниц к загрузке {len(pending)}, уже загружено {len(done)}")
+
+    def load(page):
+        with priority(BACKFILL):
+            rows = fetch_page(symbol, timeframe, page, min(page + timeframe_ms * page_size, end), timeframe_ms, page_size)
+        store.save_part(exchange_id, symbol, timeframe, page, rows)
+        return len(rows)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    futures = [pool.submit(load, page) for page in pending]
+    try:
+        for finished, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if finished % 10 == 0 or finished == len(pending):
+                print(f"  загружено страниц: {finished}/{len(pending)}")
+    except BaseException:
+        # При прерывании (Ctrl-C) или ошибке страницы из очереди отменяются, а не загружаются до конца интервала;
+        # уже начатые дозагружаются и сохраняются, и повторный запуск продолжит с них
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return store.merge_parts(exchange_id, symbol, timeframe, timeframe_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка глубокой истории свечей в колоночные файлы")
+    parser.add_argument("symbol", nargs="?", default=strategy.SYMBOL)
+    parser.add_argument("timeframe", nargs="?", default=strategy.TIMEFRAME)
+    parser.add_argument("--since", default="2020-01-01", help="Начало истории (дата UTC)")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args()
+
+    since = int(pd.Timestamp(args.since).value // 10**6)
+    try:
+        meta = backfill(args.symbol, args.timeframe, since, workers=args.workers)
+    except KeyboardInterrupt:
+        print("Прервано; начатые страницы дозагружаются, загруженные сохранены, повторный запуск продолжит загрузку.")
+        sys.exit(1)
+    print(f"Свечей в истории: {meta['count']}, дубликатов удалено: {meta['duplicates']}, пропусков: {len(meta['gaps'])}")
+    for gap_start, gap_end in meta["gaps"][:10]:
+        print(f"  пропуск: {pd.Timestamp(gap_start, unit='ms')} — {pd.Timestamp(gap_end, unit='ms')}")
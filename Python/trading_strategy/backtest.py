@@ -0,0 +1,245 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import talib
+
+import trading_strategy as strategy
+from trading_strategy import classify_scenarios, get_fgi_series, align_fgi
+
+
+def default_params():
+    """Параметры стратегии по умолчанию из текущих настроек; сетка перебора задает списки значений поверх них"""
+    return {
+        "fgi_threshold_low": strategy.FGI_THRESHOLD_LOW,
+        "fgi_threshold_high": strategy.FGI_THRESHOLD_HIGH,
+        "rsi_threshold_low": strategy.RSI_THRESHOLD_LOW,
+        "rsi_threshold_high": strategy.RSI_THRESHOLD_HIGH,
+        "rsi_period": strategy.RSI_PERIOD,
+        "ema_short_period": strategy.EMA_SHORT_PERIOD,
+        "ema_long_period": strategy.EMA_LONG_PERIOD,
+        "macd_fast": strategy.MACD_FAST,
+        "macd_slow": strategy.MACD_SLOW,
+        "macd_signal": strategy.MACD_SIGNAL,
+        "bollinger_period": strategy.BOLLINGER_PERIOD,
+        "bollinger_deviation": strategy.BOLLINGER_DEVIATION,
+        "support_resistance_window": strategy.SUPPORT_RESISTANCE_WINDOW,
+        "adx_period": strategy.ADX_PERIOD,
+        "success_threshold": strategy.SUCCESS_THRESHOLD,
+        "success_horizon": strategy.SUCCESS_HORIZON,
+        "min_confirmations": 3,
+    }
+
+
+# Значения по умолчанию, если параметра нет в settings.json; сами настройки читаются при каждом запуске
+BACKTEST_GRID = {
+    "rsi_threshold_low": [25, 30, 35],
+    "rsi_threshold_high": [65, 70, 75],
+    "success_horizon": [4, 8, 12],
+}
+BACKTEST_TRAIN_SIZE = 2000
+BACKTEST_TEST_SIZE = 500
+BACKTEST_MIN_TRADES = 10
+
+ARRAY_COLUMNS = ["high", "low", "close", "volume", "fgi"]
+
+# Массивы свечей в процессе-исполнителе (представления общей памяти) и кэш индикаторов
+_arrays = {}
+_shared_blocks = []
+_indicator_cache = {}
+
+
+def expand_grid(grid):
+    """Все комбинации параметров сетки поверх параметров по умолчанию"""
+    keys = list(grid)
+    defaults = default_params()
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(defaults)
+        params.update(zip(keys, values))
+        yield params
+
+
+def _attach_shared(specs):
+    """Инициализатор процесса: подключение к общей памяти без копирования массивов"""
+    for name, (block_name, length) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared_blocks.append(block)
+        _arrays[name] = np.ndarray((length,), dtype=np.float64, buffer=block.buf)
+
+
+def _indicator(name, *periods):
+    """Индикатор по всей истории; для одинаковых периодов считается один раз на процесс"""
+    key = (name,) + periods
+    if key not in _indicator_cache:
+        high, low, close = _arrays["high"], _arrays["low"], _arrays["close"]
+        if name == "rsi":
+            value = talib.RSI(close, timeperiod=periods[0])
+        elif name == "ema":
+            value = talib.EMA(close, timeperiod=periods[0])
+        elif name == "macd":
+            value = talib.MACD(close, fastperiod=periods[0], slowperiod=periods[1], signalperiod=periods[2])[:2]
+        elif name == "bbands":
+            value = talib.BBANDS(close, timeperiod=periods[0], nbdevup=periods[1], nbdevdn=periods[1], matype=0)
+        elif name == "adx":
+            value = talib.ADX(high, low, close, timeperiod=periods[0])
+        elif name == "levels":
+            window = pd.Series(close).rolling(periods[0] * 2)
+            value = (window.min().to_numpy(), window.max().to_numpy())
+        _indicator_cache[key] = value
+    return _indicator_cache[key]
+
+
+def simulate(params):
+    """Сигналы стратегии по всей истории при заданных параметрах.
+       Возвращает массивы: направление сделки (1 — покупка, -1 — продажа, 0 — нет сделки),
+       успех сделки и доходность сделки через success_horizon свечей.
+    """
+    close, volume, fgi = _arrays["close"], _arrays["volume"], _arrays["fgi"]
+    horizon = params["success_horizon"]
+
+    rsi = _indicator("rsi", params["rsi_period"])
+    ema_short = _indicator("ema", params["ema_short_period"])
+    ema_long = _indicator("ema", params["ema_long_period"])
+    macd, macd_signal = _indicator("macd", params["macd_fast"], params["macd_slow"], params["macd_signal"])
+    bb_upper, _, bb_lower = _indicator("bbands", params["bollinger_period"], float(params["bollinger_deviation"]))
+    adx = _indicator("adx", params["adx_period"])
+    support, resistance = _indicator("levels", params["support_resistance_window"])
+
+    scenario = classify_scenarios(fgi, rsi, params["fgi_threshold_low"], params["fgi_threshold_high"],
+                                  params["rsi_threshold_low"], params["rsi_threshold_high"])
+    is_long = (scenario == "long") | (scenario == "divergence_long")
+    is_short = (scenario == "short") | (scenario == "divergence_short")
+
+    prev_volume = np.concatenate([[0.0], volume[:-1]])
+    volume_confirmed = volume > prev_volume * 1.2
+    with np.errstate(invalid="ignore"):
+        long_confirmed = (volume_confirmed.astype(int) + (ema_short > ema_long) + (macd > macd_signal)
+                          + (close <= bb_lower) + (np.abs(close - support) / close < 0.02))
+        short_confirmed = (volume_confirmed.astype(int) + (ema_short < ema_long) + (macd < macd_signal)
+                           + (close >= bb_upper) + (np.abs(close - resistance) / close < 0.02))
+
+    valid = ~(np.isnan(rsi) | np.isnan(macd_signal) | np.isnan(bb_upper) | np.isnan(adx) | np.isnan(ema_long))
+    direction = np.zeros(len(close), dtype=np.int8)
+    direction[valid & is_long & (long_confirmed >= params["min_confirmations"])] = 1
+    direction[valid & is_short & (short_confirmed >= params["min_confirmations"])] = -1
+
+    trade_return = np.full(len(close), np.nan)
+    trade_return[:-horizon] = (close[horizon:] - close[:-horizon]) / close[:-horizon] * direction[:-horizon]
+    success = trade_return >= params["success_threshold"]
+    return direction, success, trade_return
+
+
+def metrics(direction, success, trade_return, start, end, horizon):
+    """Успешность, количество сделок и матожидание доходности на отрезке [start, end).
+       Учитываются только сделки, исход которых известен внутри отрезка.
+    """
+    last = max(start, end - horizon)
+    trades = direction[start:last] != 0
+    count = int(trades.sum())
+    if count == 0:
+        return {"trades": 0, "success_rate": np.nan, "expectancy": np.nan}
+    return {
+        "trades": count,
+        "success_rate": float(success[start:last][trades].mean()),
+        "expectancy": float(trade_return[start:last][trades].mean()),
+    }
+
+
+def _run_combination(params, segments):
+    direction, success, trade_return = simulate(params)
+    return [metrics(direction, success, trade_return, start, end, params["success_horizon"])
+            for start, end in segments]
+
+
+def walk_forward_segments(length, train_size=None, test_size=None):
+    """Скользящие пары отрезков (обучение, проверка), идущие друг за другом без пересечения"""
+    train_size = train_size or strategy.settings.get("backtest_train_size", BACKTEST_TRAIN_SIZE)
+    test_size = test_size or strategy.settings.get("backtest_test_size", BACKTEST_TEST_SIZE)
+    segments = []
+    start = 0
+    while start + train_size + test_size <= length:
+        segments.append(((start, start + train_size), (start + train_size, start + train_size + test_size)))
+        start += test_size
+    return segments
+
+
+def run_backtest(df, fgi_values, grid=None, workers=None, train_size=None, test_size=None, min_trades=None):
+    """Перебор сетки параметров в пуле процессов с проверкой walk-forward.
+       Массивы свечей и FGI размещаются в общей памяти один раз и не копируются в процессы.
+       Возвращает (results, walk_forward): метрики каждой комбинации на всей истории
+       и для каждого окна — лучшую на обучении комбинацию и ее результат на проверке.
+    """
+    settings = strategy.settings
+    grid = grid or settings.get("backtest_grid", BACKTEST_GRID)
+    workers = workers or settings.get("backtest_workers") or os.cpu_count()
+    min_trades = settings.get("backtest_min_trades", BACKTEST_MIN_TRADES) if min_trades is None else min_trades
+    combinations = list(expand_grid(grid))
+    length = len(df)
+    folds = walk_forward_segments(length, train_size, test_size)
+    segments = [(0, length)] + [segment for fold in folds for segment in fold]
+
+    columns = {name: df[name].to_numpy(dtype=np.float64) for name in ARRAY_COLUMNS[:-1]}
+    columns["fgi"] = np.asarray(fgi_values, dtype=np.float64)
+    blocks = []
+    try:
+        specs = {}
+        for name, values in columns.items():
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+            blocks.append(block)
+            specs[name] = (block.name, length)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared, initargs=(specs,)) as pool:
+            chunksize = max(1, len(combinations) // (workers * 4))
+            results = list(pool.map(_run_combination, combinations, itertools.repeat(segments), chunksize=chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    rows = []
+    for params, result in zip(combinations, results):
+        rows.append({**{key: params[key] for key in grid}, **result[0]})
+    summary = pd.DataFrame(rows).sort_values("expectancy", ascending=False).reset_index(drop=True)
+
+    fold_rows = []
+    for fold_index, ((train_start, _), (test_start, test_end)) in enumerate(folds):
+        train = [result[1 + fold_index * 2] for result in results]
+        test = [result[2 + fold_index * 2] for result in results]
+        candidates = [i for i, m in enumerate(train) if m["trades"] >= min_trades]
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda i: train[i]["expectancy"])
+        fold_rows.append({
+            "fold": fold_index,
+            "train_start": str(df["timestamp"].iloc[train_start]),
+            "test_start": str(df["timestamp"].iloc[test_start]),
+            **{key: combinations[best][key] for key in grid},
+            **{f"train_{key}": value for key, value in train[best].items()},
+            **{f"test_{key}": value for key, value in test[best].items()},
+        })
+    return summary, pd.DataFrame(fold_rows)
+
+
+if __name__ == "__main__":
+    symbol = sys.argv[1] if len(sys.argv) > 1 else strategy.SYMBOL
+    timeframe = sys.argv[2] if len(sys.argv) > 2 else strategy.TIMEFRAME
+    candles = strategy.candle_store.load(strategy.exchange.id, symbol, timeframe)
+    # Глубокая история из backfill.py дополняет хранилище более ранними свечами
+    history = strategy.history_store.meta(strategy.exchange.id, symbol, timeframe)
+    if history:
+        candles = strategy._with_history(symbol, timeframe, candles, len(candles) + history["count"])
+    if candles.empty:
+        print(f"Нет сохраненных свечей для {symbol} {timeframe}.")
+        sys.exit(1)
+    fgi = align_fgi(candles["timestamp"], get_fgi_series())
+    summary, folds = run_backtest(candles, fgi)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(f"=== {symbol} {timeframe}: {len(candles)} свечей, {len(summary)} комбинаций ===")
+        print(summary.head(20).to_string(index=False))
+        print("\n=== Walk-forward ===")
+        print(folds.to_string(index=False) if not folds.empty else "Недостаточно данных для walk-forward.")
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import talib
+
+import trading_strategy as ts
+from candle_store import CandleStore
+from signal_ledger import SignalLedger
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def synthetic_ohlcv(n, timeframe="4h", seed=0):
+    """Случайное блуждание цены в формате ccxt: [[timestamp, open, high, low, close, volume], ...]"""
+    rng = np.random.default_rng(seed)
+    timeframe_ms = ts.exchange.parse_timeframe(timeframe) * 1000
+    start = 1_500_000_000_000
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    volume = rng.uniform(100, 10000, n)
+    timestamps = start + np.arange(n, dtype=np.int64) * timeframe_ms
+    return np.column_stack([timestamps, open_, high, low, close, volume]).tolist()
+
+
+def synthetic_fgi(start, end, seed=0):
+    """Дневной ряд FGI (0-100), покрывающий интервал [start, end]"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(pd.Timestamp(start).floor("D"), pd.Timestamp(end).floor("D"), freq="D")
+    values = np.clip(50 + np.cumsum(rng.normal(0, 5, len(days))), 0, 100).astype(int)
+    return pd.Series(values, index=days, name="fgi")
+
+
+def to_frame(ohlcv):
+    df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype('int64'), unit='ms')
+    return df
+
+
+class StubExchange:
+    """Биржа без сети: отдает заранее сгенерированные свечи до текущего момента cursor"""
+
+    id = "stub"
+
+    def __init__(self, ohlcv, timeframe_ms):
+        self.ohlcv = ohlcv
+        self.timestamps = np.array([row[0] for row in ohlcv], dtype=np.int64)
+        self.timeframe_ms = timeframe_ms
+        self.cursor = len(ohlcv)
+
+    def parse_timeframe(self, timeframe):
+        return self.timeframe_ms // 1000
+
+    def milliseconds(self):
+        return int(self.timestamps[self.cursor - 1]) + 1000
+
+    def load_markets(self):
+        return {}
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        available = self.ohlcv[:self.cursor]
+        if since is None:
+            return available[-limit:] if limit else available
+        start = int(np.searchsorted(self.timestamps[:self.cursor], since))
+        return available[start:start + limit] if limit else available[start:]
+
+
+def measure(func, repeat):
+    """Время выполнения func в секундах: минимум, медиана и среднее по repeat запускам"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {"min": min(timings), "median": statistics.median(timings), "mean": statistics.fmean(timings), "repeat": repeat}
+
+
+def bench_indicators(df, repeat):
+    return {
+        "calculate_rsi": measure(lambda: ts.calculate_rsi(df, ts.RSI_PERIOD), repeat),
+        "calculate_ema": measure(lambda: ts.calculate_ema(df, ts.EMA_SHORT_PERIOD, ts.EMA_LONG_PERIOD), repeat),
+        "calculate_macd": measure(lambda: ts.calculate_macd(df, ts.MACD_FAST, ts.MACD_SLOW, ts.MACD_SIGNAL), repeat),
+        "calculate_bollinger_bands": measure(lambda: ts.calculate_bollinger_bands(df, ts.BOLLINGER_PERIOD, ts.BOLLINGER_DEVIATION), repeat),
+        "calculate_adx": measure(lambda: ts.calculate_adx(df, ts.ADX_PERIOD), repeat),
+        "calculate_support_resistance": measure(lambda: ts.calculate_support_resistance(df, ts.SUPPORT_RESISTANCE_WINDOW), repeat),
+    }
+
+
+def bench_history(df, fgi_values, repeat):
+    previous_limit = ts.HISTORICAL_DATA_LIMIT
+    ts.HISTORICAL_DATA_LIMIT = len(df)
+    try:
+        return {"analyze_historical_signals": measure(lambda: ts.analyze_historical_signals(df, fgi_values), repeat)}
+    finally:
+        ts.HISTORICAL_DATA_LIMIT = previous_limit
+
+
+def bench_full_run(ohlcv, fgi_series, timeframe, repeat):
+    """Полный запуск trading_strategy с историей из n свечей на заглушке биржи и временном хранилище.
+       cold — первый запуск с пустым хранилищем, warm — последующие запуски с догрузкой одной новой свечи.
+    """
+    stub = StubExchange(ohlcv, ts.exchange.parse_timeframe(timeframe) * 1000)
+    previous = ts.exchange, ts.candle_store, ts.signal_ledger, ts.HISTORICAL_DATA_LIMIT
+    with tempfile.TemporaryDirectory() as tmp:
+        ts.exchange = stub
+        ts.candle_store = CandleStore(os.path.join(tmp, "candles.db"))
+        ts.signal_ledger = SignalLedger(os.path.join(tmp, "signals.db"))
+        ts.HISTORICAL_DATA_LIMIT = len(ohlcv) - repeat
+        try:
+            stub.cursor = len(ohlcv) - repeat
+            cold = measure(lambda: ts.trading_strategy("BENCHUSDT", timeframe, fgi_series=fgi_series), 1)
+
+            def warm_run():
+                stub.cursor += 1
+                ts.trading_strategy("BENCHUSDT", timeframe, fgi_series=fgi_series)
+
+            stub.cursor = len(ohlcv) - repeat
+            warm = measure(warm_run, repeat)
+        finally:
+            ts.exchange, ts.candle_store, ts.signal_ledger, ts.HISTORICAL_DATA_LIMIT = previous
+    return {"trading_strategy_cold": cold, "trading_strategy_warm": warm}
+
+
+def run(sizes=DEFAULT_SIZES, repeat=5, timeframe="4h", full_run=True):
+    results = {}
+    for n in sizes:
+        print(f"Бенчмарк: {n} свечей...")
+        ohlcv = synthetic_ohlcv(n, timeframe)
+        df = to_frame(ohlcv)
+        fgi_series = synthetic_fgi(df['timestamp'].iloc[0], df['timestamp'].iloc[-1])
+        fgi_values = ts.align_fgi(df['timestamp'], fgi_series)
+        results[str(n)] = {
+            **bench_indicators(df, repeat),
+            **bench_history(df, fgi_values, repeat),
+            "align_fgi": measure(lambda: ts.align_fgi(df['timestamp'], fgi_series), repeat),
+        }
+        if full_run:
+            results[str(n)].update(bench_full_run(ohlcv, fgi_series, timeframe, repeat))
+    return {
+        "meta": {
+            "created_at": pd.Timestamp.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "talib": talib.__version__,
+            "timeframe": timeframe,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=1.2):
+    """Сравнение медиан с базовым файлом; замедление больше threshold раз отмечается как регрессия"""
+    regressions = []
+    for size, benchmarks in current["results"].items():
+        for name, timing in benchmarks.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = timing["median"] / base["median"] if base["median"] else float("inf")
+            mark = "⚠️ регрессия" if ratio > threshold else ""
+            print(f"{size:>8} {name:32s} {base['median'] * 1000:10.3f} мс -> {timing['median'] * 1000:10.3f} мс  x{ratio:.2f} {mark}")
+            if ratio > threshold:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def print_results(data):
+    for size, benchmarks in data["results"].items():
+        print(f"\n=== {size} свечей ===")
+        for name, timing in benchmarks.items():
+            print(f"{name:32s} медиана {timing['median'] * 1000:10.3f} мс, минимум {timing['min'] * 1000:10.3f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих участков trading_strategy.py на синтетических данных")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Количество свечей")
+    parser.add_argument("--repeat", type=int, default=5, help="Количество повторов каждого замера")
+    parser.add_argument("--timeframe", default="4h")
+    parser.add_argument("--no-full-run", action="store_true", help="Не замерять полный запуск trading_strategy")
+    parser.add_argument("--output", default="benchmark_baseline.json", help="Файл для сохранения результатов")
+    parser.add_argument("--compare", help="Базовый JSON для сравнения")
+    args = parser.parse_args()
+
+    data = run(args.sizes, args.repeat, args.timeframe, full_run=not args.no_full_run)
+    print_results(data)
+    with open(args.output, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nРезультаты сохранены в {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\n=== Сравнение с базой ===")
+        regressions = compare(data, baseline)
+        if regressions:
+            raise SystemExit(1)
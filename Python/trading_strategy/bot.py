@@ -1,14 +1,21 @@
 import sys
 import asyncio
+import html
 import logging
-import io
 import os
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command, Filter
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
 from aiogram.client.default import DefaultBotProperties
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from candle_scheduler import CandleCloseScheduler
+from correlation import ScenarioClusterMonitor, format_clusters, format_regime, scenario_clusters
+from engine import StrategyEngine
+from profiling import span
+from report import render_timeframes
+from scanner import format_scan_table
+from send_queue import SendQueue
+from subscriptions import SubscriptionStore
 
 # Если бот запускается на Windows, переключаемся на SelectorEventLoop
 if sys.platform.startswith("win"):
@@ -26,8 +33,23 @@ logging.basicConfig(level=logging.INFO)
 bot = Bot(token=API_TOKEN, default=DefaultBotProperties(parse_mode='HTML'))
 dp = Dispatcher()
 
-# Глобальная переменная для хранения торговой пары
-trading_pair = "BTCUSDT"
+# Торговая пара по умолчанию для чатов, которые еще не выбрали свою
+DEFAULT_PAIR = "BTCUSDT"
+
+# Движок стратегии: один на все время работы бота, прогревается в main() до начала опроса
+engine = StrategyEngine()
+
+# Подписки чатов на пары (символ, таймфрейм) и выбранная в каждом чате пара
+subscriptions = SubscriptionStore(engine.setting("subscriptions_path", "subscriptions.db"))
+
+# Очередь отправки автоматических сигналов подписчикам с учетом ограничений Telegram
+send_queue = SendQueue(lambda chat_id, text: bot.send_message(chat_id, text),
+                       rate=engine.setting("telegram_rate_per_second", 25),
+                       chat_interval=engine.setting("telegram_chat_interval", 1.0))
+
+# Предупреждения о том, что много пар одновременно выдали один и тот же сценарий
+# (пороги scenario_alert_share и scenario_alert_min_pairs читаются из настроек при каждой проверке)
+scenario_monitor = ScenarioClusterMonitor()
 
 # Главное меню с кнопками
 main_keyboard = ReplyKeyboardMarkup(
@@ -68,70 +90,185 @@ async def change_trading_pair(message: types.Message):
 
 @dp.message(TextFilter(endswith="USDT", ignore_case=True))
 async def update_trading_pair(message: types.Message):
-    global trading_pair
     new_pair = message.text.strip().upper()
-    trading_pair = new_pair
-    await message.answer(f"Торговая пара обновлена на: {trading_pair}")
+    error = await asyncio.to_thread(engine.validate_pair, new_pair, engine.timeframe)
+    if error:
+        await message.answer(error)
+        return
+    # Подписка на прежнюю пару чата заменяется новой
+    previous_pair = subscriptions.chat_pair(message.chat.id, DEFAULT_PAIR)
+    if previous_pair != new_pair:
+        subscriptions.unsubscribe(message.chat.id, previous_pair, engine.timeframe)
+    subscriptions.set_chat_pair(message.chat.id, new_pair)
+    subscriptions.subscribe(message.chat.id, new_pair, engine.timeframe)
+    await message.answer(f"Торговая пара обновлена на: {new_pair}\n"
+                         f"Сигналы по закрытию свечи {engine.timeframe} будут приходить автоматически (/subscriptions).")
+
+def _pair_arguments(message):
+    """Символ и таймфрейм из команды вида /subscribe BTCUSDT 1h (таймфрейм по умолчанию — из настроек)"""
+    parts = message.text.split()[1:]
+    if not parts:
+        return None, None
+    return parts[0].upper(), parts[1] if len(parts) > 1 else engine.timeframe
+
+@dp.message(Command("subscribe"))
+async def subscribe(message: types.Message):
+    symbol, timeframe = _pair_arguments(message)
+    if symbol is None:
+        await message.answer("Использование: /subscribe BTCUSDT [таймфрейм]")
+        return
+    # Неверная пара или таймфрейм иначе сохранились бы в базе и ломали расписание после перезапуска
+    error = await asyncio.to_thread(engine.validate_pair, symbol, timeframe)
+    if error:
+        await message.answer(error)
+        return
+    subscriptions.subscribe(message.chat.id, symbol, timeframe)
+    await message.answer(f"Подписка оформлена: {symbol} {timeframe}")
+
+@dp.message(Command("unsubscribe"))
+async def unsubscribe(message: types.Message):
+    parts = message.text.split()[1:]
+    if not parts:
+        await message.answer("Использование: /unsubscribe BTCUSDT [таймфрейм]")
+        return
+    removed = subscriptions.unsubscribe(message.chat.id, parts[0].upper(), parts[1] if len(parts) > 1 else None)
+    await message.answer(f"Удалено подписок: {removed}")
+
+@dp.message(Command("subscriptions"))
+async def list_subscriptions(message: types.Message):
+    pairs = subscriptions.for_chat(message.chat.id)
+    if not pairs:
+        await message.answer("Подписок нет. Оформить: /subscribe BTCUSDT [таймфрейм]")
+        return
+    await message.answer("Подписки:\n" + "\n".join(f"• {symbol} {timeframe}" for symbol, timeframe in pairs))
+
+async def send_report(send, report):
+    """Форматирование отчета и отправка частями; время этапов попадает в статистику /profile"""
+    timings = {}
+    with span(timings, "render"):
+        output = report.render_html(explanations=engine.show_explanations)
+    # Отправляем вывод частями (ограничение Telegram – 4096 символов)
+    with span(timings, "telegram"):
+        for chunk in [output[i:i+4096] for i in range(0, len(output), 4096)]:
+            await send(chunk)
+    engine.profiler.record(timings)
 
 @dp.message(TextFilter(equals="Запустить скрипт"))
 async def force_run_script(message: types.Message):
     await message.answer("Запускаю скрипт...")
     try:
-        from trading_strategy import trading_strategy, TIMEFRAME
-        buffer = io.StringIO()
-        old_stdout = sys.stdout
-        sys.stdout = buffer
-        try:
-            # Запускаем синхронную функцию в отдельном потоке, чтобы не блокировать бота
-            # Python 3.8
-            # loop = asyncio.get_running_loop()
-            # await loop.run_in_executor(None, trading_strategy, trading_pair, TIMEFRAME)
-            # Запускаем торговую стратегию в отдельном потоке
-            await asyncio.to_thread(trading_strategy, trading_pair, TIMEFRAME)
-        finally:
-            sys.stdout = old_stdout
-        output = buffer.getvalue()
-        if not output:
-            output = "Скрипт выполнен, но не было вывода."
-        # Отправляем вывод частями (ограничение Telegram – 4096 символов)
-        for chunk in [output[i:i+4096] for i in range(0, len(output), 4096)]:
-            await message.answer(chunk)
+        # Запускаем синхронную функцию в отдельном потоке, чтобы не блокировать бота.
+        # Стратегия возвращает отчет, а не печатает его, поэтому запуски не мешают друг другу
+        # Анализируется последняя закрытая свеча: нажатия и запуск по расписанию по ее закрытию разделяют один отчет
+        pair = subscriptions.chat_pair(message.chat.id, DEFAULT_PAIR)
+        report = await asyncio.to_thread(engine.analyze, pair)
+        await send_report(message.answer, report)
     except Exception as e:
         await message.answer(f"Ошибка при выполнении скрипта: {e}")
 
-# Функция, запускаемая по расписанию
-async def scheduled_run():
+@dp.message(Command("timeframes"))
+async def timeframes_summary(message: types.Message):
+    # Сводка сигналов пары чата (или указанной) по всем таймфреймам confirm_timeframes
+    parts = message.text.split()[1:]
+    pair = parts[0].upper() if parts else subscriptions.chat_pair(message.chat.id, DEFAULT_PAIR)
+    error = await asyncio.to_thread(engine.validate_pair, pair)
+    if error:
+        await message.answer(error)
+        return
+    await message.answer(f"Анализирую {pair} на нескольких таймфреймах...")
     try:
-        # Уведомляем администратора о запуске по расписанию
-        await bot.send_message(ADMIN_CHAT_ID, "⏰ <b>Автоматический запуск скрипта по расписанию</b> начался.")
-        from trading_strategy import trading_strategy, TIMEFRAME
-        buffer = io.StringIO()
-        old_stdout = sys.stdout
-        sys.stdout = buffer
-        try:
-            # Запускаем синхронную функцию в отдельном потоке, чтобы не блокировать бота
-            # Python 3.8
-            # loop = asyncio.get_running_loop()
-            # await loop.run_in_executor(None, trading_strategy, trading_pair, TIMEFRAME)
-            # Запускаем торговую стратегию в отдельном потоке
-            await asyncio.to_thread(trading_strategy, trading_pair, TIMEFRAME)
-        finally:
-            sys.stdout = old_stdout
-        output = buffer.getvalue()
-        if not output:
-            output = "Скрипт выполнен, но не было вывода."
-        for chunk in [output[i:i+4096] for i in range(0, len(output), 4096)]:
-            await bot.send_message(ADMIN_CHAT_ID, chunk, parse_mode="HTML")
+        reports = await asyncio.to_thread(engine.analyze_timeframes, pair)
+        await message.answer(render_timeframes(reports))
     except Exception as e:
-        await bot.send_message(ADMIN_CHAT_ID, f"Ошибка при автоматическом запуске скрипта: {e}")
+        await message.answer(f"Ошибка при анализе по таймфреймам: {e}")
+
+@dp.message(Command("scan"))
+async def scan_pairs(message: types.Message):
+    await message.answer("Сканирую торговые пары...")
+    try:
+        # Пары анализируются параллельно в пуле потоков внутри scan
+        table = await asyncio.to_thread(engine.scan)
+        await message.answer(f"<pre>{format_scan_table(table, top=20)}</pre>")
+        if not table.empty:
+            clusters = scenario_clusters(dict(zip(table["symbol"], table["scenario"])))
+            if clusters:
+                await message.answer(format_clusters(clusters))
+    except Exception as e:
+        await message.answer(f"Ошибка при сканировании: {e}")
+
+@dp.message(Command("market"))
+async def market_regime(message: types.Message):
+    # Корреляции доходностей и волатильность пар сканера и подписок на основном таймфрейме
+    symbols = list(engine.setting("scanner_symbols", []))
+    symbols += [symbol for symbol, timeframe in subscriptions.pairs() if timeframe == engine.timeframe and symbol not in symbols]
+    if len(symbols) < 2:
+        await message.answer("Для корреляций нужно хотя бы две пары (scanner_symbols или подписки).")
+        return
+    try:
+        tracker = await asyncio.to_thread(engine.market_regime, symbols)
+        await message.answer(f"<pre>{html.escape(format_regime(tracker))}</pre>")
+    except Exception as e:
+        await message.answer(f"Ошибка при расчете корреляций: {e}")
+
+@dp.message(Command("limits"))
+async def show_limits(message: types.Message):
+    # Сколько запросов к бирже выполнено и сколько времени они ждали общий лимит, по классам приоритета
+    await message.answer(f"<pre>{engine.rate_limit_stats()}</pre>")
+
+@dp.message(Command("profile"))
+async def show_profile(message: types.Message):
+    # Только для администратора: p50/p95 по этапам последних запусков, "/profile dump" — разовый запуск под cProfile
+    if message.chat.id != ADMIN_CHAT_ID:
+        return
+    if message.text.strip().endswith("dump"):
+        try:
+            pair = subscriptions.chat_pair(message.chat.id, DEFAULT_PAIR)
+            path, text = await asyncio.to_thread(engine.profile_once, pair)
+            await message.answer(f"Профиль сохранен в {path}\n<pre>{html.escape(text[:3500])}</pre>")
+        except Exception as e:
+            await message.answer(f"Ошибка при профилировании: {e}")
+        return
+    await message.answer(f"<pre>{engine.profiler.format_summary()}</pre>")
+
+# Пары, анализируемые автоматически по закрытию свечи: каждая пара с подписчиками — один раз,
+# сколько бы чатов на нее ни подписалось
+def watched_pairs():
+    return subscriptions.pairs()
+
+# Функция, вызываемая планировщиком после закрытия свечи: отчет форматируется один раз
+# и ставится в очередь отправки всем подписчикам пары
+async def scheduled_run(symbol, timeframe, report):
+    timings = {}
+    with span(timings, "render"):
+        output = report.render_html(explanations=engine.show_explanations)
+        chunks = [f"⏰ <b>Автоматический запуск по закрытию свечи</b> {symbol} {timeframe}"]
+        chunks += [output[i:i+4096] for i in range(0, len(output), 4096)]
+    engine.profiler.record(timings)
+    send_queue.put_many(subscriptions.subscribers(symbol, timeframe), chunks)
+    if report.ok:
+        # Доля пар с одинаковым сценарием считается от всех пар таймфрейма, проанализированных по этой свече
+        total = sum(1 for _, pair_timeframe in subscriptions.pairs() if pair_timeframe == timeframe)
+        clusters = scenario_monitor.add(timeframe, report.candle_timestamp, symbol, report.scenario, total)
+        if clusters:
+            send_queue.put(ADMIN_CHAT_ID, f"{timeframe}:\n{format_clusters(clusters)}")
 
 async def main():
-    # Инициализируем планировщик задач (timezone UTC)
-    scheduler = AsyncIOScheduler(timezone="UTC")
-    # Планируем задачу: 23:50, 03:50, 07:50, 11:50, 15:50, 19:50 UTC
-    scheduler.add_job(scheduled_run, 'cron', hour='23,3,7,11,15,19', minute=50)
-    scheduler.start()
-    await dp.start_polling(bot)
+    # Прогрев движка до начала опроса: первый запуск отвечает так же быстро, как последующие
+    try:
+        await asyncio.to_thread(engine.start)
+    except Exception as e:
+        logging.warning(f"Не удалось прогреть движок стратегии: {e}")
+    # Администратор получает сигналы по паре по умолчанию, пока подписок нет ни у кого
+    if subscriptions.is_empty():
+        subscriptions.subscribe(ADMIN_CHAT_ID, DEFAULT_PAIR, engine.timeframe)
+    # Время запуска выводится из таймфрейма: анализ сразу после закрытия каждой свечи
+    scheduler = CandleCloseScheduler(engine, watched_pairs, scheduled_run)
+    tasks = [asyncio.create_task(scheduler.run()), asyncio.create_task(send_queue.run())]
+    try:
+        await dp.start_polling(bot)
+    finally:
+        for task in tasks:
+            task.cancel()
 
 if __name__ == "__main__":
     asyncio.run(main())
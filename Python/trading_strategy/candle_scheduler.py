@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+
+import pandas as pd
+
+import trading_strategy as strategy
+
+# Значения по умолчанию, если параметра нет в settings.json
+SCHEDULE_PREFETCH_LEAD = 10
+SCHEDULE_JITTER = 3
+SCHEDULE_RETRIES = 3
+SCHEDULE_BACKOFF = 5
+
+
+def candle_close_time(timeframe, timestamp_ms):
+    """Время закрытия (мс) свечи таймфрейма timeframe, в которую попадает момент timestamp_ms"""
+    opened = strategy.candle_open_time(timeframe, timestamp_ms)
+    if timeframe.endswith('M'):
+        return (pd.Timestamp(opened, unit='ms') + pd.DateOffset(months=1)).value // 10**6
+    return opened + strategy.exchange.parse_timeframe(timeframe) * 1000
+
+
+class CandleCloseScheduler:
+    """Запуск анализа по закрытию свечи для каждой отслеживаемой пары и ее таймфрейма.
+       За prefetch_lead секунд до закрытия данные догружаются (engine.prefetch), сразу после закрытия
+       (плюс случайная задержка до jitter секунд, пока биржа формирует свечу) выполняется анализ
+       по закрытой свече. При ошибке анализ повторяется до retries раз с удваивающейся паузой.
+       watches — функция, возвращающая список пар (символ, таймфрейм); вызывается не реже раза в poll_interval
+       секунд. Ошибка одной пары или одного цикла пишется в лог и не останавливает планировщик.
+       on_report — корутина on_report(symbol, timeframe, report) для отправки результата.
+    """
+
+    def __init__(self, engine, watches, on_report, prefetch_lead=None,
+                 jitter=None, retries=None, backoff=None, poll_interval=60):
+        self.engine = engine
+        self.watches = watches
+        self.on_report = on_report
+        # None — значение schedule_* из текущих настроек: перезагрузка settings.json подхватывается без перезапуска
+        self._prefetch_lead = prefetch_lead
+        self._jitter = jitter
+        self._retries = retries
+        self._backoff = backoff
+        # Дольше этого планировщик не спит: список пар перечитывается, и новые подписки не ждут далекого закрытия
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _setting(value, key, default):
+        return value if value is not None else strategy.settings.get(key, default)
+
+    @property
+    def prefetch_lead(self):
+        return self._setting(self._prefetch_lead, "schedule_prefetch_lead", SCHEDULE_PREFETCH_LEAD)
+
+    @property
+    def jitter(self):
+        return self._setting(self._jitter, "schedule_jitter", SCHEDULE_JITTER)
+
+    @property
+    def retries(self):
+        return self._setting(self._retries, "schedule_retries", SCHEDULE_RETRIES)
+
+    @property
+    def backoff(self):
+        return self._setting(self._backoff, "schedule_backoff", SCHEDULE_BACKOFF)
+
+    @staticmethod
+    async def _sleep_until(timestamp_ms):
+        delay = timestamp_ms / 1000 - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _next_closes(self, now):
+        """{(символ, таймфрейм): время закрытия текущей свечи}; пары с ошибкой (например, неизвестный таймфрейм) пропускаются"""
+        closes = {}
+        for symbol, timeframe in self.watches():
+            try:
+                closes[(symbol, timeframe)] = candle_close_time(timeframe, now)
+            except Exception as e:
+                print(f"Пропускаю {symbol} {timeframe} в расписании: {e}")
+        return closes
+
+    async def run(self):
+        while True:
+            try:
+                await self._cycle()
+            except Exception as e:
+                # Ошибка одного цикла не останавливает планировщик
+                print(f"Ошибка в цикле планировщика: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _cycle(self):
+        """Один шаг: сон не дольше poll_interval до ближайшей подготовки или подготовка, закрытие и анализ свечи"""
+        now = int(time.time() * 1000)
+        watches = self._next_closes(now)
+        if not watches:
+            await asyncio.sleep(self.poll_interval)
+            return
+        close = min(watches.values())
+        prefetch_at = close - self.prefetch_lead * 1000
+        if now < prefetch_at:
+            await asyncio.sleep(min(self.poll_interval, (prefetch_at - now) / 1000))
+            return
+        due = [watch for watch, watch_close in watches.items() if watch_close == close]
+
+        for symbol, timeframe in due:
+            try:
+                await asyncio.to_thread(self.engine.prefetch, symbol, timeframe)
+            except Exception as e:
+                print(f"Ошибка при подготовке данных {symbol} {timeframe}: {e}")
+
+        await self._sleep_until(close + random.uniform(0, self.jitter) * 1000)
+        await asyncio.gather(*(self._analyze(symbol, timeframe, close) for symbol, timeframe in due))
+
+    async def _analyze(self, symbol, timeframe, close):
+        """Анализ закрывшейся свечи с повторами; отчет передается в on_report даже после неудачных повторов"""
+        expected = pd.Timestamp(strategy.candle_open_time(timeframe, close - 1), unit='ms')
+        report = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                report = await asyncio.to_thread(self.engine.analyze, symbol, timeframe)
+            except Exception as e:
+                print(f"Ошибка при анализе {symbol} {timeframe} по закрытию свечи: {e}")
+                continue
+            # Закрытая свеча еще не получена с биржи — повторяем позже
+            if report.ok and report.candle_timestamp == expected:
+                break
+        if report is not None:
+            try:
+                await self.on_report(symbol, timeframe, report)
+            except Exception as e:
+                print(f"Ошибка при отправке отчета {symbol} {timeframe}: {e}")
@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+import pandas as pd
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+class CandleStore:
+    """Локальное хранилище свечей OHLCV в SQLite.
+       Свечи хранятся по ключу (биржа, символ, таймфрейм) и метке времени в миллисекундах,
+       поэтому повторная запись той же свечи (например, ещё не закрытой) просто её обновляет.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS candles ("
+                "exchange TEXT NOT NULL, symbol TEXT NOT NULL, timeframe TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, open REAL, high REAL, low REAL, close REAL, volume REAL, "
+                "PRIMARY KEY (exchange, symbol, timeframe, timestamp)) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def last_timestamp(self, exchange_id, symbol, timeframe):
+        """Метка времени (мс) последней сохранённой свечи или None, если свечей нет"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(timestamp) FROM candles WHERE exchange = ? AND symbol = ? AND timeframe = ?",
+                (exchange_id, symbol, timeframe),
+            ).fetchone()
+        return row[0] if row else None
+
+    def coverage(self, exchange_id, symbol, timeframe):
+        """(количество сохранённых свечей, метка времени первой из них или None)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*), MIN(timestamp) FROM candles WHERE exchange = ? AND symbol = ? AND timeframe = ?",
+                (exchange_id, symbol, timeframe),
+            ).fetchone()
+        return row[0], row[1]
+
+    def append(self, exchange_id, symbol, timeframe, ohlcv):
+        """Сохраняет свечи в формате ccxt: [[timestamp, open, high, low, close, volume], ...]"""
+        if not ohlcv:
+            return
+        rows = [(exchange_id, symbol, timeframe, int(c[0]), c[1], c[2], c[3], c[4], c[5]) for c in ohlcv]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def load(self, exchange_id, symbol, timeframe, limit=None):
+        """Последние limit свечей (или все) в хронологическом порядке, в том же виде, что и fetch_ohlcv"""
+        query = ("SELECT timestamp, open, high, low, close, volume FROM candles "
+                 "WHERE exchange = ? AND symbol = ? AND timeframe = ? ORDER BY timestamp DESC")
+        params = [exchange_id, symbol, timeframe]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        rows.reverse()
+        df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
@@ -0,0 +1,262 @@
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import trading_strategy as strategy
+from rate_limiter import priority, SCAN
+from scanner import DIRECTIONAL_SCENARIOS
+
+# Значения по умолчанию, если параметра нет в settings.json; сами настройки читаются при каждом вызове,
+# чтобы учитывать их перезагрузку
+CORRELATION_WINDOW = 50
+SCENARIO_ALERT_SHARE = 0.5
+SCENARIO_ALERT_MIN_PAIRS = 3
+
+
+def correlation_window():
+    return strategy.settings.get("correlation_window", CORRELATION_WINDOW)
+
+
+class RollingCorrelation:
+    """Скользящие ковариация, корреляция и волатильность логарифмических доходностей N пар за window свечей.
+       Хранятся суммы доходностей и матрица сумм попарных произведений: каждая новая свеча прибавляет
+       свой вектор доходностей и вычитает вектор, вышедший из окна, — O(N²) на свечу вместо O(window·N²).
+       Раз в window свечей суммы пересчитываются из буфера заново, чтобы не накапливалась ошибка округления.
+    """
+
+    def __init__(self, symbols, window=None):
+        window = window or correlation_window()
+        self.symbols = list(symbols)
+        self.window = window
+        size = len(self.symbols)
+        self._returns = np.zeros((window, size))
+        self._sums = np.zeros(size)
+        self._cross = np.zeros((size, size))
+        self._position = 0
+        self._updates = 0
+        self.count = 0
+        self.last_timestamp = None
+        self.last_closes = None
+        self._lock = threading.Lock()
+
+    def update(self, timestamp_ms, closes):
+        """Добавление закрытой свечи: closes — цены закрытия пар в порядке symbols (NaN — свечи нет).
+           У пары без свечи доходность считается нулевой, а цена переносится с предыдущей свечи.
+        """
+        closes = np.asarray(closes, dtype=float)
+        with self._lock:
+            if self.last_timestamp is not None and timestamp_ms <= self.last_timestamp:
+                return False
+            self.last_timestamp = timestamp_ms
+            if self.last_closes is None:
+                self.last_closes = closes
+                return True
+            with np.errstate(divide="ignore", invalid="ignore"):
+                returns = np.log(closes / self.last_closes)
+            returns = np.where(np.isfinite(returns), returns, 0.0)
+            self.last_closes = np.where(np.isnan(closes), self.last_closes, closes)
+
+            if self.count == self.window:
+                old = self._returns[self._position]
+                self._sums -= old
+                self._cross -= np.outer(old, old)
+            self._returns[self._position] = returns
+            self._sums += returns
+            self._cross += np.outer(returns, returns)
+            self._position = (self._position + 1) % self.window
+            self.count = min(self.count + 1, self.window)
+            self._updates += 1
+            if self._updates % self.window == 0:
+                filled = self._returns[:self.count]
+                self._sums = filled.sum(axis=0)
+                self._cross = filled.T @ filled
+            return True
+
+    def extend(self, closes):
+        """Добавление свечей из DataFrame: индекс — время открытия свечи, столбцы — пары (как load_closes).
+           Свечи, которые уже учтены, пропускаются. Возвращает количество добавленных свечей.
+        """
+        closes = closes.reindex(columns=self.symbols)
+        timestamps = closes.index.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        values = closes.to_numpy(dtype=float)
+        added = 0
+        for timestamp, row in zip(timestamps, values):
+            added += self.update(int(timestamp), row)
+        return added
+
+    def covariance(self):
+        """Матрица ковариаций доходностей за окно (NaN, пока в окне меньше двух доходностей)"""
+        with self._lock:
+            count, sums, cross = self.count, self._sums.copy(), self._cross.copy()
+        if count < 2:
+            return np.full(cross.shape, np.nan)
+        mean = sums / count
+        return (cross - count * np.outer(mean, mean)) / (count - 1)
+
+    def volatility(self):
+        """Стандартное отклонение доходности за свечу по каждой паре"""
+        return np.sqrt(np.maximum(np.diag(self.covariance()), 0.0))
+
+    def correlation(self):
+        """Матрица корреляций доходностей; у пары с нулевой волатильностью корреляции — NaN"""
+        covariance = self.covariance()
+        volatility = np.sqrt(np.maximum(np.diag(covariance), 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.outer(volatility, volatility)
+        correlation[~np.isfinite(correlation)] = np.nan
+        np.fill_diagonal(correlation, np.where(volatility > 0, 1.0, np.nan))
+        return np.clip(correlation, -1.0, 1.0)
+
+    def correlation_frame(self):
+        return pd.DataFrame(self.correlation(), index=self.symbols, columns=self.symbols)
+
+    def covariance_frame(self):
+        """Матрица ковариаций в виде DataFrame: на диагонали — дисперсии доходностей пар"""
+        return pd.DataFrame(self.covariance(), index=self.symbols, columns=self.symbols)
+
+
+def load_closes(symbols, timeframe, limit, max_workers=None):
+    """Выровненные по времени цены закрытия пар: индекс — время открытия свечи, столбцы — пары.
+       Свечи загружаются параллельно с приоритетом сканера; текущая незакрытая свеча отбрасывается.
+    """
+    max_workers = max_workers or strategy.settings.get("scanner_max_workers", 8)
+    def load(symbol):
+        try:
+            with priority(SCAN):
+                candles = strategy.get_candles(symbol, timeframe, limit=limit + 1)
+        except Exception as e:
+            print(f"Ошибка при загрузке данных для {symbol}: {e}")
+            return None
+        if candles is None or candles.empty:
+            return None
+        return candles.set_index("timestamp")["close"].rename(symbol)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        series = [column for column in pool.map(load, symbols) if column is not None]
+    if not series:
+        return pd.DataFrame(columns=list(symbols))
+    closes = pd.concat(series, axis=1).sort_index().reindex(columns=list(symbols))
+    current = pd.Timestamp(strategy.candle_open_time(timeframe, strategy.exchange.milliseconds()), unit="ms")
+    return closes[closes.index < current]
+
+
+class MarketRegime:
+    """Матрицы корреляций и волатильности отслеживаемых пар, обновляемые по мере закрытия свечей.
+       Первый вызов для набора пар и таймфрейма загружает window + 1 свечей, последующие — только свечи,
+       закрывшиеся с прошлого обновления.
+    """
+
+    def __init__(self, window=None):
+        self.window = window or correlation_window()
+        self._trackers = {}
+        self._lock = threading.Lock()
+
+    def update(self, symbols, timeframe):
+        """RollingCorrelation набора пар на таймфрейме с учетом всех закрытых свечей"""
+        key = (tuple(symbols), timeframe)
+        with self._lock:
+            tracker = self._trackers.get(key)
+            if tracker is None or tracker.window != self.window:
+                tracker = self._trackers[key] = RollingCorrelation(symbols, self.window)
+        limit = self.window + 1
+        if tracker.last_timestamp is not None:
+            timeframe_ms = strategy.exchange.parse_timeframe(timeframe) * 1000
+            missed = (strategy.exchange.milliseconds() - tracker.last_timestamp) // timeframe_ms
+            limit = int(min(limit, max(missed, 1)))
+        tracker.extend(load_closes(symbols, timeframe, limit))
+        return tracker
+
+
+def scenario_clusters(scenarios, min_share=None, min_pairs=None, total=None):
+    """Направленные сценарии, которые одновременно выдали не меньше min_pairs пар и не меньше min_share
+       от всех total пар (по умолчанию — от всех пар в scenarios). scenarios — {пара: сценарий}.
+       Не заданные пороги берутся из scenario_alert_share и scenario_alert_min_pairs текущих настроек.
+       Возвращает {сценарий: [пары]}.
+    """
+    if min_share is None:
+        min_share = strategy.settings.get("scenario_alert_share", SCENARIO_ALERT_SHARE)
+    if min_pairs is None:
+        min_pairs = strategy.settings.get("scenario_alert_min_pairs", SCENARIO_ALERT_MIN_PAIRS)
+    groups = {}
+    for symbol, scenario in scenarios.items():
+        if scenario in DIRECTIONAL_SCENARIOS:
+            groups.setdefault(scenario, []).append(symbol)
+    total = max(total or 0, len(scenarios))
+    return {scenario: sorted(symbols) for scenario, symbols in groups.items()
+            if len(symbols) >= min_pairs and len(symbols) >= min_share * total}
+
+
+class ScenarioClusterMonitor:
+    """Сбор сценариев пар, проанализированных по закрытию одной и той же свечи.
+       Предупреждение по сценарию выдается один раз за свечу — когда его одновременно выдало достаточно пар.
+    """
+
+    def __init__(self, min_share=None, min_pairs=None):
+        # None — порог из текущих настроек на момент проверки
+        self.min_share = min_share
+        self.min_pairs = min_pairs
+        # {таймфрейм: (свеча, {пара: сценарий}, уже отправленные сценарии)}
+        self._candles = {}
+        self._lock = threading.Lock()
+
+    def add(self, timeframe, candle, symbol, scenario, total):
+        """Сценарий пары на свече candle; total — сколько пар отслеживается на таймфрейме.
+           Возвращает {сценарий: [пары]} для сценариев, впервые достигших порога на этой свече.
+        """
+        with self._lock:
+            current = self._candles.get(timeframe)
+            if current is None or current[0] != candle:
+                current = self._candles[timeframe] = (candle, {}, set())
+            _, scenarios, alerted = current
+            scenarios[symbol] = scenario
+            # Доля считается от всех отслеживаемых пар, а не только от уже проанализированных
+            clusters = scenario_clusters(scenarios, self.min_share, self.min_pairs, total)
+            fresh = {scenario: symbols for scenario, symbols in clusters.items() if scenario not in alerted}
+            alerted.update(fresh)
+            return fresh
+
+
+def format_clusters(clusters):
+    return "\n".join(f"⚠️ Сценарий {scenario} одновременно у {len(symbols)} пар: {', '.join(symbols)}"
+                     for scenario, symbols in clusters.items())
+
+
+def format_regime(tracker, top=5):
+    """Краткая сводка для бота: средняя корреляция, самые коррелированные пары и самые волатильные пары"""
+    if tracker.count < 2:
+        return "Недостаточно свечей для расчета корреляций."
+    correlation = tracker.correlation()
+    volatility = tracker.volatility()
+    upper = np.triu_indices(len(tracker.symbols), k=1)
+    values = correlation[upper]
+    valid = ~np.isnan(values)
+    lines = [f"Пар: {len(tracker.symbols)}, свечей в окне: {tracker.count}"]
+    if valid.any():
+        lines.append(f"Средняя корреляция доходностей: {np.nanmean(values):.2f}")
+        order = np.argsort(-np.where(valid, values, -np.inf))[:top]
+        lines.append("Самые коррелированные пары:")
+        for index in order[valid[order]]:
+            first, second = tracker.symbols[upper[0][index]], tracker.symbols[upper[1][index]]
+            lines.append(f"  {first} / {second}: {values[index]:.2f}")
+    lines.append("Самая высокая волатильность (ст. откл. доходности за свечу):")
+    for index in np.argsort(-volatility)[:top]:
+        lines.append(f"  {tracker.symbols[index]}: {volatility[index] * 100:.2f}%")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Матрицы корреляций и волатильности доходностей пар")
+    parser.add_argument("symbols", nargs="*")
+    parser.add_argument("--timeframe", default=strategy.TIMEFRAME)
+    parser.add_argument("--window", type=int, default=correlation_window())
+    args = parser.parse_args()
+
+    symbols = args.symbols or strategy.settings.get("scanner_symbols", ["BTCUSDT", "ETHUSDT"])
+    tracker = MarketRegime(args.window).update(symbols, args.timeframe)
+    pd.set_option("display.width", 200)
+    print(tracker.correlation_frame().round(2))
+    print()
+    print(format_regime(tracker))
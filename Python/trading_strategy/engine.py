@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+
+import correlation
+import scanner
+import trading_strategy as strategy
+from profiling import StageProfiler, profile_call
+
+
+class StrategyEngine:
+    """Долгоживущий движок стратегии для процесса бота.
+       Создается один раз при запуске: модули с pandas/TA-Lib/ccxt импортируются сразу, список рынков биржи
+       загружается заранее (с кэшем на диске), HTTP-сессии биржи и API FGI переиспользуются между запросами,
+       а settings.json перечитывается только при изменении времени модификации файла.
+       Одновременные запросы одной пары и таймфрейма выполняются один раз, а готовый отчет по закрытой
+       свече кэшируется до закрытия следующей.
+    """
+
+    def __init__(self, settings_path=strategy.SETTINGS_PATH):
+        self.settings_path = settings_path
+        self._settings_mtime = self._mtime()
+        self._markets_loaded_at = None
+        self._lock = threading.Lock()
+        # Блокировка на каждую закрытую свечу пары и отчет по ней: {(символ, таймфрейм, открытие свечи): отчет}
+        self._key_locks = {}
+        self._reports = {}
+        # Время этапов последних расчетов и отправок для команды /profile
+        self.profiler = StageProfiler(strategy.settings.get("profile_history_size", 200))
+        # Матрицы корреляций и волатильности пар, дополняемые закрывшимися с прошлого запроса свечами
+        self.market = correlation.MarketRegime()
+
+    @property
+    def markets_cache_path(self):
+        return strategy.settings.get("markets_cache_path", "markets.json")
+
+    @property
+    def markets_cache_ttl(self):
+        return strategy.settings.get("markets_cache_ttl", 86400)
+
+    def _mtime(self):
+        try:
+            return os.stat(self.settings_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start(self):
+        """Прогрев: рынки биржи и история FGI загружаются до первого запроса пользователя"""
+        self.load_markets()
+        strategy.get_fgi_series()
+
+    def load_markets(self, force=False):
+        """Список рынков биржи из кэша на диске, если он моложе markets_cache_ttl, иначе с биржи"""
+        path = self.markets_cache_path
+        if not force and os.path.exists(path) and time.time() - os.path.getmtime(path) < self.markets_cache_ttl:
+            try:
+                with open(path) as f:
+                    cached = json.load(f)
+                strategy.exchange.set_markets(cached["markets"], cached.get("currencies"))
+                self._markets_loaded_at = os.path.getmtime(path)
+                return
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ошибка при чтении кэша рынков {path}: {e}")
+
+        strategy.exchange.load_markets(reload=True)
+        self._markets_loaded_at = time.time()
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"markets": list(strategy.exchange.markets.values()),
+                           "currencies": strategy.exchange.currencies}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            print(f"Ошибка при сохранении кэша рынков {path}: {e}")
+
+    @staticmethod
+    def _store_paths():
+        """Пути хранилищ из текущих настроек в виде аргументов use_backend"""
+        return {
+            "candle_store_path": strategy.CANDLE_STORE_PATH,
+            "fgi_store_path": strategy.FGI_STORE_PATH,
+            "signal_ledger_path": strategy.SIGNAL_LEDGER_PATH,
+            "history_dir": strategy.HISTORY_DIR,
+        }
+
+    def refresh(self):
+        """Перечитывание settings.json при изменении файла и обновление устаревшего списка рынков"""
+        with self._lock:
+            mtime = self._mtime()
+            if mtime != self._settings_mtime:
+                self._settings_mtime = mtime
+                previous = self._store_paths()
+                strategy.apply_settings(strategy.load_settings(self.settings_path))
+                self._reports.clear()
+                # Хранилища пересоздаются только если изменились пути к файлам
+                strategy.use_backend(**{key: path for key, path in self._store_paths().items() if path != previous[key]})
+                strategy.rate_limiter.configure(*strategy.rate_limit_settings())
+                print(f"Настройки перезагружены из {self.settings_path}")
+            if self._markets_loaded_at is None or time.time() - self._markets_loaded_at >= self.markets_cache_ttl:
+                try:
+                    self.load_markets()
+                except Exception as e:
+                    print(f"Ошибка при обновлении списка рынков: {e}")
+
+    def validate_pair(self, symbol, timeframe=None):
+        """Проверка пары перед подпиской: таймфрейм должен разбираться биржей и поддерживаться ею,
+           а символ — быть в списке рынков (как символ ccxt или биржевой идентификатор вида BTCUSDT).
+           Возвращает текст ошибки или None.
+        """
+        self.refresh()
+        exchange = strategy.exchange
+        if timeframe is not None:
+            try:
+                exchange.parse_timeframe(timeframe)
+            except Exception:
+                return f"Неизвестный таймфрейм: {timeframe}"
+            if exchange.timeframes and timeframe not in exchange.timeframes:
+                return f"Таймфрейм {timeframe} не поддерживается биржей, доступны: {', '.join(exchange.timeframes)}"
+        if not exchange.markets:
+            self.load_markets()
+        if symbol not in exchange.markets and symbol not in (exchange.markets_by_id or {}):
+            return f"Пара {symbol} не найдена на бирже {exchange.id}"
+        return None
+
+    def prefetch(self, symbol, timeframe=None):
+        """Прогрев перед закрытием свечи: настройки, рынки, FGI и свечи догружаются заранее,
+           чтобы после закрытия с биржи запрашивалась только последняя свеча
+        """
+        self.refresh()
+        strategy.get_fgi_series()
+        strategy.get_candles(symbol, timeframe or strategy.TIMEFRAME)
+
+    def analyze(self, symbol, timeframe=None):
+        """Анализ последней закрытой свечи пары с актуальными настройками; возвращает SignalReport.
+           Ключ кэша — (символ, таймфрейм, время открытия закрытой свечи), поэтому запрос из бота и запуск
+           планировщика по закрытию той же свечи получают один и тот же отчет. Пока расчет выполняется,
+           повторные запросы ждут его; записи прошлых свечей удаляются вместе с их блокировками.
+        """
+        self.refresh()
+        timeframe = timeframe or strategy.TIMEFRAME
+        closed = strategy.candle_open_time(timeframe, strategy.candle_open_time(timeframe, strategy.exchange.milliseconds()) - 1)
+        key = (symbol, timeframe, closed)
+        with self._lock:
+            for stale in [stale for stale in self._key_locks if stale[1] == timeframe and stale[2] < closed]:
+                del self._key_locks[stale]
+                self._reports.pop(stale, None)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self._reports.get(key)
+            if cached is not None:
+                return cached
+            report = strategy.trading_strategy(symbol, timeframe, closed_only=True)
+            self.profiler.record(report.timings)
+            # Кэшируется только отчет, в котором закрытая свеча уже есть (биржа могла еще не отдать ее)
+            if report.ok and report.candle_timestamp.value // 10**6 == closed:
+                self._reports[key] = report
+            return report
+
+    def analyze_timeframes(self, symbol, timeframes=None):
+        """Анализ пары на нескольких таймфреймах (по умолчанию — confirm_timeframes); возвращает {таймфрейм: SignalReport}"""
+        self.refresh()
+        return strategy.trading_strategy_multi(symbol, timeframes)
+
+    def scan(self):
+        """Сканирование пар из scanner_symbols с актуальными настройками; возвращает таблицу сканера"""
+        self.refresh()
+        return scanner.scan()
+
+    def market_regime(self, symbols=None, timeframe=None):
+        """Скользящие корреляции и волатильность пар (по умолчанию — scanner_symbols); возвращает RollingCorrelation"""
+        self.refresh()
+        self.market.window = correlation.correlation_window()
+        return self.market.update(symbols or strategy.settings.get("scanner_symbols", scanner.SCANNER_SYMBOLS),
+                                  timeframe or strategy.TIMEFRAME)
+
+    def profile_once(self, symbol, timeframe=None):
+        """Один анализ пары по последней закрытой свече (как в штатных запусках) под cProfile в обход кэша; статистика сохраняется в файл .prof.
+           Возвращает (путь к файлу, текст с самыми затратными функциями).
+        """
+        self.refresh()
+        timeframe = timeframe or strategy.TIMEFRAME
+        path = f"profile_{symbol}_{timeframe}_{int(time.time())}.prof"
+        _, text = profile_call(path, strategy.trading_strategy, symbol, timeframe, closed_only=True)
+        return path, text
+
+    def rate_limit_stats(self):
+        """Счетчики общего лимита запросов к бирже (таблица для бота)"""
+        return strategy.rate_limiter.format_stats()
+
+    def setting(self, key, default=None):
+        return strategy.settings.get(key, default)
+
+    @property
+    def timeframe(self):
+        return strategy.TIMEFRAME
+
+    @property
+    def show_explanations(self):
+        return strategy.SHOW_EXPLANATIONS
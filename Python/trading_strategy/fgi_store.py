@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+
+class FGIStore:
+    """Локальное хранилище дневных значений индекса страха и жадности (FGI) в SQLite.
+       Значения хранятся по метке начала дня (UTC, в секундах), как их отдаёт API alternative.me.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        # Источник текущего времени (сек); при воспроизведении истории подменяется модельным
+        self.clock = clock
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS fgi (timestamp INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS fgi_meta (key TEXT PRIMARY KEY, value REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def last_timestamp(self):
+        """Метка начала дня (сек) последнего сохранённого значения или None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(timestamp) FROM fgi").fetchone()
+        return row[0] if row else None
+
+    def last_refresh(self):
+        """Время (сек) последней попытки обновления или None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM fgi_meta WHERE key = 'last_refresh'").fetchone()
+        return row[0] if row else None
+
+    def needs_refresh(self, retry_interval):
+        """Обновление нужно, если в хранилище нет значения за текущие сутки (UTC),
+           но не чаще одного раза в retry_interval секунд
+        """
+        last_timestamp = self.last_timestamp()
+        today = int(self.clock()) // 86400 * 86400
+        if last_timestamp is not None and last_timestamp >= today:
+            return False
+        last_refresh = self.last_refresh()
+        return last_refresh is None or self.clock() - last_refresh >= retry_interval
+
+    def mark_refresh(self):
+        """Отмечает попытку обновления (в том числе неудачную)"""
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO fgi_meta VALUES ('last_refresh', ?)", (self.clock(),))
+
+    def append(self, values):
+        """Сохраняет значения в формате [(timestamp, value), ...]"""
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO fgi VALUES (?, ?)", [(int(t), int(v)) for t, v in values])
+
+    def load(self):
+        """Все значения FGI в виде pd.Series с индексом по дате (начало дня UTC)"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT timestamp, value FROM fgi ORDER BY timestamp").fetchall()
+        index = pd.to_datetime([row[0] for row in rows], unit='s')
+        return pd.Series([row[1] for row in rows], index=index, dtype='int64', name='fgi')
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+PRICE_COLUMNS = OHLCV_COLUMNS[1:]
+
+
+class HistoryStore:
+    """Глубокая история свечей в колоночных файлах .npy: timestamp (int64, мс) и open/high/low/close/volume (float32).
+       Файлы открываются через np.load(mmap_mode='r'), поэтому чтение не разбирает данные заново и не копирует их целиком.
+       Каталог пары: {path}/{биржа}/{символ}_{таймфрейм}/ с файлом meta.json (количество, пропуски, дубликаты)
+       и подкаталогом parts/ для страниц, загруженных, но еще не объединенных (продолжение после прерывания).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def directory(self, exchange_id, symbol, timeframe):
+        return os.path.join(self.path, exchange_id, f"{symbol}_{timeframe}")
+
+    def _parts_dir(self, exchange_id, symbol, timeframe):
+        return os.path.join(self.directory(exchange_id, symbol, timeframe), "parts")
+
+    def meta(self, exchange_id, symbol, timeframe):
+        """Сведения о сохраненной истории или None, если ее нет"""
+        path = os.path.join(self.directory(exchange_id, symbol, timeframe), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def columns(self, exchange_id, symbol, timeframe):
+        """Колонки истории как массивы, отображенные в память: {имя: np.ndarray}; пустой словарь, если истории нет"""
+        directory = self.directory(exchange_id, symbol, timeframe)
+        if self.meta(exchange_id, symbol, timeframe) is None:
+            return {}
+        return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in OHLCV_COLUMNS}
+
+    def load(self, exchange_id, symbol, timeframe, limit=None, before=None):
+        """Последние limit свечей (или все) с открытием раньше before (мс) в том же виде, что и fetch_ohlcv"""
+        columns = self.columns(exchange_id, symbol, timeframe)
+        if not columns:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        timestamps = columns["timestamp"]
+        end = len(timestamps) if before is None else int(np.searchsorted(timestamps, before))
+        start = 0 if limit is None else max(0, end - int(limit))
+        df = pd.DataFrame({name: np.asarray(columns[name][start:end], dtype=np.float64) for name in PRICE_COLUMNS})
+        df.insert(0, "timestamp", pd.to_datetime(np.asarray(timestamps[start:end]), unit='ms'))
+        return df
+
+    def completed_parts(self, exchange_id, symbol, timeframe):
+        """Начала (мс) уже загруженных страниц, еще не объединенных с историей"""
+        parts_dir = self._parts_dir(exchange_id, symbol, timeframe)
+        if not os.path.isdir(parts_dir):
+            return set()
+        return {int(name[:-4]) for name in os.listdir(parts_dir) if name.endswith(".npy")}
+
+    def save_part(self, exchange_id, symbol, timeframe, start, ohlcv):
+        """Атомарная запись загруженной страницы свечей в формате ccxt (может быть пустой)"""
+        parts_dir = self._parts_dir(exchange_id, symbol, timeframe)
+        os.makedirs(parts_dir, exist_ok=True)
+        rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        tmp_path = os.path.join(parts_dir, f"{start}.tmp.npy")
+        np.save(tmp_path, rows)
+        os.replace(tmp_path, os.path.join(parts_dir, f"{start}.npy"))
+
+    def merge_parts(self, exchange_id, symbol, timeframe, timeframe_ms):
+        """Объединение загруженных страниц с сохраненной историей.
+           Свечи упорядочиваются по времени, дубликаты меток времени удаляются (остается последняя загрузка),
+           пропуски (интервал между свечами больше таймфрейма) записываются в meta.json. Возвращает meta.
+        """
+        with self._lock:
+            directory = self.directory(exchange_id, symbol, timeframe)
+            parts_dir = self._parts_dir(exchange_id, symbol, timeframe)
+            part_names = sorted(self.completed_parts(exchange_id, symbol, timeframe))
+            parts = [np.load(os.path.join(parts_dir, f"{start}.npy")) for start in part_names]
+
+            existing = self.columns(exchange_id, symbol, timeframe)
+            if existing:
+                parts.insert(0, np.column_stack([np.asarray(existing[name], dtype=np.float64) for name in OHLCV_COLUMNS]))
+            rows = np.concatenate(parts) if parts else np.empty((0, len(OHLCV_COLUMNS)))
+
+            timestamps = rows[:, 0].astype(np.int64)
+            # Устойчивая сортировка: среди одинаковых меток последней остается более свежая загрузка
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, rows = timestamps[order], rows[order]
+            last_of_each = np.append(timestamps[1:] != timestamps[:-1], True) if len(timestamps) else np.array([], dtype=bool)
+            duplicates = int(len(timestamps) - last_of_each.sum())
+            timestamps, rows = timestamps[last_of_each], rows[last_of_each]
+
+            gap_positions = np.flatnonzero(np.diff(timestamps) > timeframe_ms)
+            gaps = [[int(timestamps[i]), int(timestamps[i + 1])] for i in gap_positions]
+
+            os.makedirs(directory, exist_ok=True)
+            columns = {"timestamp": timestamps}
+            columns.update({name: rows[:, i + 1].astype(np.float32) for i, name in enumerate(PRICE_COLUMNS)})
+            for name, values in columns.items():
+                tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+                np.save(tmp_path, values)
+                os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+            previous = self.meta(exchange_id, symbol, timeframe) or {}
+            meta = {
+                "count": int(len(timestamps)),
+                "first": int(timestamps[0]) if len(timestamps) else None,
+                "last": int(timestamps[-1]) if len(timestamps) else None,
+                "timeframe_ms": timeframe_ms,
+                "gaps": gaps,
+                "duplicates": previous.get("duplicates", 0) + duplicates,
+            }
+            tmp_path = os.path.join(directory, "meta.json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, os.path.join(directory, "meta.json"))
+
+            for start in part_names:
+                os.remove(os.path.join(parts_dir, f"{start}.npy"))
+            return meta
@@ -0,0 +1,99 @@
+import os
+
+import ccxt
+import numpy as np
+import pandas as pd
+import requests
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+class AlternativeMeFGI:
+    """Источник FGI: API alternative.me. fetch возвращает записи в формате API (свежие первыми)"""
+
+    URL = "https://api.alternative.me/fng/?limit={limit}&format=json"
+
+    def __init__(self):
+        # Одна HTTP-сессия на весь процесс: соединение с API переиспользуется между запросами
+        self.session = requests.Session()
+
+    def fetch(self, limit):
+        response = self.session.get(self.URL.format(limit=limit), timeout=10)
+        response.raise_for_status()
+        return response.json()['data']
+
+
+class ReplayClock:
+    """Модельное время воспроизведения, мс"""
+
+    def __init__(self, now_ms=0):
+        self.now_ms = now_ms
+
+
+class ReplayExchange:
+    """Биржа из записанных файлов OHLCV: отдает только свечи, открытые не позже текущего модельного времени.
+       Файлы: {data_dir}/{symbol}_{timeframe}.csv с колонками timestamp (мс), open, high, low, close, volume.
+    """
+
+    id = "replay"
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, data_dir, clock):
+        self.data_dir = data_dir
+        self.clock = clock
+        self._data = {}
+
+    def milliseconds(self):
+        return self.clock.now_ms
+
+    def load_markets(self):
+        return {}
+
+    def candles(self, symbol, timeframe):
+        """Все записанные свечи (timestamps, строки OHLCV) для пары и таймфрейма"""
+        key = (symbol, timeframe)
+        if key not in self._data:
+            path = os.path.join(self.data_dir, f"{symbol}_{timeframe}.csv")
+            df = pd.read_csv(path)[OHLCV_COLUMNS]
+            self._data[key] = (df['timestamp'].to_numpy(dtype=np.int64), df.to_numpy(dtype=float).tolist())
+        return self._data[key]
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        timestamps, rows = self.candles(symbol, timeframe)
+        end = int(np.searchsorted(timestamps, self.clock.now_ms, side='right'))
+        start = 0 if since is None else int(np.searchsorted(timestamps, since))
+        if since is None and limit:
+            start = max(0, end - limit)
+        elif limit:
+            end = min(end, start + limit)
+        return [[int(row[0])] + row[1:] for row in rows[start:end]]
+
+
+class ReplayFGI:
+    """Источник FGI из записанного файла {data_dir}/fgi.csv (timestamp в секундах, value)"""
+
+    def __init__(self, data_dir, clock):
+        df = pd.read_csv(os.path.join(data_dir, "fgi.csv")).sort_values("timestamp")
+        self.timestamps = df['timestamp'].to_numpy(dtype=np.int64)
+        self.values = df['value'].to_numpy(dtype=np.int64)
+        self.clock = clock
+
+    def fetch(self, limit):
+        end = int(np.searchsorted(self.timestamps, self.clock.now_ms // 1000, side='right'))
+        start = 0 if not limit else max(0, end - limit)
+        return [{"timestamp": str(t), "value": str(v)}
+                for t, v in zip(self.timestamps[start:end][::-1], self.values[start:end][::-1])]
+
+
+def record(candle_store, fgi_store, exchange_id, symbol, timeframe, data_dir):
+    """Запись свечей и FGI из локальных хранилищ в файлы для ReplayExchange и ReplayFGI"""
+    os.makedirs(data_dir, exist_ok=True)
+    candles = candle_store.load(exchange_id, symbol, timeframe)
+    candles['timestamp'] = candles['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    candles.to_csv(os.path.join(data_dir, f"{symbol}_{timeframe}.csv"), index=False)
+    fgi = fgi_store.load()
+    pd.DataFrame({
+        "timestamp": fgi.index.to_numpy(dtype='datetime64[s]').astype(np.int64),
+        "value": fgi.to_numpy(),
+    }).to_csv(os.path.join(data_dir, "fgi.csv"), index=False)
+    return len(candles), len(fgi)
@@ -0,0 +1,66 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+@contextmanager
+def span(timings, name):
+    """Замер этапа: время выполнения блока with прибавляется к timings[name] (секунды)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+class StageProfiler:
+    """Кольцевой буфер времени этапов последних запусков: {этап: секунды} на каждый запуск"""
+
+    def __init__(self, capacity=200):
+        self.runs = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            self.runs.append(dict(timings))
+
+    def summary(self):
+        """Медиана (p50) и p95 по каждому этапу в миллисекундах: {этап: (запусков, p50, p95)}"""
+        with self._lock:
+            runs = list(self.runs)
+        stages = {}
+        for timings in runs:
+            for stage, seconds in timings.items():
+                stages.setdefault(stage, []).append(seconds)
+        result = {}
+        for stage, values in stages.items():
+            p50, p95 = np.percentile(np.asarray(values) * 1000, [50, 95])
+            result[stage] = (len(values), float(p50), float(p95))
+        return result
+
+    def format_summary(self):
+        summary = self.summary()
+        if not summary:
+            return "Нет данных о запусках."
+        lines = [f"{'этап':12s} {'запусков':>8s} {'p50, мс':>9s} {'p95, мс':>9s}"]
+        for stage, (count, p50, p95) in summary.items():
+            lines.append(f"{stage:12s} {count:8d} {p50:9.1f} {p95:9.1f}")
+        return "\n".join(lines)
+
+
+def profile_call(path, func, *args, top=15, **kwargs):
+    """Выполнение func под cProfile с сохранением статистики в path (формат pstats, открывается snakeviz и т.п.).
+       Возвращает (результат func, текст с top самых затратных функций по суммарному времени).
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).strip_dirs().sort_stats("cumulative").print_stats(top)
+    return result, text.getvalue()
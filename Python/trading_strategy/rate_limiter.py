@@ -0,0 +1,145 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Классы приоритета запросов к бирже: меньшее значение обслуживается раньше
+LIVE, SCAN, BACKFILL = 0, 1, 2
+PRIORITY_NAMES = {LIVE: "live", SCAN: "scan", BACKFILL: "backfill"}
+
+# Приоритет текущего потока выполнения; asyncio.to_thread переносит его в поток вместе с контекстом
+_current_priority = contextvars.ContextVar("rate_limit_priority", default=LIVE)
+
+
+@contextmanager
+def priority(level):
+    """Приоритет запросов к бирже внутри блока with (LIVE, SCAN или BACKFILL)"""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class RateLimiter:
+    """Общий для всех потоков лимит запросов (token bucket): rate запросов в секунду, до burst подряд.
+       Пока ждет запрос более высокого приоритета, запросы ниже по приоритету свободный токен не получают.
+       Для каждого класса приоритета считаются запросы и время ожидания лимита.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = {level: 0 for level in PRIORITY_NAMES}
+        self._stats = {level: {"requests": 0, "wait_time": 0.0, "max_wait": 0.0} for level in PRIORITY_NAMES}
+
+    def configure(self, rate, burst):
+        """Изменение лимита без пересоздания (перезагрузка настроек): ожидающие запросы и счетчики сохраняются"""
+        with self._condition:
+            self._refill()
+            self.rate = rate
+            self.capacity = burst
+            self.tokens = min(self.tokens, float(burst))
+            self._condition.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, level=None, cost=1):
+        """Ожидание cost токенов; возвращает время ожидания в секундах"""
+        level = _current_priority.get() if level is None else level
+        cost = min(cost, self.capacity)
+        started = time.monotonic()
+        with self._condition:
+            self._waiting[level] += 1
+            try:
+                while True:
+                    self._refill()
+                    ahead = any(count for other, count in self._waiting.items() if other < level)
+                    if not ahead and self.tokens >= cost:
+                        self.tokens -= cost
+                        break
+                    # Без ожидающих впереди спим до появления токенов, иначе — до их уведомления
+                    timeout = (cost - self.tokens) / self.rate if not ahead and self.tokens < cost else None
+                    self._condition.wait(timeout)
+            finally:
+                self._waiting[level] -= 1
+                self._condition.notify_all()
+            waited = time.monotonic() - started
+            stats = self._stats[level]
+            stats["requests"] += 1
+            stats["wait_time"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def stats(self):
+        """Счетчики по классам приоритета: {имя: {requests, wait_time, max_wait}}"""
+        with self._condition:
+            return {PRIORITY_NAMES[level]: dict(stats) for level, stats in self._stats.items()}
+
+    def format_stats(self):
+        lines = [f"{'класс':10s} {'запросов':>9s} {'ожидание, с':>12s} {'макс., с':>9s}"]
+        for name, stats in self.stats().items():
+            lines.append(f"{name:10s} {stats['requests']:9d} {stats['wait_time']:12.2f} {stats['max_wait']:9.2f}")
+        return "\n".join(lines)
+
+
+class RateLimitedExchange:
+    """Биржа ccxt, запросы рыночных данных которой проходят через общий RateLimiter.
+       Одинаковые запросы, выполняющиеся одновременно (например, сканер и ручной запуск по одной паре),
+       объединяются в один: у Bybit нет пакетной загрузки свечей нескольких пар, поэтому это единственный
+       способ сократить число обращений. Остальные атрибуты и методы передаются бирже без изменений.
+    """
+
+    LIMITED_METHODS = ("fetch_ohlcv", "fetch_ticker", "fetch_tickers", "fetch_order_book", "fetch_trades")
+    # Загрузка рынков Bybit — несколько запросов (спот, фьючерсы, опционы, валюты)
+    LOAD_MARKETS_COST = 5
+
+    def __init__(self, exchange, limiter):
+        self.exchange = exchange
+        self.limiter = limiter
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.exchange, name)
+        if name in self.LIMITED_METHODS:
+            return lambda *args, **kwargs: self._call(name, attribute, args, kwargs)
+        return attribute
+
+    def _call(self, name, method, args, kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # Запросы с изменяемыми аргументами (например, params={...}) не объединяются
+            self.limiter.acquire()
+            return method(*args, **kwargs)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            self.limiter.acquire()
+            future.set_result(method(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def load_markets(self, reload=False, params={}):
+        if self.exchange.markets and not reload:
+            return self.exchange.markets
+        self.limiter.acquire(cost=self.LOAD_MARKETS_COST)
+        return self.exchange.load_markets(reload, params)
@@ -0,0 +1,69 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+import trading_strategy as strategy
+from market_data import ReplayClock, ReplayExchange, ReplayFGI, record
+
+
+def replay(symbol, timeframe, data_dir, warmup=None, steps=None, explanations=False):
+    """Пошаговое воспроизведение записанной истории через полный цикл стратегии.
+       На каждом шаге модельное время сдвигается на одну свечу (до момента перед ее закрытием),
+       стратегия догружает новую свечу из ReplayExchange и FGI из ReplayFGI, а отчет
+       форматируется так же, как для бота. Возвращает генератор пар (SignalReport, текст HTML).
+    """
+    clock = ReplayClock()
+    replay_exchange = ReplayExchange(data_dir, clock)
+    timestamps, _ = replay_exchange.candles(symbol, timeframe)
+    timeframe_ms = replay_exchange.parse_timeframe(timeframe) * 1000
+    warmup = warmup or strategy.HISTORICAL_DATA_LIMIT
+    last = len(timestamps) if steps is None else min(len(timestamps), warmup + steps)
+
+    previous = strategy.exchange, strategy.fgi_source, strategy.candle_store, strategy.fgi_store, strategy.signal_ledger
+    with tempfile.TemporaryDirectory() as tmp:
+        strategy.use_backend(replay_exchange, ReplayFGI(data_dir, clock),
+                             candle_store_path=os.path.join(tmp, "candles.db"),
+                             fgi_store_path=os.path.join(tmp, "fgi.db"),
+                             signal_ledger_path=os.path.join(tmp, "signals.db"))
+        try:
+            for i in range(warmup, last):
+                clock.now_ms = int(timestamps[i]) + timeframe_ms - 1
+                report = strategy.trading_strategy(symbol, timeframe)
+                yield report, report.render_html(explanations=explanations)
+        finally:
+            strategy.exchange, strategy.fgi_source, strategy.candle_store, strategy.fgi_store, strategy.signal_ledger = previous
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запись и офлайн-воспроизведение рыночных данных для стратегии")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Записать свечи и FGI из локальных хранилищ в файлы")
+    replay_parser = subparsers.add_parser("replay", help="Прогнать стратегию по записанной истории")
+    for sub in (record_parser, replay_parser):
+        sub.add_argument("symbol")
+        sub.add_argument("timeframe")
+        sub.add_argument("data_dir")
+    replay_parser.add_argument("--warmup", type=int, help="Свечей истории до первого шага (по умолчанию historical_data_limit)")
+    replay_parser.add_argument("--steps", type=int, help="Количество шагов (по умолчанию до конца записи)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        candles, fgi = record(strategy.candle_store, strategy.fgi_store, strategy.exchange.id,
+                              args.symbol, args.timeframe, args.data_dir)
+        print(f"Записано свечей: {candles}, значений FGI: {fgi} в {args.data_dir}")
+    else:
+        scenarios = Counter()
+        errors = 0
+        started = time.perf_counter()
+        for report, _ in replay(args.symbol, args.timeframe, args.data_dir, args.warmup, args.steps):
+            if report.ok:
+                scenarios[report.scenario] += 1
+            else:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        total = sum(scenarios.values()) + errors
+        print(f"Шагов: {total}, время: {elapsed:.2f} с ({elapsed / max(total, 1) * 1000:.2f} мс на шаг), ошибок: {errors}")
+        for scenario, count in scenarios.most_common():
+            print(f"  {scenario}: {count}")
@@ -0,0 +1,225 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SignalReport:
+    """Результат анализа торговой пары.
+       Заполняется в trading_strategy; текст для бота и консоли строится методами render_html и render_text.
+    """
+    symbol: str
+    timeframe: str
+    error: str | None = None
+    warnings: list[str] = field(default_factory=list)
+    candle_timestamp: object = None
+
+    # Рыночные данные и значения индикаторов
+    price: float | None = None
+    volume: float | None = None
+    fgi: int | None = None
+    rsi: float | None = None
+    ema_short: float | None = None
+    ema_long: float | None = None
+    macd: float | None = None
+    macd_signal: float | None = None
+    bb_upper: float | None = None
+    bb_middle: float | None = None
+    bb_lower: float | None = None
+    support: float | None = None
+    resistance: float | None = None
+    adx: float | None = None
+
+    # Сценарий и подтверждения (объем, EMA, MACD, Bollinger Bands, поддержка/сопротивление)
+    scenario: str | None = None
+    trend: str | None = None
+    trend_strength: str | None = None
+    confirmations: dict = field(default_factory=dict)
+    confirmations_short: dict = field(default_factory=dict)
+    neutral_direction: str | None = None
+
+    # Вероятность успеха
+    probability: float | None = None
+    probability_long: float | None = None
+    probability_short: float | None = None
+    base_probability: float | None = None
+    confirmation_bonus: float | None = None
+
+    # Статистика исходов сигналов: {(сценарий, тренд, сила тренда): {"total", "success"}}
+    # и доверительные интервалы успешности в процентах {ключ: (нижняя граница, верхняя граница)}
+    success_rates: dict = field(default_factory=dict)
+    success_intervals: dict = field(default_factory=dict)
+    confidence_level: float | None = None
+
+    # Время выполнения этапов, секунды
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def confirmed_count(self):
+        return sum(self.confirmations.values())
+
+    def to_dict(self):
+        """Краткая сводка для таблиц (сканер, бэктест)"""
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "scenario": self.scenario,
+            "trend": self.trend,
+            "trend_strength": self.trend_strength,
+            "confirmed_count": self.confirmed_count,
+            "probability": self.probability,
+            "price": self.price,
+            "fgi": self.fgi,
+            "rsi": self.rsi,
+            "adx": self.adx,
+        }
+
+    def render_html(self, explanations=False):
+        return _render(self, html=True, explanations=explanations)
+
+    def render_text(self, explanations=False):
+        return _render(self, html=False, explanations=explanations)
+
+
+def render_timeframes(reports, html=True):
+    """Сводка сигналов одной пары по нескольким таймфреймам: {таймфрейм: SignalReport}"""
+    def b(text):
+        return f"<b>{text}</b>" if html else text
+
+    symbol = next(iter(reports.values())).symbol if reports else ""
+    lines = [f"🧭 {b('Подтверждение по таймфреймам:')} {symbol}"]
+    for timeframe, report in reports.items():
+        if not report.ok:
+            lines.append(f"• {b(timeframe)}: ❌ {report.error}")
+            continue
+        lines.append(f"• {b(timeframe)}: {report.scenario}, {report.trend} ({report.trend_strength}), "
+                     f"подтверждений {report.confirmed_count}/5, вероятность {report.probability:.0f}%")
+    return "\n".join(lines) + "\n"
+
+
+def _confirmation_status(confirmations):
+    return (f"Объем: {'✅' if confirmations['volume'] else '❌'}, "
+            f"EMA: {'✅' if confirmations['ema'] else '❌'}, "
+            f"MACD: {'✅' if confirmations['macd'] else '❌'}, "
+            f"Bollinger Bands: {'✅' if confirmations['bollinger'] else '❌'}, "
+            f"Поддержка/Сопротивление: {'✅' if confirmations['sr'] else '❌'}")
+
+
+def _recommendation(report, b):
+    fgi, rsi = report.fgi, report.rsi
+    status = _confirmation_status(report.confirmations)
+    strong = report.confirmed_count >= 3
+    if report.scenario == "long":
+        action = b("Рекомендую покупку") if strong else f"Сигнал на покупку {b('слабый')}, ждем подтверждения"
+        return f"FGI = {fgi} (рынок в страхе), RSI = {rsi:.2f} (перепроданность). {action} ({status})"
+    if report.scenario == "short":
+        action = b("Рекомендую продажу") if strong else f"Сигнал на продажу {b('слабый')}, ждем подтверждения"
+        return f"FGI = {fgi} (рынок в жадности), RSI = {rsi:.2f} (перекупленность). {action} ({status})"
+    if report.scenario == "divergence_long":
+        action = b("Рекомендую покупку") if strong else f"Сигнал на покупку {b('слабый')}, ждем подтверждения"
+        return f"Перекос: FGI = {fgi} (жадность), RSI = {rsi:.2f} (перепроданность). {action} ({status})"
+    if report.scenario == "divergence_short":
+        action = b("Рекомендую продажу") if strong else f"Сигнал на продажу {b('слабый')}, ждем подтверждения"
+        return f"Перекос: FGI = {fgi} (страх), RSI = {rsi:.2f} (перекупленность). {action} ({status})"
+    if report.neutral_direction == "long":
+        return f"Нейтральная зона: FGI = {fgi}, RSI = {rsi:.2f}. Возможна покупка ({status})"
+    if report.neutral_direction == "short":
+        status = _confirmation_status(report.confirmations_short)
+        return f"Нейтральная зона: FGI = {fgi}, RSI = {rsi:.2f}. Возможна продажа ({status})"
+    return f"Нейтральная зона: FGI = {fgi}, RSI = {rsi:.2f}. Воздержитесь или ждите пробоя с объемом."
+
+
+def _advice(report, b):
+    probability = report.probability
+    if report.scenario in ["long", "divergence_long"]:
+        if report.confirmed_count >= 3:
+            if probability >= 50:
+                return f"✅ {b('Сильный сигнал для покупки.')} Шанс успеха: {probability:.0f}%. Рекомендуется действовать."
+            return f"⚠️ {b('Сигнал для покупки есть, но шансы успеха низкие:')} {probability:.0f}%. Лучше подождать благоприятных условий."
+        return f"❌ {b('Сигнал для покупки слабый')} из-за недостатка подтверждений. Шанс успеха: {probability:.0f}%."
+    if report.scenario in ["short", "divergence_short"]:
+        if report.confirmed_count >= 3:
+            if probability >= 50:
+                return f"✅ {b('Сильный сигнал для продажи.')} Шанс успеха: {probability:.0f}%. Рекомендуется действовать."
+            return f"⚠️ {b('Сигнал для продажи есть, но шансы успеха низкие:')} {probability:.0f}%. Лучше подождать благоприятных условий."
+        return f"❌ {b('Сигнал для продажи слабый')} из-за недостатка подтверждений. Шанс успеха: {probability:.0f}%."
+    if report.confirmed_count >= 3 and report.probability_long >= 50:
+        return f"ℹ️ {b('Нейтральная зона,')} но есть слабый сигнал для покупки. Шанс успеха: {report.probability_long:.0f}%."
+    if report.confirmed_count >= 3 and report.probability_short >= 50:
+        return f"ℹ️ {b('Нейтральная зона,')} но есть слабый сигнал для продажи. Шанс успеха: {report.probability_short:.0f}%."
+    return (f"ℹ️ {b('Нейтральная зона.')} Шанс успеха для покупки: {report.probability_long:.0f}%, "
+            f"для продажи: {report.probability_short:.0f}%. Воздержитесь или ждите пробоя с объемом.")
+
+
+def _interval_lines(report, b):
+    """Доверительные интервалы успешности для ключа текущего сценария (в нейтральной зоне — для покупки и продажи)"""
+    scenarios = ["long", "short"] if report.scenario == "neutral" else [report.scenario]
+    lines = []
+    for scenario in scenarios:
+        key = (scenario, report.trend, report.trend_strength)
+        if key not in report.success_intervals:
+            continue
+        low, high = report.success_intervals[key]
+        label = f" ({scenario})" if report.scenario == "neutral" else ""
+        lines.append(f"📏 {b('Доверительный интервал успешности')}{label} ({report.confidence_level * 100:.0f}%): "
+                     f"{low:.0f}–{high:.0f}% по {report.success_rates[key]['total']} сигналам")
+    return lines
+
+
+def _explanations(report, b):
+    confirmations = report.confirmations
+    lines = ["", f"📝 {b('Пояснения')}"]
+    if report.scenario in ["long", "short"]:
+        scenario_text = "Согласованный сигнал (Long)" if report.scenario == "long" else "Согласованный сигнал (Short)"
+        lines.append(f"📋 {b('Сценарий:')} {scenario_text}")
+        lines.append("➡️ FGI и RSI указывают в одном направлении.")
+    elif report.scenario in ["divergence_long", "divergence_short"]:
+        scenario_text = "Перекос сигналов (Long)" if report.scenario == "divergence_long" else "Перекос сигналов (Short)"
+        lines.append(f"📋 {b('Сценарий:')} {scenario_text}")
+        lines.append("⚠️ FGI и RSI противоречат друг другу.")
+    else:
+        lines.append(f"📋 {b('Сценарий:')} Нейтральная зона")
+        lines.append("ℹ️ Значения индикаторов не дают чёткого сигнала.")
+
+    lines.append(f"🔍 {b('Дополнительные индикаторы:')}")
+    lines.append(f"• {b('Объем:')} Подтвержден, если текущий объем выше предыдущего на 20%.")
+    lines.append(f"• {b('EMA:')} Короткая EMA выше длинной для бычьего тренда и наоборот. — {'✅ Подтверждено' if confirmations['ema'] else '❌ Не подтверждено'}.")
+    lines.append(f"• {b('MACD:')} Бычий сигнал, если MACD выше сигнальной линии, и наоборот. — " + ("✅ Подтверждено" if confirmations['macd'] else "❌ Не подтверждено"))
+    lines.append(f"• {b('Bollinger Bands:')} Цена у нижней полосы или ниже (для long) и у верхней полосы или выше (для short). — " + ("✅ Подтверждено" if confirmations['bollinger'] else "❌ Не подтверждено"))
+    lines.append(f"• {b('Поддержка/Сопротивление:')} Цена близка к ключевым уровням (разница менее 2%). — " + ("✅ Подтверждено" if confirmations['sr'] else "❌ Не подтверждено"))
+    return lines
+
+
+def _render(report, html, explanations):
+    def b(text):
+        return f"<b>{text}</b>" if html else text
+
+    lines = [f"⚠️ {b('Предупреждение:')} {warning}" for warning in report.warnings]
+    if report.error:
+        lines.append(f"❌ {b('Ошибка:')} {report.error}")
+        return "\n".join(lines) + "\n"
+
+    lines += [
+        f"🔍 {b('Анализ рынка')}",
+        f"💰 {b('Актив:')} {report.symbol} | {b('Таймфрейм:')} {report.timeframe}",
+        f"💵 {b('Текущая цена:')} {report.price:.2f} USDT | {b('Объем:')} {report.volume:.2f}",
+        f"📊 {b('EMA:')} Short={report.ema_short:.2f}, Long={report.ema_long:.2f} - {'🐂 Бычий тренд' if report.ema_short > report.ema_long else '🐻 Медвежий тренд'}",
+        f"📉 {b('MACD:')} Line={report.macd:.2f}, Signal={report.macd_signal:.2f} - {'📈 Бычий сигнал' if report.macd > report.macd_signal else '📉 Медвежий сигнал'}",
+        f"📈 {b('Bollinger Bands:')} Upper={report.bb_upper:.2f}, Middle={report.bb_middle:.2f}, Lower={report.bb_lower:.2f}",
+        f"📌 {b('Поддержка/Сопротивление:')} Поддержка={report.support:.2f}, Сопротивление={report.resistance:.2f}",
+        f"🤖 {b('Рекомендация:')} {_recommendation(report, b)}",
+        "",
+        f"🔢 {b('Рекомендации от ИИ')}",
+        _advice(report, b),
+        "",
+        f"🎯 {b('Расчет вероятности успеха')}",
+        f"✅ {b('Базовая вероятность:')} {report.base_probability:.2f}%",
+        *_interval_lines(report, b),
+        f"🔔 {b('Бонус за подтверждения:')} {report.confirmation_bonus:.2f}%",
+        f"🎯 {b('Итоговая вероятность:')} {report.probability:.2f}%",
+    ]
+    if explanations:
+        lines += _explanations(report, b)
+    return "\n".join(lines) + "\n"
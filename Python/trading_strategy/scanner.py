@@ -0,0 +1,77 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import trading_strategy as strategy
+from rate_limiter import priority, SCAN
+from trading_strategy import trading_strategy, get_fgi, get_fgi_series
+
+# Значения по умолчанию, если в settings.json нет scanner_symbols / scanner_max_workers;
+# сами настройки читаются при каждом сканировании, чтобы учитывать их перезагрузку
+SCANNER_SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "XRPUSDT"]
+SCANNER_MAX_WORKERS = 8
+
+# Направленные сценарии ранжируются выше нейтральной зоны
+DIRECTIONAL_SCENARIOS = ["long", "short", "divergence_long", "divergence_short"]
+
+
+def scan_symbol(symbol, timeframe, current_fgi, fgi_series):
+    """Анализ одной пары. Возвращает SignalReport или None при ошибке.
+       Запросы сканера к бирже уступают в общем лимите запросам живых сигналов.
+    """
+    try:
+        with priority(SCAN):
+            report = trading_strategy(symbol, timeframe, current_fgi=current_fgi, fgi_series=fgi_series)
+    except Exception as e:
+        print(f"Ошибка при анализе {symbol}: {e}")
+        return None
+    if not report.ok:
+        print(f"Ошибка при анализе {symbol}: {report.error}")
+        return None
+    return report
+
+
+def scan(symbols=None, timeframe=None, max_workers=None):
+    """Параллельный анализ списка пар (по умолчанию — scanner_symbols на основном таймфрейме).
+       FGI запрашивается один раз и используется для всех пар, пары обрабатываются
+       в пуле потоков ограниченного размера. Возвращает DataFrame, отсортированный
+       от самых сильных сигналов к самым слабым.
+    """
+    symbols = symbols or strategy.settings.get("scanner_symbols", SCANNER_SYMBOLS)
+    timeframe = timeframe or strategy.TIMEFRAME
+    max_workers = max_workers or strategy.settings.get("scanner_max_workers", SCANNER_MAX_WORKERS)
+    fgi_series = get_fgi_series()
+    current_fgi = int(fgi_series.iloc[-1]) if not fgi_series.empty else get_fgi()
+    if current_fgi is None:
+        print("❌ Не удалось получить текущее значение FGI.")
+        return pd.DataFrame()
+
+    # Загружаем метаданные рынков заранее, чтобы потоки не делали это одновременно
+    strategy.exchange.load_markets()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda symbol: scan_symbol(symbol, timeframe, current_fgi, fgi_series), symbols)
+        rows = [report.to_dict() for report in results if report is not None]
+
+    if not rows:
+        return pd.DataFrame()
+
+    table = pd.DataFrame(rows)
+    table["directional"] = table["scenario"].isin(DIRECTIONAL_SCENARIOS)
+    table = table.sort_values(["directional", "confirmed_count", "probability"], ascending=False)
+    return table.drop(columns="directional").reset_index(drop=True)
+
+
+def format_scan_table(table, top=None):
+    """Текстовая таблица результатов сканирования"""
+    if table.empty:
+        return "Нет результатов сканирования."
+    if top is not None:
+        table = table.head(top)
+    columns = ["symbol", "scenario", "trend", "trend_strength", "confirmed_count", "probability", "price"]
+    return table[columns].to_string(index=False, float_format=lambda x: f"{x:.2f}")
+
+
+if __name__ == "__main__":
+    print(format_scan_table(scan(sys.argv[1:] or None)))
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+
+class SendQueue:
+    """Очередь отправки сообщений с учетом ограничений Telegram:
+       не больше rate сообщений в секунду на весь бот и не чаще одного сообщения в chat_interval секунд в один чат.
+       Порядок сообщений внутри чата сохраняется; чаты обслуживаются по готовности, поэтому медленный чат
+       не задерживает остальные. При ответе 429 (исключение с атрибутом retry_after) отправка повторяется после паузы.
+       send — корутина send(chat_id, text).
+    """
+
+    def __init__(self, send, rate=25, chat_interval=1.0, retries=3):
+        self.send = send
+        self.min_interval = 1.0 / rate
+        self.chat_interval = chat_interval
+        self.retries = retries
+        self._chats = {}
+        self._chat_ready = {}
+        self._next_send = 0.0
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.failed = 0
+
+    def put(self, chat_id, text):
+        self._chats.setdefault(chat_id, deque()).append(text)
+        self._wakeup.set()
+
+    def put_many(self, chat_ids, chunks):
+        """Одни и те же сообщения (отчет, уже разбитый на части) всем подписчикам"""
+        for chat_id in chat_ids:
+            for chunk in chunks:
+                self.put(chat_id, chunk)
+
+    def pending(self):
+        return sum(len(messages) for messages in self._chats.values())
+
+    async def run(self):
+        while True:
+            if not self._chats:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            chat_id = min(self._chats, key=lambda chat: self._chat_ready.get(chat, 0.0))
+            delay = max(self._chat_ready.get(chat_id, 0.0), self._next_send) - time.monotonic()
+            if delay > 0:
+                # Новое сообщение в другой чат может оказаться готовым раньше — просыпаемся и по нему
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            messages = self._chats[chat_id]
+            text = messages.popleft()
+            if not messages:
+                del self._chats[chat_id]
+            await self._deliver(chat_id, text)
+            now = time.monotonic()
+            self._next_send = now + self.min_interval
+            self._chat_ready[chat_id] = now + self.chat_interval
+
+    async def _deliver(self, chat_id, text):
+        for attempt in range(self.retries + 1):
+            try:
+                await self.send(chat_id, text)
+                self.sent += 1
+                return
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is None or attempt == self.retries:
+                    self.failed += 1
+                    logging.warning(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                    return
+                # Ограничение Telegram распространяется на весь бот
+                self._next_send = time.monotonic() + retry_after
+                await asyncio.sleep(retry_after)
@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+DIRECTIONAL_SCENARIOS = ("long", "short", "divergence_long", "divergence_short")
+
+
+class SignalLedger:
+    """Журнал выданных сигналов в SQLite.
+       Каждый направленный сигнал сохраняется с признаками (сценарий, тренд, индикаторы) по ключу
+       (биржа, символ, таймфрейм, свеча). Когда проходит horizon свечей, исход сигнала вычисляется
+       один раз и сразу прибавляется к накопительным счетчикам по ключу (сценарий, тренд, сила тренда),
+       поэтому успешность читается из счетчиков без пересчета истории.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signals ("
+                "exchange TEXT NOT NULL, symbol TEXT NOT NULL, timeframe TEXT NOT NULL, timestamp INTEGER NOT NULL, "
+                "scenario TEXT NOT NULL, trend TEXT NOT NULL, trend_strength TEXT NOT NULL, "
+                "price REAL, fgi INTEGER, rsi REAL, adx REAL, confirmed_count INTEGER, probability REAL, "
+                "horizon INTEGER NOT NULL, threshold REAL NOT NULL, "
+                "outcome INTEGER, price_change REAL, "
+                "PRIMARY KEY (exchange, symbol, timeframe, timestamp))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS signals_pending ON signals (exchange, symbol, timeframe) WHERE outcome IS NULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signal_counters ("
+                "exchange TEXT NOT NULL, symbol TEXT NOT NULL, timeframe TEXT NOT NULL, "
+                "scenario TEXT NOT NULL, trend TEXT NOT NULL, trend_strength TEXT NOT NULL, "
+                "total INTEGER NOT NULL DEFAULT 0, success INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (exchange, symbol, timeframe, scenario, trend, trend_strength))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, exchange_id, report, timestamp_ms, horizon, threshold):
+        """Сохранение направленного сигнала из SignalReport.
+           Повторный анализ той же свечи обновляет сигнал, пока его исход не определен.
+        """
+        if not report.ok or report.scenario not in DIRECTIONAL_SCENARIOS:
+            return
+        row = (exchange_id, report.symbol, report.timeframe, int(timestamp_ms),
+               report.scenario, report.trend, report.trend_strength,
+               report.price, report.fgi, report.rsi, report.adx, report.confirmed_count, report.probability,
+               horizon, threshold)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO signals (exchange, symbol, timeframe, timestamp, scenario, trend, trend_strength, "
+                "price, fgi, rsi, adx, confirmed_count, probability, horizon, threshold) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (exchange, symbol, timeframe, timestamp) DO UPDATE SET "
+                "scenario = excluded.scenario, trend = excluded.trend, trend_strength = excluded.trend_strength, "
+                "price = excluded.price, fgi = excluded.fgi, rsi = excluded.rsi, adx = excluded.adx, "
+                "confirmed_count = excluded.confirmed_count, probability = excluded.probability, "
+                "horizon = excluded.horizon, threshold = excluded.threshold "
+                "WHERE signals.outcome IS NULL",
+                row,
+            )
+
+    def evaluate(self, exchange_id, symbol, timeframe, timestamps_ms, closes, timeframe_ms, now_ms):
+        """Определение исходов сигналов, у которых прошло horizon свечей.
+           timestamps_ms и closes — свечи пары (по возрастанию времени); обрабатываются только ожидающие сигналы,
+           так что время работы не зависит от размера журнала. Возвращает количество оцененных сигналов.
+        """
+        with self._connect() as conn:
+            pending = conn.execute(
+                "SELECT timestamp, scenario, trend, trend_strength, price, horizon, threshold FROM signals "
+                "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND outcome IS NULL",
+                (exchange_id, symbol, timeframe),
+            ).fetchall()
+        if not pending:
+            return 0
+
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+        closes = np.asarray(closes, dtype=float)
+        outcomes = []
+        for timestamp, scenario, trend, trend_strength, price, horizon, threshold in pending:
+            exit_timestamp = timestamp + horizon * timeframe_ms
+            # Свеча выхода должна быть закрыта
+            if exit_timestamp + timeframe_ms > now_ms:
+                continue
+            exit_position = np.searchsorted(timestamps_ms, exit_timestamp)
+            if exit_position >= len(timestamps_ms) or timestamps_ms[exit_position] != exit_timestamp:
+                continue
+            entry_position = np.searchsorted(timestamps_ms, timestamp)
+            if entry_position < len(timestamps_ms) and timestamps_ms[entry_position] == timestamp:
+                price = closes[entry_position]
+            price_change = (closes[exit_position] - price) / price
+            if scenario in ("long", "divergence_long"):
+                success = price_change >= threshold
+            else:
+                success = price_change <= -threshold
+            outcomes.append((timestamp, scenario, trend, trend_strength, int(success), float(price_change)))
+        if not outcomes:
+            return 0
+
+        # Исход и счетчики обновляются в одной транзакции; условие outcome IS NULL защищает от двойного учета
+        with self._lock, self._connect() as conn:
+            for timestamp, scenario, trend, trend_strength, success, price_change in outcomes:
+                updated = conn.execute(
+                    "UPDATE signals SET outcome = ?, price_change = ? "
+                    "WHERE exchange = ? AND symbol = ? AND timeframe = ? AND timestamp = ? AND outcome IS NULL",
+                    (success, price_change, exchange_id, symbol, timeframe, timestamp),
+                ).rowcount
+                if not updated:
+                    continue
+                conn.execute(
+                    "INSERT INTO signal_counters VALUES (?, ?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (exchange, symbol, timeframe, scenario, trend, trend_strength) DO UPDATE SET "
+                    "total = total + 1, success = success + excluded.success",
+                    (exchange_id, symbol, timeframe, scenario, trend, trend_strength, success),
+                )
+        return len(outcomes)
+
+    def success_rates(self, exchange_id, symbol, timeframe):
+        """Счетчики исходов в формате analyze_historical_signals: {(сценарий, тренд, сила): {"total", "success"}}"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT scenario, trend, trend_strength, total, success FROM signal_counters "
+                "WHERE exchange = ? AND symbol = ? AND timeframe = ?",
+                (exchange_id, symbol, timeframe),
+            ).fetchall()
+        return {(scenario, trend, strength): {"total": total, "success": success}
+                for scenario, trend, strength, total, success in rows}
@@ -0,0 +1,285 @@
+import math
+import os
+import pickle
+import threading
+from collections import deque
+
+# Порог, ниже которого TA-Lib считает величину нулевой (TA_IS_ZERO)
+EPSILON = 1e-8
+
+
+class EMAState:
+    """EMA с затравкой SMA по первым period значениям, как в TA-Lib"""
+
+    def __init__(self, period):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value = None
+
+    def seed(self, value):
+        self.value = value
+
+    def update(self, x):
+        if self.value is None:
+            self.count += 1
+            self.seed_sum += x
+            if self.count == self.period:
+                self.value = self.seed_sum / self.period
+        else:
+            self.value = (x - self.value) * self.k + self.value
+        return self.value
+
+
+class RSIState:
+    """RSI со сглаживанием Уайлдера"""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev_close = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = None
+
+    def update(self, close):
+        if self.prev_close is None:
+            self.prev_close = close
+            return None
+        change = close - self.prev_close
+        self.prev_close = close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        if self.count < self.period:
+            # Первые period изменений усредняются простой суммой
+            self.count += 1
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+            if self.count < self.period:
+                return None
+        else:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        total = self.avg_gain + self.avg_loss
+        self.value = 100.0 * self.avg_gain / total if abs(total) >= EPSILON else 0.0
+        return self.value
+
+
+class MACDState:
+    """MACD как в TA-Lib: обе EMA стартуют на свече slow_period, быстрая — со SMA последних fast_period закрытий"""
+
+    def __init__(self, fast_period, slow_period, signal_period):
+        if slow_period < fast_period:
+            fast_period, slow_period = slow_period, fast_period
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.ema_fast = EMAState(fast_period)
+        self.ema_slow = EMAState(slow_period)
+        self.ema_signal = EMAState(signal_period)
+        self.warmup = deque(maxlen=slow_period)
+        self.value = None
+
+    def update(self, close):
+        if self.ema_slow.value is None:
+            self.warmup.append(close)
+            if len(self.warmup) < self.slow_period:
+                return None
+            closes = list(self.warmup)
+            self.ema_fast.seed(sum(closes[-self.fast_period:]) / self.fast_period)
+            self.ema_slow.seed(sum(closes) / self.slow_period)
+            self.warmup.clear()
+        else:
+            self.ema_fast.update(close)
+            self.ema_slow.update(close)
+        macd = self.ema_fast.value - self.ema_slow.value
+        signal = self.ema_signal.update(macd)
+        if signal is None:
+            return None
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+
+class BollingerState:
+    """Bollinger Bands (SMA и стандартное отклонение генеральной совокупности) на скользящих суммах"""
+
+    def __init__(self, period, deviation):
+        self.period = period
+        self.deviation = deviation
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.value = None
+
+    def update(self, close):
+        if len(self.window) == self.period:
+            oldest = self.window[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.window.append(close)
+        self.total += close
+        self.total_sq += close * close
+        if len(self.window) < self.period:
+            return None
+        middle = self.total / self.period
+        variance = self.total_sq / self.period - middle * middle
+        std = math.sqrt(variance) if variance >= EPSILON else 0.0
+        self.value = (middle + self.deviation * std, middle, middle - self.deviation * std)
+        return self.value
+
+
+class ADXState:
+    """ADX по Уайлдеру, как в TA-Lib: первое значение на свече 2 * period - 1"""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.plus_dm = 0.0
+        self.minus_dm = 0.0
+        self.tr = 0.0
+        self.sum_dx = 0.0
+        self.value = None
+
+    def _dx(self):
+        if abs(self.tr) < EPSILON:
+            return None
+        plus_di = 100.0 * self.plus_dm / self.tr
+        minus_di = 100.0 * self.minus_dm / self.tr
+        total = plus_di + minus_di
+        if abs(total) < EPSILON:
+            return None
+        return 100.0 * abs(minus_di - plus_di) / total
+
+    def update(self, high, low, close):
+        if self.prev is None:
+            self.prev = (high, low, close)
+            return None
+        prev_high, prev_low, prev_close = self.prev
+        self.prev = (high, low, close)
+        diff_plus = high - prev_high
+        diff_minus = prev_low - low
+        plus_dm = diff_plus if diff_plus > 0 and diff_plus > diff_minus else 0.0
+        minus_dm = diff_minus if diff_minus > 0 and diff_plus < diff_minus else 0.0
+        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self.count += 1
+
+        if self.count < self.period:
+            # Первые period - 1 движений суммируются без сглаживания
+            self.plus_dm += plus_dm
+            self.minus_dm += minus_dm
+            self.tr += tr
+            return None
+
+        self.plus_dm = self.plus_dm - self.plus_dm / self.period + plus_dm
+        self.minus_dm = self.minus_dm - self.minus_dm / self.period + minus_dm
+        self.tr = self.tr - self.tr / self.period + tr
+        dx = self._dx()
+
+        if self.count < 2 * self.period - 1:
+            self.sum_dx += dx or 0.0
+            return None
+        if self.count == 2 * self.period - 1:
+            self.sum_dx += dx or 0.0
+            self.value = self.sum_dx / self.period
+        elif dx is not None:
+            self.value = (self.value * (self.period - 1) + dx) / self.period
+        return self.value
+
+
+class IndicatorEngine:
+    """Инкрементальный расчет индикаторов стратегии для одной пары и таймфрейма.
+       Каждая закрытая свеча обрабатывается за O(1); свечи не новее последней обработанной пропускаются.
+    """
+
+    def __init__(self, rsi_period=14, ema_short_period=12, ema_long_period=26,
+                 macd_fast=12, macd_slow=26, macd_signal=9,
+                 bollinger_period=20, bollinger_deviation=2, adx_period=14):
+        self.rsi = RSIState(rsi_period)
+        self.ema_short = EMAState(ema_short_period)
+        self.ema_long = EMAState(ema_long_period)
+        self.macd = MACDState(macd_fast, macd_slow, macd_signal)
+        self.bollinger = BollingerState(bollinger_period, bollinger_deviation)
+        self.adx = ADXState(adx_period)
+        self.last_timestamp = None
+
+    def update(self, timestamp, high, low, close):
+        """Обработка одной закрытой свечи. Возвращает текущие значения индикаторов (None до прогрева)"""
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return self.values()
+        self.last_timestamp = timestamp
+        self.rsi.update(close)
+        self.ema_short.update(close)
+        self.ema_long.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        self.adx.update(high, low, close)
+        return self.values()
+
+    def update_from_frame(self, df):
+        """Обработка свечей из DataFrame в формате fetch_ohlcv; уже учтенные свечи пропускаются"""
+        for timestamp, high, low, close in zip(df['timestamp'], df['high'], df['low'], df['close']):
+            self.update(timestamp, float(high), float(low), float(close))
+        return self.values()
+
+    def values(self):
+        macd = self.macd.value or (None, None, None)
+        bollinger = self.bollinger.value or (None, None, None)
+        return {
+            "rsi": self.rsi.value,
+            "ema_short": self.ema_short.value,
+            "ema_long": self.ema_long.value,
+            "macd": macd[0],
+            "macd_signal": macd[1],
+            "bb_upper": bollinger[0],
+            "bb_middle": bollinger[1],
+            "bb_lower": bollinger[2],
+            "adx": self.adx.value,
+        }
+
+
+class IndicatorRegistry:
+    """Набор IndicatorEngine по ключу (символ, таймфрейм) с сохранением состояния на диск"""
+
+    def __init__(self, path=None, **periods):
+        self.path = path
+        self.periods = periods
+        self.engines = {}
+        # Одна блокировка на обновление и сохранение: запись на диск не видит движок посреди обновления
+        self._lock = threading.RLock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, symbol, timeframe):
+        with self._lock:
+            key = (symbol, timeframe)
+            if key not in self.engines:
+                self.engines[key] = IndicatorEngine(**self.periods)
+            return self.engines[key]
+
+    def update(self, symbol, timeframe, df):
+        """Обработка закрытых свечей пары из DataFrame в формате fetch_ohlcv; возвращает значения индикаторов.
+           Обычно новой оказывается одна свеча. Если свечи df не продолжают уже учтенные (пропуск после простоя,
+           другие данные), состояние пары рассчитывается заново по df.
+        """
+        with self._lock:
+            engine = self.get(symbol, timeframe)
+            if engine.last_timestamp is None or not (df['timestamp'] == engine.last_timestamp).any():
+                engine = self.engines[(symbol, timeframe)] = IndicatorEngine(**self.periods)
+            return engine.update_from_frame(df)
+
+    def save(self):
+        """Атомарная запись состояния всех индикаторов в файл"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({"periods": self.periods, "engines": self.engines}, f)
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            checkpoint = pickle.load(f)
+        # Состояние, рассчитанное с другими периодами, не используется
+        if checkpoint.get("periods") == self.periods:
+            self.engines = checkpoint["engines"]
+
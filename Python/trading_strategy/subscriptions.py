@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+
+
+class SubscriptionStore:
+    """Подписки чатов бота на пары (символ, таймфрейм) и выбранная в чате пара для ручного запуска, в SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscriptions ("
+                "chat_id INTEGER NOT NULL, symbol TEXT NOT NULL, timeframe TEXT NOT NULL, "
+                "PRIMARY KEY (chat_id, symbol, timeframe))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS subscriptions_pair ON subscriptions (symbol, timeframe)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_pairs (chat_id INTEGER PRIMARY KEY, symbol TEXT NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def subscribe(self, chat_id, symbol, timeframe):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO subscriptions VALUES (?, ?, ?)", (chat_id, symbol, timeframe))
+
+    def unsubscribe(self, chat_id, symbol, timeframe=None):
+        """Отписка от пары на одном таймфрейме или на всех (timeframe=None). Возвращает количество удаленных подписок"""
+        query = "DELETE FROM subscriptions WHERE chat_id = ? AND symbol = ?"
+        params = [chat_id, symbol]
+        if timeframe is not None:
+            query += " AND timeframe = ?"
+            params.append(timeframe)
+        with self._lock, self._connect() as conn:
+            return conn.execute(query, params).rowcount
+
+    def for_chat(self, chat_id):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT symbol, timeframe FROM subscriptions WHERE chat_id = ? ORDER BY symbol, timeframe", (chat_id,)
+            ).fetchall()
+
+    def pairs(self):
+        """Различные пары (символ, таймфрейм), на которые есть хотя бы одна подписка"""
+        with self._connect() as conn:
+            return conn.execute("SELECT DISTINCT symbol, timeframe FROM subscriptions").fetchall()
+
+    def subscribers(self, symbol, timeframe):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT chat_id FROM subscriptions WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def is_empty(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM subscriptions LIMIT 1").fetchone() is None
+
+    def chat_pair(self, chat_id, default):
+        """Пара, выбранная в чате для ручного запуска"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT symbol FROM chat_pairs WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else default
+
+    def set_chat_pair(self, chat_id, symbol):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO chat_pairs VALUES (?, ?)", (chat_id, symbol))
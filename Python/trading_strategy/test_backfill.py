@@ -0,0 +1,47 @@
+import _thread
+import time
+
+import pytest
+
+import backfill
+import trading_strategy as strategy
+from history_store import HistoryStore
+from test_candles import HOUR_MS, StubExchange
+
+
+class InterruptedExchange(StubExchange):
+    """Биржа, на которой пользователь нажимает Ctrl-C во время загрузки страницы interrupt_at"""
+
+    def __init__(self, interrupt_at=None):
+        super().__init__()
+        self.interrupt_at = interrupt_at
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        if self.interrupt_at is not None and since == self.interrupt_at:
+            _thread.interrupt_main()
+        time.sleep(0.01)
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history"))
+    monkeypatch.setattr(strategy, "history_store", store)
+    return store
+
+
+def test_interrupt_cancels_queued_pages_and_resume_continues(store, monkeypatch):
+    exchange = InterruptedExchange(interrupt_at=2 * 100 * HOUR_MS)
+    monkeypatch.setattr(strategy, "exchange", exchange)
+    with pytest.raises(KeyboardInterrupt):
+        backfill.backfill("BTCUSDT", "1h", 0, end=4000 * HOUR_MS, workers=1, page_size=100)
+    time.sleep(0.1)
+    # Страницы из очереди отменены: загрузка не продолжилась до конца интервала
+    loaded = store.completed_parts(exchange.id, "BTCUSDT", "1h")
+    assert exchange.requests == len(loaded) < 5
+
+    exchange.interrupt_at = None
+    meta = backfill.backfill("BTCUSDT", "1h", 0, end=4000 * HOUR_MS, workers=1, page_size=100)
+    assert meta["count"] == 4000
+    # Повторный запуск загружает только недостающие страницы
+    assert exchange.requests == 40
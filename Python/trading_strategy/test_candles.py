@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import trading_strategy as strategy
+from candle_store import CandleStore
+from history_store import HistoryStore
+
+HOUR_MS = 3600 * 1000
+
+
+class StubExchange:
+    """Биржа с часовыми свечами за 5000 часов; не больше 1000 свечей за запрос, как у Bybit"""
+    id = "stub"
+    timeframes = {"1h": "60", "1d": "D"}
+
+    def __init__(self, count=5000):
+        self.timestamps = np.arange(count, dtype=np.int64) * HOUR_MS
+        self.requests = 0
+
+    def parse_timeframe(self, timeframe):
+        return {"1h": 3600, "4h": 4 * 3600, "1d": 86400}[timeframe]
+
+    def milliseconds(self):
+        return int(self.timestamps[-1]) + 1000
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.requests += 1
+        limit = min(limit or 1000, 1000)
+        start = int(np.searchsorted(self.timestamps, since)) if since is not None else len(self.timestamps) - limit
+        return [[int(t), 100.0, 101.0, 99.0, 100.0 + (t // HOUR_MS) % 7, 1.0] for t in self.timestamps[start:start + limit]]
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    exchange = StubExchange()
+    monkeypatch.setattr(strategy, "exchange", exchange)
+    monkeypatch.setattr(strategy, "candle_store", CandleStore(str(tmp_path / "candles.db")))
+    monkeypatch.setattr(strategy, "history_store", HistoryStore(str(tmp_path / "history")))
+    monkeypatch.setattr(strategy, "BASE_TIMEFRAME", None)
+    return exchange
+
+
+def test_raised_limit_loads_older_candles(stub):
+    assert len(strategy.get_candles("BTCUSDT", "1h", limit=500)) == 500
+    # Хранилище свежее, но короче нового окна: недостающие старые свечи догружаются
+    df = strategy.get_candles("BTCUSDT", "1h", limit=1000)
+    assert len(df) == 1000
+    assert df["timestamp"].is_monotonic_increasing and df["timestamp"].is_unique
+    assert df["timestamp"].iloc[-1].value // 10**6 == stub.timestamps[-1]
+
+
+def test_covered_store_fetches_only_new_candles(stub):
+    strategy.get_candles("BTCUSDT", "1h", limit=500)
+    stub.requests = 0
+    assert len(strategy.get_candles("BTCUSDT", "1h", limit=501)) == 501
+    assert stub.requests == 1
+
+
+def test_resampled_timeframes_after_base_run(stub, monkeypatch):
+    monkeypatch.setattr(strategy, "BASE_TIMEFRAME", "1h")
+    # Обычный запуск на базовом таймфрейме заполняет хранилище 500 часовыми свечами
+    assert len(strategy.get_candles("BTCUSDT", "1h", limit=500)) == 500
+    # Старшие таймфреймы, как в trading_strategy_multi: первый догружает базовый поток, остальные берут его из хранилища
+    daily = strategy.get_candles("BTCUSDT", "1d", limit=150)
+    four_hours = strategy.get_candles("BTCUSDT", "4h", limit=150, refresh_base=False)
+    assert len(daily) == 150
+    assert len(four_hours) == 150
+    assert daily["timestamp"].diff().iloc[1:].eq(np.timedelta64(1, "D")).all()
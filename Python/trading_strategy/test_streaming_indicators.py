@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+import talib
+
+from streaming_indicators import IndicatorEngine, IndicatorRegistry
+
+# Допустимая относительная ошибка потокового расчета относительно TA-Lib
+TOLERANCE = 1e-9
+
+
+def synthetic_candles(n=5000, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 20000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(np.arange(n) * 3600 * 1000, unit="ms"),
+        "high": close * (1 + rng.uniform(0, 0.01, n)),
+        "low": close * (1 - rng.uniform(0, 0.01, n)),
+        "close": close,
+    })
+
+
+def talib_indicators(df):
+    high, low, close = (df[column].to_numpy() for column in ("high", "low", "close"))
+    macd, macd_signal, _ = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    bb_upper, bb_middle, bb_lower = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    return {
+        "rsi": talib.RSI(close, timeperiod=14),
+        "ema_short": talib.EMA(close, timeperiod=12),
+        "ema_long": talib.EMA(close, timeperiod=26),
+        "macd": macd,
+        "macd_signal": macd_signal,
+        "bb_upper": bb_upper,
+        "bb_middle": bb_middle,
+        "bb_lower": bb_lower,
+        "adx": talib.ADX(high, low, close, timeperiod=14),
+    }
+
+
+@pytest.fixture(scope="module")
+def candles():
+    return synthetic_candles()
+
+
+@pytest.fixture(scope="module")
+def streamed(candles):
+    engine = IndicatorEngine()
+    rows = [engine.update(t, h, l, c) for t, h, l, c in
+            zip(candles["timestamp"], candles["high"], candles["low"], candles["close"])]
+    return pd.DataFrame(rows, dtype=float)
+
+
+@pytest.mark.parametrize("name", list(talib_indicators(synthetic_candles(100)).keys()))
+def test_matches_talib(candles, streamed, name):
+    expected = talib_indicators(candles)[name]
+    actual = streamed[name].to_numpy()
+    # Прогрев (первые значения NaN) совпадает по длине
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    valid = ~np.isnan(expected)
+    np.testing.assert_allclose(actual[valid], expected[valid], rtol=TOLERANCE)
+
+
+def test_registry_updates_incrementally_and_restarts_on_gap(candles):
+    registry = IndicatorRegistry()
+    window = candles.iloc[:300]
+    registry.update("BTCUSDT", "1h", window)
+    engine = registry.get("BTCUSDT", "1h")
+
+    # Следующая свеча обрабатывается тем же движком
+    values = registry.update("BTCUSDT", "1h", candles.iloc[200:301])
+    assert registry.get("BTCUSDT", "1h") is engine
+    assert values["rsi"] == pytest.approx(talib_indicators(candles.iloc[:301])["rsi"][-1], rel=TOLERANCE)
+
+    # Свечи, не продолжающие учтенные, пересчитываются заново
+    registry.update("BTCUSDT", "1h", candles.iloc[1000:1300])
+    assert registry.get("BTCUSDT", "1h") is not engine
+    assert registry.get("BTCUSDT", "1h").last_timestamp == candles["timestamp"].iloc[1299]
+
+
+def test_registry_checkpoint_roundtrip(tmp_path, candles):
+    path = tmp_path / "indicators.pkl"
+    registry = IndicatorRegistry(path)
+    expected = registry.update("BTCUSDT", "1h", candles.iloc[:300])
+    registry.save()
+
+    restored = IndicatorRegistry(path)
+    assert restored.get("BTCUSDT", "1h").values() == expected
+    # Состояние с другими периодами не загружается
+    assert IndicatorRegistry(path, rsi_period=7).engines == {}
@@ -1,95 +1,240 @@
+import argparse
 import ccxt
-import requests
+import numpy as np
 import pandas as pd
 import talib
 import json
-import time
-
-# Загрузка настроек из settings.json
-try:
-    with open('settings.json') as f:
-        settings = json.load(f)
-except FileNotFoundError:
-    print("Файл settings.json не найден, используются параметры по умолчанию")
-    settings = {
-        "symbol": "BTCUSDT",                    # Символ торговой пары (например, BTCUSDT для Bitcoin к USDT) ETHUSDT XRPUSDT BNBUSDT
-        "timeframe": "4h",                      # Таймфрейм для анализа (например, 4h - 4 часа)
-        "fgi_threshold_low": 25,                # Нижний порог FGI (Fear and Greed Index) для определения страха (0-25)
-        "fgi_threshold_high": 75,               # Верхний порог FGI для определения жадности (75-100)
-        "rsi_threshold_low": 30,                # Нижний порог RSI для определения перепроданности (0-30)
-        "rsi_threshold_high": 70,               # Верхний порог RSI для определения перекупленности (70-100)
-        "rsi_period": 14,                       # Период для расчета RSI (Relative Strength Index), стандартное значение 14
-        "ema_short_period": 12,                 # Период короткой EMA (Exponential Moving Average), используется для определения тренда
-        "ema_long_period": 26,                  # Период длинной EMA, используется для сравнения с короткой EMA
-        "macd_fast": 12,                        # Период быстрой линии MACD (Moving Average Convergence Divergence)
-        "macd_slow": 26,                        # Период медленной линии MACD
-        "macd_signal": 9,                       # Период сигнальной линии MACD
-        "bollinger_period": 20,                 # Период для расчета Bollinger Bands (обычно 20)
-        "bollinger_deviation": 2,               # Стандартное отклонение для Bollinger Bands (обычно 2)
-        "support_resistance_window": 10,        # Окно для определения уровней поддержки и сопротивления (количество свечей)
-        "show_explanations": False,             # Флаг, показывающий, нужно ли выводить пояснения (True/False)
-        "historical_data_limit": 100,           # Количество свечей для анализа исторических данных
-        "success_threshold": 0.02,              # Порог успеха в процентах (например, 2% роста/падения для определения успешности сигнала)
-        "success_horizon": 5,                   # Горизонт для оценки успеха сигнала (количество свечей вперед)
-        "adx_period": 14                        # Период для расчета ADX (Average Directional Index) для оценки силы тренда
+
+from candle_store import CandleStore
+from history_store import HistoryStore
+from signal_ledger import SignalLedger
+from streaming_indicators import IndicatorRegistry
+from fgi_store import FGIStore
+from report import SignalReport, render_timeframes
+from market_data import AlternativeMeFGI
+from profiling import span
+from rate_limiter import RateLimiter, RateLimitedExchange
+
+SETTINGS_PATH = 'settings.json'
+
+# Параметры по умолчанию, если файл settings.json не найден
+DEFAULT_SETTINGS = {
+    "symbol": "BTCUSDT",                    # Символ торговой пары (например, BTCUSDT для Bitcoin к USDT) ETHUSDT XRPUSDT BNBUSDT
+    "timeframe": "4h",                      # Таймфрейм для анализа (например, 4h - 4 часа)
+    "fgi_threshold_low": 25,                # Нижний порог FGI (Fear and Greed Index) для определения страха (0-25)
+    "fgi_threshold_high": 75,               # Верхний порог FGI для определения жадности (75-100)
+    "rsi_threshold_low": 30,                # Нижний порог RSI для определения перепроданности (0-30)
+    "rsi_threshold_high": 70,               # Верхний порог RSI для определения перекупленности (70-100)
+    "rsi_period": 14,                       # Период для расчета RSI (Relative Strength Index), стандартное значение 14
+    "ema_short_period": 12,                 # Период короткой EMA (Exponential Moving Average), используется для определения тренда
+    "ema_long_period": 26,                  # Период длинной EMA, используется для сравнения с короткой EMA
+    "macd_fast": 12,                        # Период быстрой линии MACD (Moving Average Convergence Divergence)
+    "macd_slow": 26,                        # Период медленной линии MACD
+    "macd_signal": 9,                       # Период сигнальной линии MACD
+    "bollinger_period": 20,                 # Период для расчета Bollinger Bands (обычно 20)
+    "bollinger_deviation": 2,               # Стандартное отклонение для Bollinger Bands (обычно 2)
+    "support_resistance_window": 10,        # Окно для определения уровней поддержки и сопротивления (количество свечей)
+    "show_explanations": False,             # Флаг, показывающий, нужно ли выводить пояснения (True/False)
+    "historical_data_limit": 100,           # Количество свечей для анализа исторических данных
+    "success_threshold": 0.02,              # Порог успеха в процентах (например, 2% роста/падения для определения успешности сигнала)
+    "success_horizon": 5,                   # Горизонт для оценки успеха сигнала (количество свечей вперед)
+    "adx_period": 14,                       # Период для расчета ADX (Average Directional Index) для оценки силы тренда
+    "candle_store_path": "candles.db",      # Файл локального хранилища свечей (SQLite)
+    "scanner_symbols": ["BTCUSDT", "ETHUSDT", "BNBUSDT", "XRPUSDT"],  # Пары для параллельного сканирования (scanner.py)
+    "scanner_max_workers": 8,               # Максимальное число потоков при сканировании
+    "fgi_store_path": "fgi.db",             # Файл локального хранилища истории FGI (SQLite)
+    "fgi_refresh_retry": 3600,              # Интервал повторной попытки обновления FGI, если значение за сегодня еще не получено (секунды)
+    "backtest_grid": {                      # Сетка параметров для перебора в backtest.py (списки значений)
+        "rsi_threshold_low": [25, 30, 35],
+        "rsi_threshold_high": [65, 70, 75],
+        "success_horizon": [4, 8, 12]
+    },
+    "backtest_workers": None,               # Количество процессов для перебора (None - по числу ядер)
+    "backtest_train_size": 2000,            # Размер обучающего окна walk-forward (свечей)
+    "backtest_test_size": 500,              # Размер проверочного окна walk-forward (свечей)
+    "backtest_min_trades": 10,              # Минимум сделок на обучении, чтобы комбинация участвовала в выборе
+    "base_timeframe": None,                 # Базовый таймфрейм, из которого локально строятся старшие (например, "1h"; None - каждый таймфрейм загружается отдельно)
+    "confirm_timeframes": ["1h", "4h", "1d"],  # Таймфреймы для подтверждения сигнала (trading_strategy_multi)
+    "markets_cache_path": "markets.json",   # Файл кэша списка рынков биржи (engine.py)
+    "markets_cache_ttl": 86400,             # Время жизни кэша рынков (секунды)
+    "schedule_prefetch_lead": 10,           # За сколько секунд до закрытия свечи догружать данные (bot.py)
+    "schedule_jitter": 3,                   # Случайная задержка после закрытия свечи перед анализом (секунды)
+    "schedule_retries": 3,                  # Количество повторов анализа по закрытию свечи при ошибке
+    "schedule_backoff": 5,                  # Начальная пауза между повторами (секунды), удваивается с каждой попыткой
+    "rate_limit_per_second": None,          # Общий лимит запросов к бирже в секунду (None - по rateLimit биржи в ccxt)
+    "rate_limit_burst": 5,                  # Сколько запросов подряд можно выполнить без ожидания
+    "history_dir": "history",               # Каталог глубокой истории свечей (backfill.py), колоночные файлы .npy
+    "backfill_page_size": 1000,             # Свечей в одной странице загрузки истории (максимум биржи на запрос)
+    "backfill_workers": 4,                  # Количество страниц истории, загружаемых параллельно
+    "signal_ledger_path": "signals.db",     # Файл журнала выданных сигналов и их исходов (SQLite)
+    "signal_ledger_min_signals": 20,        # Сколько оцененных сигналов нужно, чтобы базовая вероятность бралась из журнала
+    "confidence_level": 0.9,                # Уровень доверительного интервала успешности сигналов
+    "confidence_draws": 2000,               # Количество выборок из апостериорного распределения для интервала
+    "profile_history_size": 200,            # Сколько последних запусков хранить для команды бота /profile
+    "subscriptions_path": "subscriptions.db",  # Файл подписок чатов бота на пары (SQLite)
+    "telegram_rate_per_second": 25,         # Сколько сообщений в секунду бот отправляет всем чатам вместе
+    "telegram_chat_interval": 1.0,          # Минимальный интервал между сообщениями в один чат (секунды)
+    "correlation_window": 50,               # Окно (в свечах) скользящих корреляций и волатильности пар (correlation.py)
+    "scenario_alert_share": 0.5,            # Доля пар с одним направленным сценарием на свече, при которой бот предупреждает
+    "scenario_alert_min_pairs": 3,          # Минимальное число пар с одним сценарием для предупреждения
+    "indicator_state_path": "indicators.pkl"  # Файл состояния потоковых индикаторов по закрытым свечам (streaming_indicators.py)
+}
+
+def load_settings(path=SETTINGS_PATH):
+    """Загрузка настроек из settings.json"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print("Файл settings.json не найден, используются параметры по умолчанию")
+        return dict(DEFAULT_SETTINGS)
+
+def apply_settings(new_settings):
+    """Применение настроек к параметрам модуля.
+       Вызывается при импорте и при горячей перезагрузке settings.json (StrategyEngine в engine.py);
+       параметры читаются функциями в момент вызова, поэтому новые значения действуют со следующего анализа.
+    """
+    global settings, SYMBOL, TIMEFRAME, FGI_THRESHOLD_LOW, FGI_THRESHOLD_HIGH, RSI_THRESHOLD_LOW, RSI_THRESHOLD_HIGH, RSI_PERIOD, EMA_SHORT_PERIOD
+    global EMA_LONG_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL, BOLLINGER_PERIOD, BOLLINGER_DEVIATION, SUPPORT_RESISTANCE_WINDOW, SHOW_EXPLANATIONS
+    global HISTORICAL_DATA_LIMIT, SUCCESS_THRESHOLD, SUCCESS_HORIZON, ADX_PERIOD, CANDLE_STORE_PATH, BASE_TIMEFRAME, CONFIRM_TIMEFRAMES, FGI_STORE_PATH, FGI_REFRESH_RETRY, HISTORY_DIR
+    global SIGNAL_LEDGER_PATH, SIGNAL_LEDGER_MIN_SIGNALS, CONFIDENCE_LEVEL, CONFIDENCE_DRAWS, INDICATOR_STATE_PATH
+    settings = new_settings
+    SYMBOL = settings.get("symbol", "BTCUSDT")
+    TIMEFRAME = settings.get("timeframe", "4h")
+    FGI_THRESHOLD_LOW = settings.get("fgi_threshold_low", 25)
+    FGI_THRESHOLD_HIGH = settings.get("fgi_threshold_high", 75)
+    RSI_THRESHOLD_LOW = settings.get("rsi_threshold_low", 30)
+    RSI_THRESHOLD_HIGH = settings.get("rsi_threshold_high", 70)
+    RSI_PERIOD = settings.get("rsi_period", 14)
+    EMA_SHORT_PERIOD = settings.get("ema_short_period", 12)
+    EMA_LONG_PERIOD = settings.get("ema_long_period", 26)
+    MACD_FAST = settings.get("macd_fast", 12)
+    MACD_SLOW = settings.get("macd_slow", 26)
+    MACD_SIGNAL = settings.get("macd_signal", 9)
+    BOLLINGER_PERIOD = settings.get("bollinger_period", 20)
+    BOLLINGER_DEVIATION = settings.get("bollinger_deviation", 2)
+    SUPPORT_RESISTANCE_WINDOW = settings.get("support_resistance_window", 10)
+    SHOW_EXPLANATIONS = settings.get("show_explanations", False)
+    HISTORICAL_DATA_LIMIT = settings.get("historical_data_limit", 100)
+    SUCCESS_THRESHOLD = settings.get("success_threshold", 0.02)
+    SUCCESS_HORIZON = settings.get("success_horizon", 5)
+    ADX_PERIOD = settings.get("adx_period", 14)
+    CANDLE_STORE_PATH = settings.get("candle_store_path", "candles.db")
+    BASE_TIMEFRAME = settings.get("base_timeframe")
+    CONFIRM_TIMEFRAMES = settings.get("confirm_timeframes", ["1h", "4h", "1d"])
+    FGI_STORE_PATH = settings.get("fgi_store_path", "fgi.db")
+    FGI_REFRESH_RETRY = settings.get("fgi_refresh_retry", 3600)
+    HISTORY_DIR = settings.get("history_dir", "history")
+    SIGNAL_LEDGER_PATH = settings.get("signal_ledger_path", "signals.db")
+    SIGNAL_LEDGER_MIN_SIGNALS = settings.get("signal_ledger_min_signals", 20)
+    CONFIDENCE_LEVEL = settings.get("confidence_level", 0.9)
+    CONFIDENCE_DRAWS = settings.get("confidence_draws", 2000)
+    INDICATOR_STATE_PATH = settings.get("indicator_state_path", "indicators.pkl")
+
+apply_settings(load_settings())
+
+# Источники рыночных данных; use_backend подменяет их, например, на воспроизведение записанной истории.
+# Все запросы к бирже из бота, сканера и догрузки истории проходят через один общий лимит с приоритетами
+# вместо собственного ограничителя каждого экземпляра ccxt
+_bybit = ccxt.bybit({'enableRateLimit': False})
+
+def rate_limit_settings():
+    """(запросов в секунду, запросов подряд) общего лимита из текущих настроек; без rate_limit_per_second — по rateLimit биржи в ccxt"""
+    return settings.get("rate_limit_per_second") or 1000 / _bybit.rateLimit, settings.get("rate_limit_burst", 5)
+
+rate_limiter = RateLimiter(*rate_limit_settings())
+exchange = RateLimitedExchange(_bybit, rate_limiter)
+fgi_source = AlternativeMeFGI()
+candle_store = CandleStore(CANDLE_STORE_PATH)
+history_store = HistoryStore(HISTORY_DIR)
+signal_ledger = SignalLedger(SIGNAL_LEDGER_PATH)
+fgi_store = FGIStore(FGI_STORE_PATH, clock=lambda: exchange.milliseconds() / 1000)
+
+def indicator_periods():
+    """Периоды индикаторов из текущих настроек в формате IndicatorEngine"""
+    return {
+        "rsi_period": RSI_PERIOD, "ema_short_period": EMA_SHORT_PERIOD, "ema_long_period": EMA_LONG_PERIOD,
+        "macd_fast": MACD_FAST, "macd_slow": MACD_SLOW, "macd_signal": MACD_SIGNAL,
+        "bollinger_period": BOLLINGER_PERIOD, "bollinger_deviation": BOLLINGER_DEVIATION, "adx_period": ADX_PERIOD,
     }
 
-SYMBOL = settings.get("symbol", "BTCUSDT")
-TIMEFRAME = settings.get("timeframe", "4h")
-FGI_THRESHOLD_LOW = settings.get("fgi_threshold_low", 25)
-FGI_THRESHOLD_HIGH = settings.get("fgi_threshold_high", 75)
-RSI_THRESHOLD_LOW = settings.get("rsi_threshold_low", 30)
-RSI_THRESHOLD_HIGH = settings.get("rsi_threshold_high", 70)
-RSI_PERIOD = settings.get("rsi_period", 14)
-EMA_SHORT_PERIOD = settings.get("ema_short_period", 12)
-EMA_LONG_PERIOD = settings.get("ema_long_period", 26)
-MACD_FAST = settings.get("macd_fast", 12)
-MACD_SLOW = settings.get("macd_slow", 26)
-MACD_SIGNAL = settings.get("macd_signal", 9)
-BOLLINGER_PERIOD = settings.get("bollinger_period", 20)
-BOLLINGER_DEVIATION = settings.get("bollinger_deviation", 2)
-SUPPORT_RESISTANCE_WINDOW = settings.get("support_resistance_window", 10)
-SHOW_EXPLANATIONS = settings.get("show_explanations", False)
-HISTORICAL_DATA_LIMIT = settings.get("historical_data_limit", 100)
-SUCCESS_THRESHOLD = settings.get("success_threshold", 0.02)
-SUCCESS_HORIZON = settings.get("success_horizon", 5)
-ADX_PERIOD = settings.get("adx_period", 14)
-
-exchange = ccxt.bybit({'enableRateLimit': True})
+# Потоковые индикаторы по закрытым свечам: на каждую новую свечу — O(1) вместо пересчета TA-Lib по окну
+indicator_registry = IndicatorRegistry(INDICATOR_STATE_PATH, **indicator_periods())
+
+def streamed_indicators(symbol, timeframe, candles):
+    """Индикаторы последней закрытой свечи из потокового состояния пары (None, пока оно не прогрето).
+       Если изменились периоды или путь к файлу состояния, состояние строится заново.
+    """
+    global indicator_registry
+    if indicator_registry.periods != indicator_periods() or indicator_registry.path != INDICATOR_STATE_PATH:
+        indicator_registry = IndicatorRegistry(INDICATOR_STATE_PATH, **indicator_periods())
+    values = indicator_registry.update(symbol, timeframe, candles)
+    if any(value is None for value in values.values()):
+        return None
+    if indicator_registry.path:
+        try:
+            indicator_registry.save()
+        except OSError as e:
+            print(f"Ошибка при сохранении состояния индикаторов: {e}")
+    return values
+
+def use_backend(new_exchange=None, new_fgi_source=None, candle_store_path=None, fgi_store_path=None,
+                signal_ledger_path=None, history_dir=None):
+    """Подмена источников данных и хранилищ (биржа с интерфейсом ccxt, источник FGI с методом fetch(limit))"""
+    global exchange, fgi_source, candle_store, fgi_store, signal_ledger, history_store
+    if new_exchange is not None:
+        exchange = new_exchange
+    if new_fgi_source is not None:
+        fgi_source = new_fgi_source
+    if candle_store_path is not None:
+        candle_store = CandleStore(candle_store_path)
+    if fgi_store_path is not None:
+        fgi_store = FGIStore(fgi_store_path, clock=lambda: exchange.milliseconds() / 1000)
+    if signal_ledger_path is not None:
+        signal_ledger = SignalLedger(signal_ledger_path)
+    if history_dir is not None:
+        history_store = HistoryStore(history_dir)
 
 def get_fgi():
     """Получение текущего значения FGI"""
     try:
-        url = "https://api.alternative.me/fng/?limit=1&format=json"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        return int(data['data'][0]['value'])
+        return int(fgi_source.fetch(1)[0]['value'])
     except Exception as e:
         print(f"Ошибка при получении текущего FGI: {e}")
         return None
 
-def get_historical_fgi(limit=100):
-    """Получение исторических значений FGI.
-       Возвращает список значений, где индекс 0 – самое старое, а последний – текущее.
+def get_fgi_series():
+    """История FGI из локального хранилища (pd.Series по дням, UTC).
+       С API запрашиваются только недостающие дни и не чаще одного раза в сутки;
+       при пустом хранилище загружается вся доступная история.
     """
+    if fgi_store.needs_refresh(FGI_REFRESH_RETRY):
+        last_timestamp = fgi_store.last_timestamp()
+        # limit=0 возвращает всю историю индекса
+        limit = 0 if last_timestamp is None else int(fgi_store.clock() - last_timestamp) // 86400 + 1
+        try:
+            fgi_store.append((int(item['timestamp']), int(item['value'])) for item in fgi_source.fetch(limit))
+        except Exception as e:
+            print(f"Ошибка при обновлении истории FGI: {e}")
+        fgi_store.mark_refresh()
+    return fgi_store.load()
+
+def align_fgi(timestamps, fgi_series, default=50):
+    """Сопоставление дневных значений FGI с метками времени свечей (as-of join):
+       каждой свече соответствует последнее значение FGI на момент её открытия.
+       Свечам раньше начала истории FGI присваивается значение default.
+    """
+    timestamps = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[ns]')
+    if fgi_series.empty:
+        return np.full(len(timestamps), default)
+    fgi_dates = fgi_series.index.to_numpy(dtype='datetime64[ns]')
+    positions = np.searchsorted(fgi_dates, timestamps, side='right') - 1
+    aligned = fgi_series.to_numpy()[np.maximum(positions, 0)]
+    return np.where(positions >= 0, aligned, default)
+
+def fetch_ohlcv(symbol, timeframe, limit=None):
     try:
-        url = f"https://api.alternative.me/fng/?limit={limit}&format=json"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        # API возвращает данные в обратном порядке (свежие данные первыми), переворачиваем список
-        fgi_list = [int(item['value']) for item in data['data']]
-        fgi_list.reverse()
-        return fgi_list
-    except Exception as e:
-        print(f"Ошибка при получении исторических значений FGI: {e}")
-        current = get_fgi()
-        return [current] * limit if current is not None else [50] * limit
-
-def fetch_ohlcv(symbol, timeframe, limit=HISTORICAL_DATA_LIMIT):
-    try:
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit or HISTORICAL_DATA_LIMIT)
         df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         return df
@@ -97,6 +242,114 @@ def fetch_ohlcv(symbol, timeframe, limit=HISTORICAL_DATA_LIMIT):
         print(f"Ошибка при загрузке данных для {symbol}: {e}")
         return None
 
+def candle_open_time(timeframe, timestamp_ms):
+    """Время открытия (мс) свечи таймфрейма timeframe, в которую попадает момент timestamp_ms.
+       Границы свечей совпадают с биржевыми (от начала эпохи UTC, недели — с понедельника, месяцы — с 1-го числа).
+       Принимает число или массив меток времени (кроме месячного таймфрейма).
+    """
+    if timeframe.endswith('M'):
+        return pd.Timestamp(timestamp_ms, unit='ms').to_period('M').start_time.value // 10**6
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+    # 1970-01-01 — четверг, недельные свечи на бирже начинаются в понедельник
+    origin = 4 * 86400 * 1000 if timeframe.endswith('w') else 0
+    return (timestamp_ms - origin) // timeframe_ms * timeframe_ms + origin
+
+def resample_ohlcv(df, timeframe):
+    """Построение свечей старшего таймфрейма из свечей младшего (OHLCV в формате fetch_ohlcv).
+       Границы свечей совпадают с биржевыми (от начала эпохи UTC, недели — с понедельника).
+       Неполная первая свеча отбрасывается, последняя (текущая, еще не закрытая) сохраняется.
+    """
+    if df is None or df.empty:
+        return df
+    timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    opens = candle_open_time(timeframe, timestamps)
+    starts = np.flatnonzero(np.diff(opens, prepend=opens[0] - 1))
+    ends = np.append(starts[1:], len(opens)) - 1
+
+    resampled = pd.DataFrame({
+        "timestamp": pd.to_datetime(opens[starts], unit='ms'),
+        "open": df['open'].to_numpy()[starts],
+        "high": np.maximum.reduceat(df['high'].to_numpy(), starts),
+        "low": np.minimum.reduceat(df['low'].to_numpy(), starts),
+        "close": df['close'].to_numpy()[ends],
+        "volume": np.add.reduceat(df['volume'].to_numpy(), starts),
+    })
+    if timestamps[0] > opens[0]:
+        resampled = resampled.iloc[1:].reset_index(drop=True)
+    return resampled
+
+def get_candles(symbol, timeframe, limit=None, refresh_base=True):
+    """Последние limit свечей таймфрейма timeframe (по умолчанию — historical_data_limit из текущих настроек).
+       Если задан base_timeframe и timeframe кратен ему, свечи строятся локально из базового потока,
+       так что на каждую пару с биржи загружается только один таймфрейм.
+       refresh_base=False берет базовые свечи из хранилища без обращения к бирже.
+    """
+    limit = limit or HISTORICAL_DATA_LIMIT
+    if BASE_TIMEFRAME and timeframe != BASE_TIMEFRAME and not timeframe.endswith('M'):
+        timeframe_seconds = exchange.parse_timeframe(timeframe)
+        base_seconds = exchange.parse_timeframe(BASE_TIMEFRAME)
+        if timeframe_seconds > base_seconds and timeframe_seconds % base_seconds == 0:
+            ratio = timeframe_seconds // base_seconds
+            base = _load_candles(symbol, BASE_TIMEFRAME, limit=(limit + 1) * ratio, refresh=refresh_base)
+            if base is None:
+                return None
+            return resample_ohlcv(base, timeframe).iloc[-limit:].reset_index(drop=True)
+    return _load_candles(symbol, timeframe, limit, refresh=refresh_base or timeframe != BASE_TIMEFRAME)
+
+def fetch_ohlcv_since(symbol, timeframe, since, page_size=None):
+    """Свечи с открытием не раньше since до текущей включительно, постранично через since (как backfill.py):
+       биржа отдает не больше page_size свечей за запрос (у Bybit — 1000), поэтому длинный интервал
+       загружается несколькими запросами.
+    """
+    page_size = page_size or settings.get("backfill_page_size", 1000)
+    current = candle_open_time(timeframe, exchange.milliseconds())
+    rows = []
+    while True:
+        page = [row for row in exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=page_size) if row[0] >= since]
+        if not page:
+            break
+        rows.extend(page)
+        if page[-1][0] >= current:
+            break
+        since = int(page[-1][0]) + 1
+    return rows
+
+def _load_candles(symbol, timeframe, limit, refresh=True):
+    """Последние limit свечей из локального хранилища с догрузкой с биржи.
+       Если хранилище уже покрывает последние limit свечей, запрашиваются только свечи начиная
+       с последней сохранённой (она могла быть ещё не закрыта). Если свечей меньше limit или первая
+       сохранённая позже начала окна (например, limit увеличили), окно загружается целиком с его начала.
+       Загрузка идет страницами по backfill_page_size свечей, так что limit может превышать
+       ограничение биржи на один запрос (например, (limit + 1) * ratio базовых свечей).
+    """
+    last_timestamp = candle_store.last_timestamp(exchange.id, symbol, timeframe)
+    if not refresh and last_timestamp is not None:
+        return _with_history(symbol, timeframe, candle_store.load(exchange.id, symbol, timeframe, limit=limit), limit)
+    try:
+        timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+        first = candle_open_time(timeframe, candle_open_time(timeframe, exchange.milliseconds()) - (limit - 1) * timeframe_ms)
+        count, first_stored = candle_store.coverage(exchange.id, symbol, timeframe)
+        covered = last_timestamp is not None and last_timestamp >= first and count >= limit and first_stored <= first
+        since = last_timestamp if covered else first
+        candle_store.append(exchange.id, symbol, timeframe, fetch_ohlcv_since(symbol, timeframe, since))
+    except Exception as e:
+        print(f"Ошибка при загрузке данных для {symbol}: {e}")
+        if last_timestamp is None:
+            return None
+    return _with_history(symbol, timeframe, candle_store.load(exchange.id, symbol, timeframe, limit=limit), limit)
+
+def _with_history(symbol, timeframe, candles, limit):
+    """Дополнение свечей из хранилища более ранними свечами из глубокой истории (backfill.py) до limit.
+       История читается из файлов, отображенных в память: копируется только нужный хвост.
+    """
+    if len(candles) >= limit:
+        return candles
+    before = candles['timestamp'].iloc[0].value // 10**6 if not candles.empty else None
+    older = history_store.load(exchange.id, symbol, timeframe, limit=limit - len(candles), before=before)
+    if older.empty:
+        return candles
+    return pd.concat([older, candles], ignore_index=True)
+
 def calculate_rsi(df, period):
     if df is None or len(df) < period + 1:
         print(f"Недостаточно данных для расчета RSI с period={period}: {len(df) if df is not None else 'None'} свечей")
@@ -141,12 +394,32 @@ def calculate_adx(df, period):
     adx = talib.ADX(df["high"], df["low"], df["close"], timeperiod=period)
     return adx
 
-def get_price_volume(symbol, timeframe):
-    df = fetch_ohlcv(symbol, timeframe, limit=2)
+def get_price_volume(symbol, timeframe, df=None):
+    if df is None:
+        df = fetch_ohlcv(symbol, timeframe, limit=2)
     if df is not None and len(df) >= 2:
         return df['close'].iloc[-1], df['volume'].iloc[-1]
     return None, None
 
+def classify_scenarios(fgi, rsi, fgi_low=None, fgi_high=None, rsi_low=None, rsi_high=None):
+    """Векторная классификация сценариев по массивам FGI и RSI.
+       Порядок условий совпадает с логикой trading_strategy: long, short, divergence_long, divergence_short, neutral.
+       Не заданные пороги берутся из текущих настроек.
+    """
+    fgi_low = FGI_THRESHOLD_LOW if fgi_low is None else fgi_low
+    fgi_high = FGI_THRESHOLD_HIGH if fgi_high is None else fgi_high
+    rsi_low = RSI_THRESHOLD_LOW if rsi_low is None else rsi_low
+    rsi_high = RSI_THRESHOLD_HIGH if rsi_high is None else rsi_high
+    fgi = np.asarray(fgi, dtype=float)
+    rsi = np.asarray(rsi, dtype=float)
+    conditions = [
+        (fgi <= fgi_low) & (rsi <= rsi_low),
+        (fgi >= fgi_high) & (rsi >= rsi_high),
+        (fgi >= fgi_high) & (rsi <= rsi_low),
+        (fgi <= fgi_low) & (rsi >= rsi_high),
+    ]
+    return np.select(conditions, ["long", "short", "divergence_long", "divergence_short"], default="neutral")
+
 def analyze_historical_signals(df, fgi_values):
     if df is None or len(df) < HISTORICAL_DATA_LIMIT:
         print("Недостаточно данных для исторического анализа")
@@ -162,64 +435,49 @@ def analyze_historical_signals(df, fgi_values):
         print("Ошибка в расчетах индикаторов для исторического анализа")
         return {}
 
-    historical_signals = []
-    for i in range(len(df) - SUCCESS_HORIZON):
-        if pd.isna(rsi.iloc[i]) or pd.isna(ema_short.iloc[i]) or pd.isna(macd.iloc[i]) or pd.isna(bb_upper.iloc[i]) or pd.isna(adx.iloc[i]):
-            continue
-
-        # Используем историческое значение FGI, если доступно, иначе последнее значение
-        fgi = fgi_values[i] if i < len(fgi_values) else fgi_values[-1]
-        current_rsi = rsi.iloc[i]
-        current_price = df['close'].iloc[i]
-        current_volume = df['volume'].iloc[i]
-        prev_volume = df['volume'].iloc[i-1] if i > 0 else 0
-        current_ema_short = ema_short.iloc[i]
-        current_ema_long = ema_long.iloc[i]
-        current_macd = macd.iloc[i]
-        current_macd_signal = macd_signal.iloc[i]
-        current_bb_upper = bb_upper.iloc[i]
-        current_bb_lower = bb_lower.iloc[i]
-        current_adx = adx.iloc[i]
-
-        if fgi <= FGI_THRESHOLD_LOW and current_rsi <= RSI_THRESHOLD_LOW:
-            scenario = "long"
-        elif fgi >= FGI_THRESHOLD_HIGH and current_rsi >= RSI_THRESHOLD_HIGH:
-            scenario = "short"
-        elif fgi >= FGI_THRESHOLD_HIGH and current_rsi <= RSI_THRESHOLD_LOW:
-            scenario = "divergence_long"
-        elif fgi <= FGI_THRESHOLD_LOW and current_rsi >= RSI_THRESHOLD_HIGH:
-            scenario = "divergence_short"
-        else:
-            scenario = "neutral"
+    n = len(df) - SUCCESS_HORIZON
+    if n <= 0 or not len(fgi_values):
+        return {}
 
-        trend = "bullish" if current_ema_short > current_ema_long else "bearish"
-        trend_strength = "strong" if current_adx > 25 else "weak"
+    # Все расчеты выполняются над массивами целиком, без цикла по свечам
+    close = df["close"].to_numpy(dtype=float)
+    rsi_values = rsi.to_numpy(dtype=float)[:n]
+    ema_short_values = ema_short.to_numpy(dtype=float)[:n]
+    ema_long_values = ema_long.to_numpy(dtype=float)[:n]
+    adx_values = adx.to_numpy(dtype=float)[:n]
 
-        future_price = df['close'].iloc[i + SUCCESS_HORIZON]
-        price_change = (future_price - current_price) / current_price
-        if scenario in ["long", "divergence_long"]:
-            success = price_change >= SUCCESS_THRESHOLD
-        elif scenario in ["short", "divergence_short"]:
-            success = price_change <= -SUCCESS_THRESHOLD
-        else:
-            continue
+    # Используем историческое значение FGI, если доступно, иначе последнее значение
+    fgi = np.asarray(fgi_values, dtype=float)[:n]
+    if len(fgi) < n:
+        fgi = np.concatenate([fgi, np.full(n - len(fgi), fgi[-1])])
 
-        signal = {
-            "scenario": scenario,
-            "trend": trend,
-            "trend_strength": trend_strength,
-            "success": success
-        }
-        historical_signals.append(signal)
+    valid = ~(np.isnan(rsi_values) | np.isnan(ema_short_values) | np.isnan(macd.to_numpy(dtype=float)[:n])
+              | np.isnan(bb_upper.to_numpy(dtype=float)[:n]) | np.isnan(adx_values))
+
+    scenario = classify_scenarios(fgi, rsi_values, FGI_THRESHOLD_LOW, FGI_THRESHOLD_HIGH, RSI_THRESHOLD_LOW, RSI_THRESHOLD_HIGH)
+    trend = np.where(ema_short_values > ema_long_values, "bullish", "bearish")
+    trend_strength = np.where(adx_values > 25, "strong", "weak")
+
+    price_change = (close[SUCCESS_HORIZON:SUCCESS_HORIZON + n] - close[:n]) / close[:n]
+    is_long = (scenario == "long") | (scenario == "divergence_long")
+    is_short = (scenario == "short") | (scenario == "divergence_short")
+    success = (is_long & (price_change >= SUCCESS_THRESHOLD)) | (is_short & (price_change <= -SUCCESS_THRESHOLD))
+
+    mask = valid & (is_long | is_short)
+    if not mask.any():
+        return {}
+
+    signals = pd.DataFrame({
+        "scenario": scenario[mask],
+        "trend": trend[mask],
+        "trend_strength": trend_strength[mask],
+        "success": success[mask],
+    })
+    grouped = signals.groupby(["scenario", "trend", "trend_strength"], sort=False)["success"].agg(["size", "sum"])
 
     success_rates = {}
-    for signal in historical_signals:
-        key = (signal["scenario"], signal["trend"], signal["trend_strength"])
-        if key not in success_rates:
-            success_rates[key] = {"total": 0, "success": 0}
-        success_rates[key]["total"] += 1
-        if signal["success"]:
-            success_rates[key]["success"] += 1
+    for key, total, successful in zip(grouped.index, grouped["size"], grouped["sum"]):
+        success_rates[key] = {"total": int(total), "success": int(successful)}
 
     return success_rates
 
@@ -235,270 +493,244 @@ def calculate_probability(scenario, trend, trend_strength, success_rates, volume
     probability = base_probability + confirmation_bonus
     return probability
 
-def print_explanations(ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed, scenario):
-    print("\n📝 <b>Пояснения</b>")
-    if scenario in ["long", "short"]:
-        scenario_text = "Согласованный сигнал (Long)" if scenario == "long" else "Согласованный сигнал (Short)"
-        print(f"📋 <b>Сценарий:</b> {scenario_text}")
-        print("➡️ FGI и RSI указывают в одном направлении.")
-    elif scenario in ["divergence_long", "divergence_short"]:
-        scenario_text = "Перекос сигналов (Long)" if scenario == "divergence_long" else "Перекос сигналов (Short)"
-        print(f"📋 <b>Сценарий:</b> {scenario_text}")
-        print("⚠️ FGI и RSI противоречат друг другу.")
-    else:
-        print("📋 <b>Сценарий:</b> Нейтральная зона")
-        print("ℹ️ Значения индикаторов не дают чёткого сигнала.")
-    
-    print("🔍 <b>Дополнительные индикаторы:</b>")
-    print("• <b>Объем:</b> Подтвержден, если текущий объем выше предыдущего на 20%.")
-    print(f"• <b>EMA:</b> Короткая EMA выше длинной для бычьего тренда и наоборот. — {'✅ Подтверждено' if ema_confirmed else '❌ Не подтверждено'}.")
-    print("• <b>MACD:</b> Бычий сигнал, если MACD выше сигнальной линии, и наоборот. — " + ("✅ Подтверждено" if macd_confirmed else "❌ Не подтверждено"))
-    print("• <b>Bollinger Bands:</b> Цена у нижней полосы или ниже (для long) и у верхней полосы или выше (для short). — " + ("✅ Подтверждено" if bollinger_confirmed else "❌ Не подтверждено"))
-    print("• <b>Поддержка/Сопротивление:</b> Цена близка к ключевым уровням (разница менее 2%). — " + ("✅ Подтверждено" if sr_confirmed else "❌ Не подтверждено"))
-
-
-def trading_strategy(symbol, timeframe):
-    # Загружаем исторические данные
-    historical_df = fetch_ohlcv(symbol, timeframe, limit=HISTORICAL_DATA_LIMIT)
-    if historical_df is None or historical_df.empty:
-        print("❌ <b>Ошибка:</b> Не удалось загрузить исторические данные.")
-        return
-
-    # Получаем исторические значения FGI
-    historical_fgi = get_historical_fgi(limit=len(historical_df))
-    if historical_fgi is None or len(historical_fgi) != len(historical_df):
-        print("⚠️ <b>Предупреждение:</b> Количество исторических значений FGI не совпадает с количеством свечей. Будет использовано последнее доступное значение.")
-        historical_fgi = [historical_fgi[-1]] * len(historical_df) if historical_fgi else [50] * len(historical_df)
-
-    current_fgi = get_fgi()
-    if current_fgi is None:
-        print("❌ <b>Ошибка:</b> Не удалось получить текущее значение FGI.")
-        return
-
-    # Дополнительные данные для расчета индикаторов
-    required_limit = max(EMA_LONG_PERIOD + MACD_SIGNAL, BOLLINGER_PERIOD, SUPPORT_RESISTANCE_WINDOW * 2) + 1
-    df = fetch_ohlcv(symbol, timeframe, limit=required_limit)
-    if df is None or df.empty:
-        print("❌ <b>Ошибка:</b> Не удалось загрузить данные для расчета индикаторов.")
-        return
-
-    rsi_series = calculate_rsi(df, RSI_PERIOD)
-    if rsi_series is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете RSI.")
-        return
-    rsi = rsi_series.iloc[-1]
-
-    price, volume = get_price_volume(symbol, timeframe)
-    if price is None or volume is None:
-        print("❌ <b>Ошибка:</b> Недоступны данные о цене или объеме.")
-        return
-
-    ema_short_series, ema_long_series = calculate_ema(df, EMA_SHORT_PERIOD, EMA_LONG_PERIOD)
-    if ema_short_series is None or ema_long_series is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете EMA.")
-        return
-    ema_short = float(ema_short_series.iloc[-1])
-    ema_long = float(ema_long_series.iloc[-1])
-
-    macd_series, macd_signal_series = calculate_macd(df, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
-    if macd_series is None or macd_signal_series is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете MACD.")
-        return
-    macd = float(macd_series.iloc[-1])
-    macd_signal = float(macd_signal_series.iloc[-1])
-
-    bb_upper_series, bb_middle_series, bb_lower_series = calculate_bollinger_bands(df, BOLLINGER_PERIOD, BOLLINGER_DEVIATION)
-    if bb_upper_series is None or bb_middle_series is None or bb_lower_series is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете Bollinger Bands.")
-        return
-    bb_upper = float(bb_upper_series.iloc[-1])
-    bb_middle = float(bb_middle_series.iloc[-1])
-    bb_lower = float(bb_lower_series.iloc[-1])
-
-    support, resistance = calculate_support_resistance(df, SUPPORT_RESISTANCE_WINDOW)
-    if support is None or resistance is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете уровней поддержки/сопротивления.")
-        return
-
-    adx_series = calculate_adx(df, ADX_PERIOD)
-    if adx_series is None:
-        print("❌ <b>Ошибка:</b> Ошибка при расчете ADX.")
-        return
-    adx = adx_series.iloc[-1]
-
-    prev_volume = df['volume'].iloc[-2] if len(df) >= 2 else 0
-
-    success_rates = analyze_historical_signals(historical_df, historical_fgi)
-
-    scenario = None
-    recommendation = None
-    volume_confirmed = False
-    ema_confirmed = False
-    macd_confirmed = False
-    bollinger_confirmed = False
-    sr_confirmed = False
-    trend = "bullish" if ema_short > ema_long else "bearish"
-    trend_strength = "strong" if adx > 25 else "weak"
-
-    # Логика формирования сигналов с проверкой подтверждений
-    if current_fgi <= FGI_THRESHOLD_LOW and rsi <= RSI_THRESHOLD_LOW:
-        scenario = "long"
-        volume_confirmed = volume > prev_volume * 1.2
-        ema_confirmed = ema_short > ema_long
-        macd_confirmed = macd > macd_signal
-        bollinger_confirmed = price <= bb_lower
-        sr_confirmed = abs(price - support) / price < 0.02
-        confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                               f"EMA: {'✅' if ema_confirmed else '❌'}, "
-                               f"MACD: {'✅' if macd_confirmed else '❌'}, "
-                               f"Bollinger Bands: {'✅' if bollinger_confirmed else '❌'}, "
-                               f"Поддержка/Сопротивление: {'✅' if sr_confirmed else '❌'}")
-        confirmed_count = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-        if confirmed_count >= 3:
-            recommendation = f"FGI = {current_fgi} (рынок в страхе), RSI = {rsi:.2f} (перепроданность). <b>Рекомендую покупку</b> ({confirmation_status})"
-        else:
-            recommendation = f"FGI = {current_fgi} (рынок в страхе), RSI = {rsi:.2f} (перепроданность). Сигнал на покупку <b>слабый</b>, ждем подтверждения ({confirmation_status})"
-
-    elif current_fgi >= FGI_THRESHOLD_HIGH and rsi >= RSI_THRESHOLD_HIGH:
-        scenario = "short"
-        volume_confirmed = volume > prev_volume * 1.2
-        ema_confirmed = ema_short < ema_long
-        macd_confirmed = macd < macd_signal
-        bollinger_confirmed = price >= bb_upper
-        sr_confirmed = abs(price - resistance) / price < 0.02
-        confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                               f"EMA: {'✅' if ema_confirmed else '❌'}, "
-                               f"MACD: {'✅' if macd_confirmed else '❌'}, "
-                               f"Bollinger Bands: {'✅' if bollinger_confirmed else '❌'}, "
-                               f"Поддержка/Сопротивление: {'✅' if sr_confirmed else '❌'}")
-        confirmed_count = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-        if confirmed_count >= 3:
-            recommendation = f"FGI = {current_fgi} (рынок в жадности), RSI = {rsi:.2f} (перекупленность). <b>Рекомендую продажу</b> ({confirmation_status})"
-        else:
-            recommendation = f"FGI = {current_fgi} (рынок в жадности), RSI = {rsi:.2f} (перекупленность). Сигнал на продажу <b>слабый</b>, ждем подтверждения ({confirmation_status})"
-
-    elif current_fgi >= FGI_THRESHOLD_HIGH and rsi <= RSI_THRESHOLD_LOW:
-        scenario = "divergence_long"
-        volume_confirmed = volume > prev_volume * 1.2
-        ema_confirmed = ema_short > ema_long
-        macd_confirmed = macd > macd_signal
-        bollinger_confirmed = price <= bb_lower
-        sr_confirmed = abs(price - support) / price < 0.02
-        confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                               f"EMA: {'✅' if ema_confirmed else '❌'}, "
-                               f"MACD: {'✅' if macd_confirmed else '❌'}, "
-                               f"Bollinger Bands: {'✅' if bollinger_confirmed else '❌'}, "
-                               f"Поддержка/Сопротивление: {'✅' if sr_confirmed else '❌'}")
-        confirmed_count = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-        if confirmed_count >= 3:
-            recommendation = f"Перекос: FGI = {current_fgi} (жадность), RSI = {rsi:.2f} (перепроданность). <b>Рекомендую покупку</b> ({confirmation_status})"
-        else:
-            recommendation = f"Перекос: FGI = {current_fgi} (жадность), RSI = {rsi:.2f} (перепроданность). Сигнал на покупку <b>слабый</b>, ждем подтверждения ({confirmation_status})"
-
-    elif current_fgi <= FGI_THRESHOLD_LOW and rsi >= RSI_THRESHOLD_HIGH:
-        scenario = "divergence_short"
-        volume_confirmed = volume > prev_volume * 1.2
-        ema_confirmed = ema_short < ema_long
-        macd_confirmed = macd < macd_signal
-        bollinger_confirmed = price >= bb_upper
-        sr_confirmed = abs(price - resistance) / price < 0.02
-        confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                               f"EMA: {'✅' if ema_confirmed else '❌'}, "
-                               f"MACD: {'✅' if macd_confirmed else '❌'}, "
-                               f"Bollinger Bands: {'✅' if bollinger_confirmed else '❌'}, "
-                               f"Поддержка/Сопротивление: {'✅' if sr_confirmed else '❌'}")
-        confirmed_count = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-        if confirmed_count >= 3:
-            recommendation = f"Перекос: FGI = {current_fgi} (страх), RSI = {rsi:.2f} (перекупленность). <b>Рекомендую продажу</b> ({confirmation_status})"
-        else:
-            recommendation = f"Перекос: FGI = {current_fgi} (страх), RSI = {rsi:.2f} (перекупленность). Сигнал на продажу <b>слабый</b>, ждем подтверждения ({confirmation_status})"
+def success_rate_intervals(success_rates, level=None, draws=None, seed=0):
+    """Доверительные интервалы успешности (в процентах) для каждого ключа success_rates.
+       Выборки из апостериорного Beta(1 + успехи, 1 + неудачи) для всех ключей берутся одной операцией
+       над массивом (ключи x draws), поэтому при 2 сигналах интервал честно широкий, а расчет занимает доли миллисекунды.
+       Фиксированный seed делает отчет воспроизводимым.
+    """
+    if not success_rates:
+        return {}
+    level = CONFIDENCE_LEVEL if level is None else level
+    draws = CONFIDENCE_DRAWS if draws is None else draws
+    keys = list(success_rates)
+    success = np.array([success_rates[key]["success"] for key in keys], dtype=float)
+    total = np.array([success_rates[key]["total"] for key in keys], dtype=float)
+    rng = np.random.default_rng(seed)
+    samples = rng.beta(1 + success[:, None], 1 + (total - success)[:, None], size=(len(keys), draws))
+    low, high = np.percentile(samples, [(1 - level) / 2 * 100, (1 + level) / 2 * 100], axis=1) * 100
+    return {key: (float(lo), float(hi)) for key, lo, hi in zip(keys, low, high)}
+
+def _confirmations(direction, volume, prev_volume, price, ema_short, ema_long, macd, macd_signal, bb_upper, bb_lower, support, resistance):
+    """Подтверждения сигнала дополнительными индикаторами для направления long или short"""
+    if direction == "long":
+        return {
+            "volume": bool(volume > prev_volume * 1.2),
+            "ema": bool(ema_short > ema_long),
+            "macd": bool(macd > macd_signal),
+            "bollinger": bool(price <= bb_lower),
+            "sr": bool(abs(price - support) / price < 0.02),
+        }
+    return {
+        "volume": bool(volume > prev_volume * 1.2),
+        "ema": bool(ema_short < ema_long),
+        "macd": bool(macd < macd_signal),
+        "bollinger": bool(price >= bb_upper),
+        "sr": bool(abs(price - resistance) / price < 0.02),
+    }
 
-    else:
-        scenario = "neutral"
-        volume_confirmed = volume > prev_volume * 1.2
-        ema_confirmed = ema_short > ema_long
-        macd_confirmed = macd > macd_signal
-        bollinger_confirmed = price <= bb_lower
-        sr_confirmed = abs(price - support) / price < 0.02
-        confirmed_count_long = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-        ema_confirmed_short = ema_short < ema_long
-        macd_confirmed_short = macd < macd_signal
-        bollinger_confirmed_short = price >= bb_upper
-        sr_confirmed_short = abs(price - resistance) / price < 0.02
-        confirmed_count_short = sum([volume_confirmed, ema_confirmed_short, macd_confirmed_short, bollinger_confirmed_short, sr_confirmed_short])
-        if confirmed_count_long >= 3:
-            confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                                   f"EMA: {'✅' if ema_confirmed else '❌'}, "
-                                   f"MACD: {'✅' if macd_confirmed else '❌'}, "
-                                   f"Bollinger Bands: {'✅' if bollinger_confirmed else '❌'}, "
-                                   f"Поддержка/Сопротивление: {'✅' if sr_confirmed else '❌'}")
-            recommendation = f"Нейтральная зона: FGI = {current_fgi}, RSI = {rsi:.2f}. Возможна покупка ({confirmation_status})"
-        elif confirmed_count_short >= 3:
-            confirmation_status = (f"Объем: {'✅' if volume_confirmed else '❌'}, "
-                                   f"EMA: {'✅' if ema_confirmed_short else '❌'}, "
-                                   f"MACD: {'✅' if macd_confirmed_short else '❌'}, "
-                                   f"Bollinger Bands: {'✅' if bollinger_confirmed_short else '❌'}, "
-                                   f"Поддержка/Сопротивление: {'✅' if sr_confirmed_short else '❌'}")
-            recommendation = f"Нейтральная зона: FGI = {current_fgi}, RSI = {rsi:.2f}. Возможна продажа ({confirmation_status})"
-        else:
-            recommendation = f"Нейтральная зона: FGI = {current_fgi}, RSI = {rsi:.2f}. Воздержитесь или ждите пробоя с объемом."
-
-    # Вывод с эмодзи и HTML‑форматированием:
-    print("🔍 <b>Анализ рынка</b>")
-    print(f"💰 <b>Актив:</b> {symbol} | <b>Таймфрейм:</b> {timeframe}")
-    print(f"💵 <b>Текущая цена:</b> {price:.2f} USDT | <b>Объем:</b> {volume:.2f}")
-    print(f"📊 <b>EMA:</b> Short={ema_short:.2f}, Long={ema_long:.2f} - {'🐂 Бычий тренд' if ema_short > ema_long else '🐻 Медвежий тренд'}")
-    print(f"📉 <b>MACD:</b> Line={macd:.2f}, Signal={macd_signal:.2f} - {'📈 Бычий сигнал' if macd > macd_signal else '📉 Медвежий сигнал'}")
-    print(f"📈 <b>Bollinger Bands:</b> Upper={bb_upper:.2f}, Middle={bb_middle:.2f}, Lower={bb_lower:.2f}")
-    print(f"📌 <b>Поддержка/Сопротивление:</b> Поддержка={support:.2f}, Сопротивление={resistance:.2f}")
-    print(f"🤖 <b>Рекомендация:</b> {recommendation}")
-    print("")
-    
-    print("🔢 <b>Рекомендации от ИИ</b>")
-    probability = calculate_probability(scenario, trend, trend_strength, success_rates, volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed)
-    confirmed_count = sum([volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed])
-    
-    if scenario in ["long", "divergence_long"]:
-        if confirmed_count >= 3:
-            if probability >= 50:
-                print(f"✅ <b>Сильный сигнал для покупки.</b> Шанс успеха: {probability:.0f}%. Рекомендуется действовать.")
+def trading_strategy(symbol, timeframe, current_fgi=None, fgi_series=None, refresh_base=True, closed_only=False):
+    """Анализ торговой пары. Возвращает SignalReport; при ошибке заполнено поле error.
+       current_fgi и fgi_series можно передать заранее, чтобы не запрашивать FGI для каждой пары.
+       closed_only=True отбрасывает текущую незакрытую свечу: анализ по последней закрытой (запуск по закрытию свечи).
+    """
+    report = SignalReport(symbol=symbol, timeframe=timeframe)
+    with span(report.timings, "total"):
+        # Один запрос к локальному хранилищу свечей обслуживает и историю, и текущие индикаторы, и цену/объем
+        with span(report.timings, "candles"):
+            required_limit = max(EMA_LONG_PERIOD + MACD_SIGNAL, BOLLINGER_PERIOD, SUPPORT_RESISTANCE_WINDOW * 2) + 1
+            candles = get_candles(symbol, timeframe, limit=max(HISTORICAL_DATA_LIMIT, required_limit) + int(closed_only), refresh_base=refresh_base)
+            if closed_only and candles is not None and not candles.empty:
+                current_open = candle_open_time(timeframe, exchange.milliseconds())
+                if candles['timestamp'].iloc[-1] >= pd.Timestamp(current_open, unit='ms'):
+                    candles = candles.iloc[:-1].reset_index(drop=True)
+        if candles is None or candles.empty:
+            report.error = "Не удалось загрузить исторические данные."
+            return report
+        report.candle_timestamp = candles['timestamp'].iloc[-1]
+
+        # Загружаем исторические данные
+        historical_df = candles.iloc[-HISTORICAL_DATA_LIMIT:].reset_index(drop=True)
+
+        # Получаем исторические значения FGI и сопоставляем их со свечами по времени
+        with span(report.timings, "fgi"):
+            if fgi_series is None:
+                fgi_series = get_fgi_series()
+            if fgi_series.empty or fgi_series.index[0] > historical_df['timestamp'].iloc[0]:
+                report.warnings.append("История FGI покрывает не все свечи. Для свечей без значения используется FGI = 50.")
+            historical_fgi = align_fgi(historical_df['timestamp'], fgi_series)
+
+            if current_fgi is None:
+                current_fgi = int(fgi_series.iloc[-1]) if not fgi_series.empty else get_fgi()
+        if current_fgi is None:
+            report.error = "Не удалось получить текущее значение FGI."
+            return report
+        report.fgi = current_fgi
+
+        # Дополнительные данные для расчета индикаторов
+        with span(report.timings, "indicators"):
+            df = candles.iloc[-required_limit:].reset_index(drop=True)
+            if df.empty:
+                report.error = "Не удалось загрузить данные для расчета индикаторов."
+                return report
+
+            price, volume = get_price_volume(symbol, timeframe, df=candles)
+            if price is None or volume is None:
+                report.error = "Недоступны данные о цене или объеме."
+                return report
+            price, volume = float(price), float(volume)
+
+            # По закрытым свечам индикаторы берутся из потокового состояния пары (обновляется только новой свечой);
+            # анализ с текущей незакрытой свечой и не прогретое состояние считаются TA-Lib по окну
+            streamed = streamed_indicators(symbol, timeframe, candles) if closed_only else None
+            if streamed is not None:
+                rsi = streamed["rsi"]
+                ema_short, ema_long = streamed["ema_short"], streamed["ema_long"]
+                macd, macd_signal = streamed["macd"], streamed["macd_signal"]
+                bb_upper, bb_middle, bb_lower = streamed["bb_upper"], streamed["bb_middle"], streamed["bb_lower"]
             else:
-                print(f"⚠️ <b>Сигнал для покупки есть, но шансы успеха низкие:</b> {probability:.0f}%. Лучше подождать благоприятных условий.")
-        else:
-            print(f"❌ <b>Сигнал для покупки слабый</b> из-за недостатка подтверждений. Шанс успеха: {probability:.0f}%.")
-    elif scenario in ["short", "divergence_short"]:
-        if confirmed_count >= 3:
-            if probability >= 50:
-                print(f"✅ <b>Сильный сигнал для продажи.</b> Шанс успеха: {probability:.0f}%. Рекомендуется действовать.")
+                rsi_series = calculate_rsi(df, RSI_PERIOD)
+                if rsi_series is None:
+                    report.error = "Ошибка при расчете RSI."
+                    return report
+                rsi = float(rsi_series.iloc[-1])
+
+                ema_short_series, ema_long_series = calculate_ema(df, EMA_SHORT_PERIOD, EMA_LONG_PERIOD)
+                if ema_short_series is None or ema_long_series is None:
+                    report.error = "Ошибка при расчете EMA."
+                    return report
+                ema_short = float(ema_short_series.iloc[-1])
+                ema_long = float(ema_long_series.iloc[-1])
+
+                macd_series, macd_signal_series = calculate_macd(df, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+                if macd_series is None or macd_signal_series is None:
+                    report.error = "Ошибка при расчете MACD."
+                    return report
+                macd = float(macd_series.iloc[-1])
+                macd_signal = float(macd_signal_series.iloc[-1])
+
+                bb_upper_series, bb_middle_series, bb_lower_series = calculate_bollinger_bands(df, BOLLINGER_PERIOD, BOLLINGER_DEVIATION)
+                if bb_upper_series is None or bb_middle_series is None or bb_lower_series is None:
+                    report.error = "Ошибка при расчете Bollinger Bands."
+                    return report
+                bb_upper = float(bb_upper_series.iloc[-1])
+                bb_middle = float(bb_middle_series.iloc[-1])
+                bb_lower = float(bb_lower_series.iloc[-1])
+
+            support, resistance = calculate_support_resistance(df, SUPPORT_RESISTANCE_WINDOW)
+            if support is None or resistance is None:
+                report.error = "Ошибка при расчете уровней поддержки/сопротивления."
+                return report
+
+            if streamed is not None:
+                adx = streamed["adx"]
             else:
-                print(f"⚠️ <b>Сигнал для продажи есть, но шансы успеха низкие:</b> {probability:.0f}%. Лучше подождать благоприятных условий.")
-        else:
-            print(f"❌ <b>Сигнал для продажи слабый</b> из-за недостатка подтверждений. Шанс успеха: {probability:.0f}%.")
-    else:
-        probability_long = calculate_probability("long", trend, trend_strength, success_rates, volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed)
-        probability_short = calculate_probability("short", trend, trend_strength, success_rates, volume_confirmed, ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed)
-        if confirmed_count >= 3 and probability_long >= 50:
-            print(f"ℹ️ <b>Нейтральная зона,</b> но есть слабый сигнал для покупки. Шанс успеха: {probability_long:.0f}%.")
-        elif confirmed_count >= 3 and probability_short >= 50:
-            print(f"ℹ️ <b>Нейтральная зона,</b> но есть слабый сигнал для продажи. Шанс успеха: {probability_short:.0f}%.")
-        else:
-            print(f"ℹ️ <b>Нейтральная зона.</b> Шанс успеха для покупки: {probability_long:.0f}%, для продажи: {probability_short:.0f}%. Воздержитесь или ждите пробоя с объемом.")
-    
-    key = (scenario, trend, trend_strength)
-    base_probability = 50
-    if key in success_rates and success_rates[key]["total"] > 0:
-        base_probability = (success_rates[key]["success"] / success_rates[key]["total"]) * 100
-    total_indicators = 5
-    confirmation_bonus = (confirmed_count / total_indicators) * 30
+                adx_series = calculate_adx(df, ADX_PERIOD)
+                if adx_series is None:
+                    report.error = "Ошибка при расчете ADX."
+                    return report
+                adx = float(adx_series.iloc[-1])
 
-    print("")
-    print("🎯 <b>Расчет вероятности успеха</b>")
-    print(f"✅ <b>Базовая вероятность:</b> {base_probability:.2f}%")
-    print(f"🔔 <b>Бонус за подтверждения:</b> {confirmation_bonus:.2f}%")
-    print(f"🎯 <b>Итоговая вероятность:</b> {probability:.2f}%")
+            prev_volume = df['volume'].iloc[-2] if len(df) >= 2 else 0
 
-    if SHOW_EXPLANATIONS:
-        print_explanations(ema_confirmed, macd_confirmed, bollinger_confirmed, sr_confirmed, scenario)
+        trend = "bullish" if ema_short > ema_long else "bearish"
+        trend_strength = "strong" if adx > 25 else "weak"
+
+        # Логика формирования сигналов с проверкой подтверждений
+        if current_fgi <= FGI_THRESHOLD_LOW and rsi <= RSI_THRESHOLD_LOW:
+            scenario = "long"
+        elif current_fgi >= FGI_THRESHOLD_HIGH and rsi >= RSI_THRESHOLD_HIGH:
+            scenario = "short"
+        elif current_fgi >= FGI_THRESHOLD_HIGH and rsi <= RSI_THRESHOLD_LOW:
+            scenario = "divergence_long"
+        elif current_fgi <= FGI_THRESHOLD_LOW and rsi >= RSI_THRESHOLD_HIGH:
+            scenario = "divergence_short"
+        else:
+            scenario = "neutral"
+
+        indicator_values = (volume, prev_volume, price, ema_short, ema_long, macd, macd_signal, bb_upper, bb_lower, support, resistance)
+        if scenario in ["short", "divergence_short"]:
+            confirmations = _confirmations("short", *indicator_values)
+        else:
+            confirmations = _confirmations("long", *indicator_values)
+        if scenario == "neutral":
+            # В нейтральной зоне проверяются оба направления; вероятность считается по подтверждениям для покупки
+            report.confirmations_short = _confirmations("short", *indicator_values)
+            if sum(confirmations.values()) >= 3:
+                report.neutral_direction = "long"
+            elif sum(report.confirmations_short.values()) >= 3:
+                report.neutral_direction = "short"
+
+        # Базовая вероятность — по исходам реально выданных сигналов из журнала. Пока по нужному ключу
+        # оценено меньше signal_ledger_min_signals сигналов, используется разбор истории в окне свечей
+        with span(report.timings, "ledger"):
+            candle_timestamps = candles['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+            signal_ledger.evaluate(exchange.id, symbol, timeframe, candle_timestamps, candles['close'].to_numpy(),
+                                   exchange.parse_timeframe(timeframe) * 1000, exchange.milliseconds())
+            success_rates = signal_ledger.success_rates(exchange.id, symbol, timeframe)
+        with span(report.timings, "history"):
+            needed_keys = [(direction, trend, trend_strength) for direction in (["long", "short"] if scenario == "neutral" else [scenario])]
+            if any(success_rates.get(key, {"total": 0})["total"] < SIGNAL_LEDGER_MIN_SIGNALS for key in needed_keys):
+                history_rates = analyze_historical_signals(historical_df, historical_fgi)
+                success_rates = {**history_rates, **{key: value for key, value in success_rates.items()
+                                                     if value["total"] >= SIGNAL_LEDGER_MIN_SIGNALS}}
+
+        confirmation_flags = list(confirmations.values())
+        probability = calculate_probability(scenario, trend, trend_strength, success_rates, *confirmation_flags)
+        if scenario == "neutral":
+            report.probability_long = calculate_probability("long", trend, trend_strength, success_rates, *confirmation_flags)
+            report.probability_short = calculate_probability("short", trend, trend_strength, success_rates, *confirmation_flags)
+
+        key = (scenario, trend, trend_strength)
+        base_probability = 50
+        if key in success_rates and success_rates[key]["total"] > 0:
+            base_probability = (success_rates[key]["success"] / success_rates[key]["total"]) * 100
+        total_indicators = 5
+        confirmation_bonus = (sum(confirmation_flags) / total_indicators) * 30
+
+        report.price, report.volume = price, volume
+        report.rsi, report.adx = rsi, adx
+        report.ema_short, report.ema_long = ema_short, ema_long
+        report.macd, report.macd_signal = macd, macd_signal
+        report.bb_upper, report.bb_middle, report.bb_lower = bb_upper, bb_middle, bb_lower
+        report.support, report.resistance = support, resistance
+        report.scenario, report.trend, report.trend_strength = scenario, trend, trend_strength
+        report.confirmations = confirmations
+        report.probability = probability
+        report.base_probability = base_probability
+        report.confirmation_bonus = confirmation_bonus
+        report.success_rates = success_rates
+        report.success_intervals = success_rate_intervals(success_rates)
+        report.confidence_level = CONFIDENCE_LEVEL
+        # В журнал попадают только сигналы закрытых свечей: по открытой свече сигнал еще может измениться
+        if closed_only:
+            with span(report.timings, "ledger"):
+                signal_ledger.record(exchange.id, report, candle_timestamps[-1], SUCCESS_HORIZON, SUCCESS_THRESHOLD)
+    return report
+
+def trading_strategy_multi(symbol, timeframes=None):
+    """Анализ пары на нескольких таймфреймах за один запуск с общим FGI.
+       При заданном base_timeframe все таймфреймы строятся из одного потока свечей.
+       Возвращает словарь {таймфрейм: SignalReport}.
+    """
+    timeframes = timeframes or CONFIRM_TIMEFRAMES
+    fgi_series = get_fgi_series()
+    current_fgi = int(fgi_series.iloc[-1]) if not fgi_series.empty else None
+    # При общем базовом потоке биржа опрашивается один раз — для самого старшего таймфрейма,
+    # которому нужна самая длинная история
+    order = sorted(timeframes, key=exchange.parse_timeframe, reverse=True) if BASE_TIMEFRAME else timeframes
+    reports = {}
+    for i, timeframe in enumerate(order):
+        reports[timeframe] = trading_strategy(symbol, timeframe, current_fgi=current_fgi, fgi_series=fgi_series,
+                                              refresh_base=i == 0)
+    return {timeframe: reports[timeframe] for timeframe in timeframes}
 
 if __name__ == "__main__":
-    trading_strategy(SYMBOL, TIMEFRAME)
+    parser = argparse.ArgumentParser(description="Анализ торговой пары из settings.json")
+    parser.add_argument("--multi", action="store_true", help="сводка по всем таймфреймам confirm_timeframes")
+    args = parser.parse_args()
+
+    if args.multi:
+        print(render_timeframes(trading_strategy_multi(SYMBOL), html=False))
+    else:
+        print(trading_strategy(SYMBOL, TIMEFRAME).render_text(explanations=SHOW_EXPLANATIONS))